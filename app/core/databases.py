@@ -1,39 +1,146 @@
+import os
+import threading
 import redis
+import redis.asyncio as aioredis
 from qdrant_client import QdrantClient
-from neo4j import GraphDatabase
+from neo4j import GraphDatabase, AsyncGraphDatabase
 from app.core.config import settings
 
 class DBManager:
+    """
+    DB 클라이언트 싱글톤.
+    각 클라이언트는 처음 접근할 때 생성되므로 import 시점에는 연결을 열지 않습니다.
+    aredis / aneo4j_driver 는 에이전트(/chat) 경로용 async 클라이언트로, 이벤트 루프 안에서만 사용합니다.
+    """
     _instance = None
-    
+
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super(DBManager, cls).__new__(cls)
-            
-            # 1. Redis 연결
-            cls._instance.redis = redis.Redis(
-                host=settings.REDIS_HOST,
-                port=settings.REDIS_PORT,
-                db=0,
-                decode_responses=True
-            )
-            
-            # [cite_start]2. Qdrant 연결 (knu_notice_retriever.py [cite: 50-52] 참고)
-            cls._instance.qdrant = QdrantClient(
-                url=settings.QDRANT_URL,
-                api_key=settings.QDRANT_API_KEY,
-                verify=False
-            )
-            
-            # [cite_start]3. Neo4j 연결 (knu_graph_builder.py [cite: 8] 참고)
-            cls._instance.neo4j_driver = GraphDatabase.driver(
-                settings.NEO4J_URI, 
-                auth=(settings.NEO4J_USER, settings.NEO4J_PASSWORD)
-            )
+            cls._instance._lock = threading.Lock()
+            cls._instance._redis = None
+            cls._instance._qdrant = None
+            cls._instance._neo4j_driver = None
+            cls._instance._aredis = None
+            cls._instance._redis_binary = None
+            cls._instance._aredis_binary = None
+            cls._instance._aneo4j_driver = None
         return cls._instance
 
+    @property
+    def redis(self) -> redis.Redis:
+        # 1. Redis 연결
+        if self._redis is None:
+            with self._lock:
+                if self._redis is None:
+                    self._redis = redis.Redis(
+                        host=settings.REDIS_HOST,
+                        port=settings.REDIS_PORT,
+                        db=0,
+                        decode_responses=True
+                    )
+        return self._redis
+
+    @property
+    def qdrant(self) -> QdrantClient:
+        # 2. Qdrant 연결 (knu_notice_retriever.py 참고)
+        if self._qdrant is None:
+            with self._lock:
+                if self._qdrant is None:
+                    self._qdrant = QdrantClient(
+                        url=settings.QDRANT_URL,
+                        api_key=settings.QDRANT_API_KEY,
+                        verify=False
+                    )
+        return self._qdrant
+
+    @property
+    def neo4j_driver(self):
+        # 3. Neo4j 연결 (knu_graph_builder.py 참고)
+        if self._neo4j_driver is None:
+            with self._lock:
+                if self._neo4j_driver is None:
+                    self._neo4j_driver = GraphDatabase.driver(
+                        settings.NEO4J_URI,
+                        auth=(settings.NEO4J_USER, settings.NEO4J_PASSWORD)
+                    )
+        return self._neo4j_driver
+
+    @property
+    def aredis(self) -> aioredis.Redis:
+        # 4. Async Redis (커넥션 풀 공유: 동시 요청 수만큼 연결을 재사용)
+        if self._aredis is None:
+            with self._lock:
+                if self._aredis is None:
+                    pool = aioredis.ConnectionPool(
+                        host=settings.REDIS_HOST,
+                        port=settings.REDIS_PORT,
+                        db=0,
+                        decode_responses=True,
+                        max_connections=int(os.getenv("REDIS_MAX_CONNECTIONS", "100"))
+                    )
+                    self._aredis = aioredis.Redis(connection_pool=pool)
+        return self._aredis
+
+    @property
+    def redis_binary(self) -> "redis.Redis":
+        # 5. 바이너리 값(압축된 대화 체크포인트)용 Redis 클라이언트 (decode_responses=False)
+        if self._redis_binary is None:
+            with self._lock:
+                if self._redis_binary is None:
+                    self._redis_binary = redis.Redis(
+                        host=settings.REDIS_HOST,
+                        port=settings.REDIS_PORT,
+                        db=0
+                    )
+        return self._redis_binary
+
+    @property
+    def aredis_binary(self) -> aioredis.Redis:
+        if self._aredis_binary is None:
+            with self._lock:
+                if self._aredis_binary is None:
+                    pool = aioredis.ConnectionPool(
+                        host=settings.REDIS_HOST,
+                        port=settings.REDIS_PORT,
+                        db=0,
+                        max_connections=int(os.getenv("REDIS_MAX_CONNECTIONS", "100"))
+                    )
+                    self._aredis_binary = aioredis.Redis(connection_pool=pool)
+        return self._aredis_binary
+
+    @property
+    def aneo4j_driver(self):
+        # 6. Async Neo4j 드라이버
+        if self._aneo4j_driver is None:
+            with self._lock:
+                if self._aneo4j_driver is None:
+                    self._aneo4j_driver = AsyncGraphDatabase.driver(
+                        settings.NEO4J_URI,
+                        auth=(settings.NEO4J_USER, settings.NEO4J_PASSWORD),
+                        max_connection_pool_size=int(os.getenv("NEO4J_MAX_CONNECTIONS", "100"))
+                    )
+        return self._aneo4j_driver
+
+    async def aclose(self):
+        if self._aneo4j_driver is not None:
+            await self._aneo4j_driver.close()
+            self._aneo4j_driver = None
+        if self._aredis is not None:
+            await self._aredis.aclose()
+            self._aredis = None
+        if self._aredis_binary is not None:
+            await self._aredis_binary.aclose()
+            self._aredis_binary = None
+
     def close(self):
-        self.neo4j_driver.close()
-        self.redis.close()
+        if self._neo4j_driver is not None:
+            self._neo4j_driver.close()
+        if self._redis is not None:
+            self._redis.close()
+        if self._redis_binary is not None:
+            self._redis_binary.close()
+        if self._qdrant is not None:
+            self._qdrant.close()
 
-db = DBManager()
\ No newline at end of file
+db = DBManager()
@@ -0,0 +1,118 @@
+import os
+import asyncio
+import hashlib
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional
+
+# 이름 → 그룹 (/metrics/singleflight 에서 한 번에 조회)
+_groups: Dict[str, "object"] = {}
+
+
+def prompt_key(*parts: Any) -> str:
+    """긴 입력(프롬프트, 도구 결과 등)을 키로 쓰기 위한 해시"""
+    digest = hashlib.sha1()
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class _Counters:
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.coalesced = 0
+        _groups[name] = self
+
+    @classmethod
+    def from_env(cls, name: str) -> Optional["_Counters"]:
+        """SINGLEFLIGHT_ENABLED=0 이면 None (호출마다 개별 실행, 기존 동작)"""
+        if os.getenv("SINGLEFLIGHT_ENABLED", "1") != "1":
+            return None
+        return cls(name)
+
+    def stats(self) -> Dict:
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "coalesce_rate": round(self.coalesced / self.calls, 4) if self.calls else 0.0,
+            "in_flight": len(self._calls)
+        }
+
+
+class AsyncSingleFlight(_Counters):
+    """
+    같은 key의 작업이 진행 중이면 새로 시작하지 않고 그 결과를 함께 기다립니다 (asyncio용).
+    작업은 별도 Task로 실행되므로 먼저 호출한 요청이 취소(클라이언트 종료)되어도
+    함께 기다리던 요청은 영향을 받지 않습니다. 결과는 캐시하지 않습니다 (완료 즉시 key 해제).
+    """
+    def __init__(self, name: str):
+        super().__init__(name)
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+
+    async def do(self, key: Hashable, fn: Callable, *args, **kwargs):
+        self.calls += 1
+        task = self._calls.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = asyncio.ensure_future(fn(*args, **kwargs))
+            self._calls[key] = task
+            task.add_done_callback(lambda t, key=key: self._release(key, t))
+        return await asyncio.shield(task)
+
+    def _release(self, key: Hashable, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # 기다리던 요청이 모두 취소된 경우 "exception was never retrieved" 경고 방지
+        if not task.cancelled():
+            task.exception()
+
+
+class _Call:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(_Counters):
+    """스레드용 singleflight (encode executor 등 동기 경로). 첫 호출 스레드가 실행하고 나머지는 대기합니다."""
+    def __init__(self, name: str):
+        super().__init__(name)
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable, *args, **kwargs):
+        with self._lock:
+            self.calls += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+
+def stats() -> Dict:
+    return {name: group.stats() for name, group in _groups.items()}
@@ -0,0 +1,104 @@
+import time
+import asyncio
+import inspect
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict
+
+
+class StartupTracker:
+    """
+    프로세스 기동 과정(import, 클라이언트 생성, 워밍업)의 단계별 소요 시간을 기록합니다.
+    /ready 엔드포인트와 기동 로그에서 사용합니다.
+    """
+    def __init__(self):
+        self.process_start = time.perf_counter()
+        self.timings = OrderedDict()
+        self.errors = {}
+        # 워밍업 실패 후 백그라운드 재시도 횟수 (component → 횟수)
+        self.retries = {}
+        self.ready = False
+        self.ready_at = None
+
+    @contextmanager
+    def measure(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            self.errors[name] = str(e)
+            raise
+        finally:
+            self.timings[name] = (time.perf_counter() - start) * 1000
+
+    def mark_ready(self):
+        self.ready = not self.errors
+        self.ready_at = (time.perf_counter() - self.process_start) * 1000
+
+    def report(self) -> Dict:
+        return {
+            "ready": self.ready,
+            "ready_after_ms": round(self.ready_at, 1) if self.ready_at is not None else None,
+            "timings_ms": {name: round(ms, 1) for name, ms in self.timings.items()},
+            "errors": dict(self.errors),
+            "retries": dict(self.retries)
+        }
+
+    def print_report(self):
+        print("[Startup] Timing report")
+        for name, ms in self.timings.items():
+            status = "FAIL" if name in self.errors else "ok"
+            print(f"   {name:<32} {ms:>9.1f} ms  {status}")
+        if self.ready_at is not None:
+            print(f"   {'ready (since process start)':<32} {self.ready_at:>9.1f} ms  {'ok' if self.ready else 'NOT READY'}")
+
+    async def _run_components(self, components: Dict[str, Callable[[], object]]):
+        def run(name, fn):
+            try:
+                with self.measure(name):
+                    fn()
+                self.errors.pop(name, None)
+            except Exception as e:
+                print(f"[Startup] {name} failed: {e}")
+
+        async def arun(name, fn):
+            try:
+                with self.measure(name):
+                    await fn()
+                self.errors.pop(name, None)
+            except Exception as e:
+                print(f"[Startup] {name} failed: {e}")
+
+        await asyncio.gather(*(
+            arun(name, fn) if inspect.iscoroutinefunction(fn) else asyncio.to_thread(run, name, fn)
+            for name, fn in components.items()
+        ))
+
+    async def warm_up(self, components: Dict[str, Callable[[], object]],
+                      retry_interval: float = 5.0, max_retry_interval: float = 60.0) -> bool:
+        """
+        각 컴포넌트 초기화 함수를 스레드에서 병렬로 실행합니다.
+        async 함수(async 클라이언트 워밍업)는 스레드 대신 현재 이벤트 루프에서 실행합니다.
+        실패한 컴포넌트(기동 직후 아직 뜨지 않은 Redis/Neo4j 등)만 백오프하며 다시 실행하고,
+        모두 성공하면 ready=True 가 됩니다. 그 전까지 /ready 는 503과 에러를 반환합니다.
+        """
+        await self._run_components(components)
+        self.mark_ready()
+        self.print_report()
+
+        delay = retry_interval
+        while not self.ready:
+            await asyncio.sleep(delay)
+            failed = {name: fn for name, fn in components.items() if name in self.errors}
+            for name in failed:
+                self.retries[name] = self.retries.get(name, 0) + 1
+            print(f"[Startup] Retrying failed components: {', '.join(failed)}")
+            await self._run_components(failed)
+            self.mark_ready()
+            if self.ready:
+                self.print_report()
+            delay = min(delay * 2, max_retry_interval)
+        return self.ready
+
+
+startup = StartupTracker()
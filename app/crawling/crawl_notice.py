@@ -19,6 +19,24 @@ urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 # 전역 락
 file_lock = threading.Lock()
 
+# 새 공지 → Redis Stream (실시간 인덱싱용, Redis 미설정 시 None)
+_publisher = None
+_publisher_lock = threading.Lock()
+_publisher_loaded = False
+
+def get_publisher():
+    global _publisher, _publisher_loaded
+    if not _publisher_loaded:
+        with _publisher_lock:
+            if not _publisher_loaded:
+                try:
+                    from app.lib.knu_notice_stream import NoticePublisher
+                    _publisher = NoticePublisher.from_env()
+                except Exception as e:
+                    print(f"[Warning] Notice stream unavailable: {e}")
+                _publisher_loaded = True
+    return _publisher
+
 def sanitize_filename(name):
     return re.sub(r'[\\/*?:"<>|]', "_", name)
 
@@ -71,6 +89,12 @@ class BaseCrawler:
                 self.collected_links.add(post_data['url'])
             except Exception as e:
                 print(f"[Save Error] {self.dept}: {e}")
+                return
+
+        # 파일 저장 후 스트림에 발행 (인덱서가 수 분 내로 검색 가능하게 만듦)
+        publisher = get_publisher()
+        if publisher is not None:
+            publisher.publish(post_data)
 
     def process_detail_page(self, title, date, link, referer=None):
         if link in self.collected_links: return
@@ -0,0 +1,212 @@
+import os
+import json
+import time
+import argparse
+import multiprocessing as mp
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, Future
+from typing import List, Optional
+from dotenv import load_dotenv
+
+from app.lib.knu_corpus import (
+    DEFAULT_DATA_DIR, PASSAGE_CHARS, PASSAGE_OVERLAP,
+    iter_notices, point_id, split_passages, passage_text
+)
+
+load_dotenv()
+
+# -----------------------------------------------------
+# Worker process state (프로세스마다 ONNX 세션 1개)
+# -----------------------------------------------------
+_encoder = None
+
+
+def _init_worker(model_path: str, threads: int, max_length: int, allow_spinning: bool):
+    global _encoder
+    # 워커 간 CPU 경합 방지: 토크나이저 내부 스레드 끄기
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+    import onnxruntime as ort
+    from app.lib.knu_notice_retriever import DenseEncoder
+
+    sess_options = ort.SessionOptions()
+    sess_options.intra_op_num_threads = threads
+    sess_options.inter_op_num_threads = 1
+    sess_options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    sess_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if not allow_spinning:
+        # 여러 프로세스가 코어를 나눠 쓸 때 idle spin은 다른 워커의 CPU를 빼앗음
+        sess_options.add_session_config_entry("session.intra_op.allow_spinning", "0")
+    _encoder = DenseEncoder(model_path, sess_options, max_length=max_length)
+
+
+def _worker_dim() -> int:
+    return int(_encoder.encode(["dimension probe"]).shape[1])
+
+
+def _worker_encode(out_path: str, rows: List[int], texts: List[str]) -> int:
+    """
+    배치를 인코딩해 공유 memmap 출력의 해당 행에 바로 씁니다.
+    memmap은 태스크마다 열고 닫습니다 (작업이 끝난 임시 파일의 매핑/fd가 워커에 남지 않도록).
+    """
+    vecs = _encoder.encode(texts)
+    out = np.load(out_path, mmap_mode="r+")
+    try:
+        out[rows] = vecs
+        out.flush()
+    finally:
+        del out
+    return len(rows)
+
+
+# -----------------------------------------------------
+# Length-bucketed batching
+# -----------------------------------------------------
+def bucket_batches(lengths: List[int], max_batch_size: int = 64, max_tokens: int = 8192) -> List[List[int]]:
+    """
+    토큰 길이순으로 정렬한 뒤 (배치 크기 × 배치 내 최대 길이) ≤ max_tokens 가 되도록 자릅니다.
+    비슷한 길이끼리 묶이므로 패딩이 거의 없고, 긴 배치부터 반환해 워커 부하를 고르게 합니다.
+    """
+    order = np.argsort(np.asarray(lengths), kind="stable")
+    batches, current, current_max = [], [], 0
+    for i in order.tolist():
+        length = max(1, lengths[i])
+        if current and (len(current) >= max_batch_size or (len(current) + 1) * max(current_max, length) > max_tokens):
+            batches.append(current)
+            current, current_max = [], 0
+        current.append(i)
+        current_max = max(current_max, length)
+    if current:
+        batches.append(current)
+    batches.reverse()
+    return batches
+
+
+class BulkJob:
+    """진행 중인 벌크 임베딩 작업 (result()로 완료 대기)"""
+    def __init__(self, out_path: str, futures: List[Future], num_docs: int, num_tokens: int, start_time: float):
+        self.out_path = out_path
+        self.futures = futures
+        self.num_docs = num_docs
+        self.num_tokens = num_tokens
+        self.start_time = start_time
+        self.seconds = None
+
+    def result(self) -> np.memmap:
+        done = 0
+        for future in self.futures:
+            done += future.result()
+            print(f"[Bulk] Embedded {done}/{self.num_docs} docs...", end="\r")
+        self.seconds = time.perf_counter() - self.start_time
+        if self.num_docs:
+            print(f"\n[Bulk] {self.num_docs} docs in {self.seconds:.1f}s "
+                  f"({self.num_docs / self.seconds:.1f} docs/s, {self.num_tokens / self.seconds:.0f} tokens/s)")
+        return np.load(self.out_path, mmap_mode="r")
+
+
+class BulkEmbedder:
+    """
+    Multi-process dense embedder for full reindexes.
+    - 워커 프로세스마다 ONNX 세션 1개 (intra-op 스레드 = 코어 수 / 워커 수)
+    - 길이 버킷 배칭으로 512 토큰 한도 안에서 패딩 최소화
+    - 결과는 .npy memmap에 워커가 직접 기록 (부모로 벡터를 pickle 하지 않음)
+    """
+    def __init__(self, model_path: str, num_workers: Optional[int] = None, threads_per_worker: Optional[int] = None,
+                 max_batch_size: int = 64, max_tokens: int = 8192, max_length: int = 512):
+        cpus = os.cpu_count() or 1
+        self.model_path = model_path
+        # 기본값: 워커당 4스레드 (세션 메모리와 코어 활용의 절충)
+        self.num_workers = num_workers or max(1, cpus // 4)
+        self.threads_per_worker = threads_per_worker or max(1, cpus // self.num_workers)
+        self.max_batch_size = max_batch_size
+        self.max_tokens = max_tokens
+        self.max_length = max_length
+        self.dim = None
+
+        from transformers import AutoTokenizer
+        self.tokenizer = AutoTokenizer.from_pretrained(model_path)
+
+        # fork는 ONNX/토크나이저 스레드와 충돌할 수 있으므로 spawn 사용
+        self.pool = ProcessPoolExecutor(
+            max_workers=self.num_workers,
+            mp_context=mp.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(model_path, self.threads_per_worker, max_length, self.num_workers == 1)
+        )
+        print(f"[Bulk] {self.num_workers} workers × {self.threads_per_worker} threads ({model_path})")
+
+    def token_lengths(self, texts: List[str]) -> List[int]:
+        encoded = self.tokenizer(texts, truncation=True, max_length=self.max_length)
+        return [len(ids) for ids in encoded["input_ids"]]
+
+    def start(self, texts: List[str], out_path: str) -> BulkJob:
+        """배치를 워커에 제출하고 바로 반환합니다 (그 사이 부모는 sparse 인코딩 등을 할 수 있음)."""
+        if self.dim is None:
+            # 첫 호출에서 워커 기동(모델 로드)까지 기다림 (처리량 측정에서 제외)
+            self.dim = self.pool.submit(_worker_dim).result()
+        start_time = time.perf_counter()
+
+        out = np.lib.format.open_memmap(out_path, mode="w+", dtype=np.float32, shape=(len(texts), self.dim))
+        del out
+
+        lengths = self.token_lengths(texts) if texts else []
+        futures = [
+            self.pool.submit(_worker_encode, out_path, rows, [texts[i] for i in rows])
+            for rows in bucket_batches(lengths, self.max_batch_size, self.max_tokens)
+        ]
+        return BulkJob(out_path, futures, len(texts), sum(lengths), start_time)
+
+    def embed(self, texts: List[str], out_path: str) -> np.memmap:
+        return self.start(texts, out_path).result()
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Embed the whole notice corpus with a process pool (dense only)")
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR)
+    parser.add_argument("--out", default="./bulk_embeddings")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--threads", type=int, default=None, help="워커당 intra-op 스레드 수")
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--max-tokens", type=int, default=8192, help="배치당 (문서 수 × 최대 토큰 길이) 상한")
+    parser.add_argument("--max-docs", type=int, default=0)
+    parser.add_argument("--passage-chars", type=int, default=PASSAGE_CHARS)
+    parser.add_argument("--passage-overlap", type=int, default=PASSAGE_OVERLAP)
+    args = parser.parse_args()
+
+    # 인덱스와 같은 단위(패시지)로 임베딩해야 point id로 재사용할 수 있음
+    docs, texts, ids = 0, [], []
+    for doc in iter_notices(args.data_dir):
+        for passage in split_passages(doc.get("content", ""), args.passage_chars, args.passage_overlap):
+            texts.append(passage_text(doc, passage))
+            ids.append(point_id(doc["url"], passage["chunk_index"]))
+        docs += 1
+        if args.max_docs and docs >= args.max_docs:
+            break
+
+    model_path = os.getenv("MODEL_PATH", "./bge-m3-onnx-quantized")
+    embedder = BulkEmbedder(model_path, args.workers, args.threads, args.max_batch, args.max_tokens)
+    os.makedirs(args.out, exist_ok=True)
+    job = embedder.start(texts, os.path.join(args.out, "dense.npy"))
+    vectors = job.result()
+    embedder.close()
+
+    # dense.npy의 i번째 행 = point_ids.txt의 i번째 id
+    with open(os.path.join(args.out, "point_ids.txt"), "w", encoding="utf-8") as f:
+        f.writelines(pid + "\n" for pid in ids)
+    meta = {
+        "model_version": os.getenv("MODEL_VERSION", os.path.basename(os.path.normpath(model_path))),
+        "num_docs": docs,
+        "num_passages": len(texts),
+        "chunking": f"{args.passage_chars}:{args.passage_overlap}",
+        "dim": int(vectors.shape[1]) if texts else embedder.dim,
+        "workers": embedder.num_workers,
+        "threads_per_worker": embedder.threads_per_worker,
+        "seconds": round(job.seconds, 2),
+        "passages_per_sec": round(len(texts) / job.seconds, 1) if job.seconds else 0.0,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S")
+    }
+    with open(os.path.join(args.out, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    print(f"[Bulk] Wrote {args.out}: {meta}")
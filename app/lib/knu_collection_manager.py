@@ -0,0 +1,230 @@
+import os
+import argparse
+from typing import Dict, List, Optional
+from qdrant_client import QdrantClient, models
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# BGE-M3 dense 차원
+DENSE_DIM = 1024
+
+# payload 인덱스 스키마: dept는 tenant key (학과별로 HNSW 그래프를 나눠 저장)
+# url은 패시지 → 공지 group_by 및 패시지 삭제 필터에 사용
+PAYLOAD_INDEXES = {
+    "dept": models.KeywordIndexParams(type=models.KeywordIndexType.KEYWORD, is_tenant=True),
+    "url": models.KeywordIndexParams(type=models.KeywordIndexType.KEYWORD),
+    "detail": models.KeywordIndexParams(type=models.KeywordIndexType.KEYWORD),
+    "date": models.DatetimeIndexParams(type=models.DatetimeIndexType.DATETIME),
+}
+
+# payload_schema 조회 결과의 data_type 값과 비교하기 위한 매핑
+PAYLOAD_INDEX_TYPES = {
+    "dept": models.PayloadSchemaType.KEYWORD,
+    "url": models.PayloadSchemaType.KEYWORD,
+    "detail": models.PayloadSchemaType.KEYWORD,
+    "date": models.PayloadSchemaType.DATETIME,
+}
+
+
+class CollectionManager:
+    """
+    Qdrant 컬렉션을 선언적으로 생성/검증합니다 (idempotent).
+    - dense: cosine, 원본 벡터는 on-disk + int8 scalar quantization(RAM) + rescoring
+    - sparse: in-memory inverted index
+    - HNSW: 전역 그래프(m) + 학과(tenant)별 그래프(payload_m)
+    - payload: on-disk, dept/url/detail keyword, date datetime 인덱스
+    1G 메모리 제한의 Qdrant 컨테이너에서 학기가 쌓여도 RAM에는 양자화 벡터와 인덱스만 올라가도록 합니다.
+    """
+    def __init__(self, client: QdrantClient, collection_name: str, dense_dim: int = DENSE_DIM,
+                 hnsw_m: int = 16, hnsw_ef_construct: int = 128, payload_m: int = 16):
+        self.client = client
+        self.collection_name = collection_name
+        self.dense_dim = dense_dim
+        self.hnsw_m = hnsw_m
+        self.hnsw_ef_construct = hnsw_ef_construct
+        self.payload_m = payload_m
+
+    @classmethod
+    def from_env(cls, collection_name: Optional[str] = None) -> "CollectionManager":
+        qdrant_url = os.getenv("QDRANT_URL")
+        if not qdrant_url:
+            raise ValueError("❌ 환경 변수 'QDRANT_URL'이 설정되지 않았습니다. .env 파일을 확인해주세요.")
+        client = QdrantClient(
+            url=qdrant_url,
+            api_key=os.getenv("QDRANT_API_KEY"),
+            port=443,
+            https=True,
+            timeout=60,
+            verify=False if "cloudflare" in qdrant_url else True
+        )
+        return cls(
+            client,
+            collection_name or os.getenv("QDRANT_COLLECTION_ALIAS") or os.getenv("QDRANT_COLLECTION_NAME", "knu_hybrid_2026")
+        )
+
+    # -----------------------------------------------------
+    # Desired configuration
+    # -----------------------------------------------------
+    def _hnsw_config(self) -> models.HnswConfigDiff:
+        return models.HnswConfigDiff(
+            m=self.hnsw_m,
+            ef_construct=self.hnsw_ef_construct,
+            payload_m=self.payload_m,
+            on_disk=False
+        )
+
+    def _quantization_config(self) -> models.ScalarQuantization:
+        return models.ScalarQuantization(
+            scalar=models.ScalarQuantizationConfig(
+                type=models.ScalarType.INT8,
+                quantile=0.99,
+                always_ram=True
+            )
+        )
+
+    def _vectors_config(self) -> Dict[str, models.VectorParams]:
+        return {
+            "dense": models.VectorParams(
+                size=self.dense_dim,
+                distance=models.Distance.COSINE,
+                on_disk=True,
+                hnsw_config=self._hnsw_config()
+            )
+        }
+
+    def _sparse_vectors_config(self) -> Dict[str, models.SparseVectorParams]:
+        return {
+            "sparse": models.SparseVectorParams(
+                index=models.SparseIndexParams(on_disk=False)
+            )
+        }
+
+    # -----------------------------------------------------
+    # Ensure / Verify
+    # -----------------------------------------------------
+    def create(self, collection_name: Optional[str] = None):
+        """원하는 설정으로 컬렉션을 새로 만듭니다 (이미 있으면 에러)."""
+        name = collection_name or self.collection_name
+        self.client.create_collection(
+            collection_name=name,
+            vectors_config=self._vectors_config(),
+            sparse_vectors_config=self._sparse_vectors_config(),
+            hnsw_config=self._hnsw_config(),
+            quantization_config=self._quantization_config(),
+            on_disk_payload=True
+        )
+        print(f"[Collection] Created {name}")
+        self.ensure_payload_indexes(name)
+
+    def ensure(self) -> List[str]:
+        """
+        컬렉션이 없으면 생성하고, 있으면 검증 후 변경 가능한 설정만 맞춥니다.
+        Returns the list of changes applied (빈 리스트면 이미 원하는 상태).
+        """
+        if not self.client.collection_exists(self.collection_name):
+            self.create()
+            return ["created"]
+
+        issues = self.verify()
+        fatal = [i for i in issues if i.startswith("dense.size") or i.startswith("dense.distance") or i == "dense.missing" or i == "sparse.missing"]
+        if fatal:
+            raise ValueError(f"❌ {self.collection_name} 컬렉션을 재생성해야 합니다: {fatal}")
+
+        applied = []
+        if any(i.startswith(("hnsw.", "dense.on_disk", "quantization.", "on_disk_payload")) for i in issues):
+            self.client.update_collection(
+                collection_name=self.collection_name,
+                vectors_config={"dense": models.VectorParamsDiff(on_disk=True, hnsw_config=self._hnsw_config())},
+                hnsw_config=self._hnsw_config(),
+                quantization_config=self._quantization_config(),
+                collection_params=models.CollectionParamsDiff(on_disk_payload=True)
+            )
+            applied.append("updated collection params")
+
+        applied.extend(self.ensure_payload_indexes())
+        for change in applied:
+            print(f"[Collection] {self.collection_name}: {change}")
+        return applied
+
+    def ensure_payload_indexes(self, collection_name: Optional[str] = None) -> List[str]:
+        name = collection_name or self.collection_name
+        schema = self.client.get_collection(name).payload_schema or {}
+        applied = []
+        for field, params in PAYLOAD_INDEXES.items():
+            current = schema.get(field)
+            if current is not None and current.data_type == PAYLOAD_INDEX_TYPES[field]:
+                continue
+            if current is not None:
+                self.client.delete_payload_index(name, field, wait=True)
+            self.client.create_payload_index(
+                collection_name=name,
+                field_name=field,
+                field_schema=params,
+                wait=True
+            )
+            applied.append(f"payload index on '{field}'")
+        return applied
+
+    def verify(self) -> List[str]:
+        """현재 컬렉션 설정과 원하는 설정의 차이를 반환합니다."""
+        if not self.client.collection_exists(self.collection_name):
+            return ["collection.missing"]
+
+        info = self.client.get_collection(self.collection_name)
+        params = info.config.params
+        issues = []
+
+        vectors = params.vectors if isinstance(params.vectors, dict) else {}
+        dense = vectors.get("dense")
+        if dense is None:
+            issues.append("dense.missing")
+        else:
+            if dense.size != self.dense_dim:
+                issues.append(f"dense.size={dense.size} (want {self.dense_dim})")
+            if dense.distance != models.Distance.COSINE:
+                issues.append(f"dense.distance={dense.distance}")
+            if not dense.on_disk:
+                issues.append("dense.on_disk=False")
+
+        if "sparse" not in (params.sparse_vectors or {}):
+            issues.append("sparse.missing")
+
+        if not params.on_disk_payload:
+            issues.append("on_disk_payload=False")
+
+        hnsw = info.config.hnsw_config
+        if hnsw.m != self.hnsw_m or hnsw.ef_construct != self.hnsw_ef_construct or hnsw.payload_m != self.payload_m:
+            issues.append(f"hnsw.m={hnsw.m},ef_construct={hnsw.ef_construct},payload_m={hnsw.payload_m}")
+
+        quantization = info.config.quantization_config
+        if not isinstance(quantization, models.ScalarQuantization) or quantization.scalar.type != models.ScalarType.INT8:
+            issues.append(f"quantization.config={quantization}")
+
+        schema = info.payload_schema or {}
+        for field, data_type in PAYLOAD_INDEX_TYPES.items():
+            current = schema.get(field)
+            if current is None or current.data_type != data_type:
+                issues.append(f"payload_index.{field}")
+
+        return issues
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create or verify the KNU notice Qdrant collection")
+    parser.add_argument("command", choices=["ensure", "verify"])
+    parser.add_argument("--collection", default=None)
+    args = parser.parse_args()
+
+    manager = CollectionManager.from_env(args.collection)
+    if args.command == "ensure":
+        changes = manager.ensure()
+        print(f"[Collection] {manager.collection_name}: {'up to date' if not changes else ', '.join(changes)}")
+    else:
+        issues = manager.verify()
+        if issues:
+            print(f"[Collection] {manager.collection_name} differs from the declared config:")
+            for issue in issues:
+                print(f"   - {issue}")
+            raise SystemExit(1)
+        print(f"[Collection] {manager.collection_name} OK")
@@ -0,0 +1,129 @@
+import os
+import re
+import json
+import glob
+import uuid
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+# 프로젝트 루트의 data/ 폴더 (크롤러가 학과별 jsonl을 저장하는 위치)
+DEFAULT_DATA_DIR = str(Path(__file__).resolve().parent.parent.parent / "data")
+
+# 패시지 분할 기본값 (문자 단위, 제목 포함 512 토큰 한도 안에 충분히 들어가는 크기)
+PASSAGE_CHARS = 400
+PASSAGE_OVERLAP = 80
+
+# 게시판마다 다른 날짜 표기 ("2025/03/04", "2025.3.4" 등)
+_DATE = re.compile(r"^\s*(\d{4})\s*[-./]\s*(\d{1,2})\s*[-./]\s*(\d{1,2})")
+
+
+def normalize_date(value):
+    """날짜를 ISO(YYYY-MM-DD)로 맞춥니다. Qdrant datetime 인덱스/DatetimeRange 필터는 ISO만 인식합니다."""
+    if not isinstance(value, str):
+        return value
+    m = _DATE.match(value)
+    if m is None:
+        return value
+    year, month, day = m.groups()
+    return f"{year}-{int(month):02d}-{int(day):02d}"
+
+
+def normalize_notice(doc: Dict) -> Dict:
+    """색인 전 payload 정규화 (현재는 date만). 원본 dict는 바꾸지 않습니다."""
+    date = normalize_date(doc.get("date"))
+    if date == doc.get("date"):
+        return doc
+    return {**doc, "date": date}
+
+
+def iter_notices(data_dir: Optional[str] = None) -> Iterator[Dict]:
+    """
+    data/*.jsonl 의 공지사항을 스트리밍으로 읽습니다.
+    같은 URL이 여러 번 나오면 처음 것만 사용하고, date는 ISO 형식으로 정규화합니다.
+    """
+    data_dir = data_dir or DEFAULT_DATA_DIR
+    seen_urls = set()
+
+    for file_path in sorted(glob.glob(os.path.join(data_dir, "*.jsonl"))):
+        with open(file_path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    doc = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+                url = doc.get("url")
+                if not url or url in seen_urls:
+                    continue
+                seen_urls.add(url)
+                yield normalize_notice(doc)
+
+
+def document_text(doc: Dict) -> str:
+    """임베딩 대상 텍스트 (제목 + 본문)"""
+    title = doc.get("title") or ""
+    content = doc.get("content") or ""
+    return f"{title}\n{content}".strip()
+
+
+def make_snippet(content: str, length: int = 150) -> str:
+    """검색 결과용 짧은 미리보기 (줄바꿈/공백 정리 후 앞부분)"""
+    text = re.sub(r"\s+", " ", content or "").strip()
+    return text[:length]
+
+
+def point_id(url: str, chunk_index: int = 0) -> str:
+    """URL(+패시지 번호)에서 유도한 안정적인 point id. 0번 패시지는 URL만으로 만듭니다."""
+    key = url if chunk_index == 0 else f"{url}#{chunk_index}"
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, key))
+
+
+def split_passages(content: str, max_chars: int = PASSAGE_CHARS, overlap: int = PASSAGE_OVERLAP) -> List[Dict]:
+    """
+    본문을 겹치는 패시지로 나눕니다.
+    각 패시지는 {"chunk_index", "start", "end", "text"} (start/end는 본문 기준 문자 offset).
+    가능하면 공백/문장 끝에서 자르고, 다음 패시지는 overlap 만큼 앞에서 시작합니다.
+    """
+    content = content or ""
+    overlap = min(overlap, max_chars // 2)
+    passages, start = [], 0
+    while True:
+        end = min(len(content), start + max_chars)
+        if end < len(content):
+            # 뒤쪽 overlap 구간 안에서 마지막 공백을 경계로 사용
+            cut = max(content.rfind(" ", end - overlap, end), content.rfind("\n", end - overlap, end))
+            if cut > start:
+                end = cut
+        passages.append({"chunk_index": len(passages), "start": start, "end": end, "text": content[start:end].strip()})
+        if end >= len(content):
+            return passages
+        start = max(end - overlap, start + 1)
+
+
+def passage_text(doc: Dict, passage: Dict) -> str:
+    """패시지 임베딩 대상 텍스트 (제목 + 패시지, 제목이 모든 패시지의 문맥이 됨)"""
+    title = doc.get("title") or ""
+    return f"{title}\n{passage['text']}".strip()
+
+
+def passage_payload(doc: Dict, passage: Dict, num_chunks: int) -> Dict:
+    """
+    패시지 포인트/행의 payload. 모든 패시지가 부모 URL과 offset을 갖고,
+    전체 본문/이미지/첨부는 0번 패시지에만 싣습니다 (fetch_full 용).
+    """
+    if passage["chunk_index"] == 0:
+        base = dict(doc)
+    else:
+        base = {field: doc[field] for field in ("url", "title", "dept", "detail", "date") if field in doc}
+    base.update({
+        "snippet": make_snippet(doc.get("content", "")),
+        "passage": passage["text"],
+        "chunk_index": passage["chunk_index"],
+        "chunk_start": passage["start"],
+        "chunk_end": passage["end"],
+        "num_chunks": num_chunks
+    })
+    return base
@@ -0,0 +1,137 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from app.lib.knu_embedding_cache import normalize_query
+
+# 검색 모드 (품질 높은 순)
+MODE_HYBRID = "hybrid"   # dense(ONNX) + sparse(Kiwi)
+MODE_SPARSE = "sparse"   # Kiwi + Qdrant sparse만 (ONNX 생략)
+MODE_CACHED = "cached"   # 최근 hybrid 결과 재사용 (인코딩/Qdrant 모두 생략)
+MODES = (MODE_HYBRID, MODE_SPARSE, MODE_CACHED)
+
+
+class ResultCache:
+    """최근 hybrid 검색 결과 (in-process LRU + TTL). 과부하 시 cached 모드에서만 사용합니다."""
+    def __init__(self, max_entries: int = 2048, ttl: float = 600.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(query: str, target_dept: Optional[str], final_k: int):
+        return normalize_query(query), target_dept or "공통", final_k
+
+    def get(self, query: str, target_dept: Optional[str], final_k: int) -> Optional[List[Dict]]:
+        key = self._key(query, target_dept, final_k)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, results = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return results
+
+    def put(self, query: str, target_dept: Optional[str], final_k: int, results: List[Dict]):
+        if not results:
+            return
+        key = self._key(query, target_dept, final_k)
+        with self._lock:
+            self._entries[key] = (time.monotonic(), results)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class DegradationLadder:
+    """
+    Load-aware degradation ladder: hybrid → sparse-only → cached results.
+    - in_flight: 인코딩 단계에 들어와 있는 요청 수 (executor 대기 포함)
+    - ewma_ms: 최근 dense 인코딩 단계 소요 시간의 지수 이동 평균
+    in_flight > soft_limit 이거나 ewma_ms > budget_ms 이면 ONNX를 건너뛰고 sparse-only,
+    in_flight > hard_limit 이면 최근 결과 캐시를 먼저 봅니다.
+    sparse로 내려간 동안에는 dense 샘플이 없으므로 probe_interval마다 한 요청은 hybrid로 보내
+    부하가 풀렸는지 확인합니다.
+    """
+    def __init__(self, budget_ms: float = 250.0, soft_limit: int = 8, hard_limit: int = 32,
+                 alpha: float = 0.2, probe_interval: float = 1.0, result_cache: Optional[ResultCache] = None):
+        self.budget_ms = budget_ms
+        self.soft_limit = soft_limit
+        self.hard_limit = hard_limit
+        self.alpha = alpha
+        self.probe_interval = probe_interval
+        self.result_cache = result_cache or ResultCache()
+
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.ewma_ms = 0.0
+        self._last_dense = 0.0
+        self.counters = {mode: 0 for mode in MODES}
+
+    @classmethod
+    def from_env(cls) -> Optional["DegradationLadder"]:
+        if os.getenv("SEARCH_DEGRADATION", "1") != "1":
+            return None
+        return cls(
+            budget_ms=float(os.getenv("ENCODE_BUDGET_MS", "250")),
+            soft_limit=int(os.getenv("ENCODE_SOFT_INFLIGHT", "8")),
+            hard_limit=int(os.getenv("ENCODE_HARD_INFLIGHT", "32")),
+            result_cache=ResultCache(
+                max_entries=int(os.getenv("RESULT_CACHE_SIZE", "2048")),
+                ttl=float(os.getenv("RESULT_CACHE_TTL", "600"))
+            )
+        )
+
+    # -----------------------------------------------------
+    # Load tracking
+    # -----------------------------------------------------
+    def enter(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def exit(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def record_dense(self, elapsed_ms: float):
+        with self._lock:
+            self.ewma_ms = elapsed_ms if self._last_dense == 0.0 else (
+                self.alpha * elapsed_ms + (1 - self.alpha) * self.ewma_ms
+            )
+            self._last_dense = time.monotonic()
+
+    def choose(self) -> str:
+        """현재 부하에서 쓸 모드 (임베딩 캐시 미스인 요청에만 호출)"""
+        with self._lock:
+            if self.in_flight > self.hard_limit:
+                return MODE_CACHED
+            overloaded = self.in_flight > self.soft_limit or self.ewma_ms > self.budget_ms
+            if overloaded and time.monotonic() - self._last_dense < self.probe_interval:
+                return MODE_SPARSE
+            if overloaded:
+                # probe: 이 요청의 dense 샘플로 ewma를 갱신
+                self._last_dense = time.monotonic()
+            return MODE_HYBRID
+
+    def count(self, mode: str):
+        with self._lock:
+            self.counters[mode] += 1
+
+    def stats(self) -> Dict:
+        total = sum(self.counters.values()) or 1
+        return {
+            "in_flight": self.in_flight,
+            "ewma_encode_ms": round(self.ewma_ms, 2),
+            "modes": dict(self.counters),
+            "mode_ratio": {mode: round(n / total, 4) for mode, n in self.counters.items()},
+            "result_cache_entries": len(self.result_cache)
+        }
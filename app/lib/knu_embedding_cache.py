@@ -0,0 +1,236 @@
+import os
+import re
+import hashlib
+import threading
+import unicodedata
+import numpy as np
+from collections import OrderedDict
+from typing import List, Dict, Optional, Tuple
+
+import redis
+
+# 캐시 엔트리: (dense 벡터, (sparse indices, sparse values))
+CacheEntry = Tuple[List[float], Tuple[Optional[List[int]], Optional[List[float]]]]
+
+_HEADER = np.dtype([("dim", "<u4"), ("nnz", "<u4")])
+
+
+def normalize_query(text: str) -> str:
+    """캐시 키용 쿼리 정규화 (유니코드 NFKC + 공백 정리)"""
+    text = unicodedata.normalize("NFKC", text or "")
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def pack_entry(dense_vec: List[float], sp_indices: Optional[List[int]], sp_values: Optional[List[float]]) -> bytes:
+    """dense(float32) + sparse(uint32 indices, float32 values)를 하나의 바이트열로 직렬화"""
+    dense = np.asarray(dense_vec, dtype="<f4")
+    indices = np.asarray(sp_indices or [], dtype="<u4")
+    values = np.asarray(sp_values or [], dtype="<f4")
+    header = np.array([(dense.size, indices.size)], dtype=_HEADER)
+    return header.tobytes() + dense.tobytes() + indices.tobytes() + values.tobytes()
+
+
+def unpack_entry(blob: bytes) -> CacheEntry:
+    header = np.frombuffer(blob, dtype=_HEADER, count=1)[0]
+    dim, nnz = int(header["dim"]), int(header["nnz"])
+    offset = _HEADER.itemsize
+    dense = np.frombuffer(blob, dtype="<f4", count=dim, offset=offset)
+    offset += dim * 4
+    indices = np.frombuffer(blob, dtype="<u4", count=nnz, offset=offset)
+    offset += nnz * 4
+    values = np.frombuffer(blob, dtype="<f4", count=nnz, offset=offset)
+
+    if nnz == 0:
+        return dense.tolist(), (None, None)
+    return dense.tolist(), (indices.tolist(), values.tolist())
+
+
+class QueryEmbeddingCache:
+    """
+    Two-level query embedding cache.
+    L1: 프로세스 내부 LRU (바이트 크기 기준 eviction)
+    L2: 모든 uvicorn 워커가 공유하는 Redis (TTL + 서버의 allkeys-lru 정책)
+    키는 (모델 버전, 정규화된 쿼리)의 해시입니다.
+    """
+    def __init__(
+        self,
+        model_version: str,
+        max_local_bytes: int = 64 * 1024 * 1024,
+        redis_client: Optional[redis.Redis] = None,
+        redis_ttl: int = 7 * 24 * 3600,
+        key_prefix: str = "knu:qemb"
+    ):
+        self.model_version = model_version
+        self.max_local_bytes = max_local_bytes
+        self.redis = redis_client
+        self.redis_ttl = redis_ttl
+        self.key_prefix = key_prefix
+
+        self._lru = OrderedDict()
+        self._local_bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {
+            "local_hits": 0,
+            "redis_hits": 0,
+            "misses": 0,
+            "local_evictions": 0,
+            "redis_errors": 0,
+            "redis_bytes_written": 0,
+            "redis_entries_written": 0
+        }
+
+    @classmethod
+    def from_env(cls, model_version: str) -> Optional["QueryEmbeddingCache"]:
+        """환경 변수 기반 생성. EMBED_CACHE_ENABLED=0 이면 None."""
+        if os.getenv("EMBED_CACHE_ENABLED", "1") == "0":
+            return None
+
+        redis_client = None
+        redis_host = os.getenv("REDIS_HOST")
+        if redis_host and os.getenv("EMBED_CACHE_REDIS", "1") != "0":
+            redis_client = redis.Redis(
+                host=redis_host,
+                port=int(os.getenv("REDIS_PORT", "6379")),
+                db=0,
+                socket_timeout=0.2,
+                socket_connect_timeout=0.5
+            )
+
+        return cls(
+            model_version=model_version,
+            max_local_bytes=int(float(os.getenv("EMBED_CACHE_LOCAL_MB", "64")) * 1024 * 1024),
+            redis_client=redis_client,
+            redis_ttl=int(os.getenv("EMBED_CACHE_TTL", str(7 * 24 * 3600)))
+        )
+
+    def make_key(self, query: str) -> str:
+        digest = hashlib.sha1(normalize_query(query).encode("utf-8")).hexdigest()
+        return f"{self.key_prefix}:{self.model_version}:{digest}"
+
+    # -----------------------------------------------------
+    # Lookup / Store
+    # -----------------------------------------------------
+    def get(self, query: str) -> Optional[CacheEntry]:
+        key = self.make_key(query)
+
+        with self._lock:
+            blob = self._lru.get(key)
+            if blob is not None:
+                self._lru.move_to_end(key)
+                self._stats["local_hits"] += 1
+                return unpack_entry(blob)
+
+        if self.redis is not None:
+            try:
+                blob = self.redis.get(key)
+            except redis.RedisError as e:
+                self._redis_error(e)
+                blob = None
+            if blob is not None:
+                self._put_local(key, blob)
+                with self._lock:
+                    self._stats["redis_hits"] += 1
+                return unpack_entry(blob)
+
+        with self._lock:
+            self._stats["misses"] += 1
+        return None
+
+    def get_many(self, queries: List[str]) -> List[Optional[CacheEntry]]:
+        """로컬 LRU를 먼저 보고, 나머지는 Redis MGET 한 번으로 조회"""
+        keys = [self.make_key(q) for q in queries]
+        found: List[Optional[bytes]] = [None] * len(keys)
+        pending = []
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                blob = self._lru.get(key)
+                if blob is not None:
+                    self._lru.move_to_end(key)
+                    self._stats["local_hits"] += 1
+                    found[i] = blob
+                else:
+                    pending.append(i)
+
+        if pending and self.redis is not None:
+            try:
+                blobs = self.redis.mget([keys[i] for i in pending])
+            except redis.RedisError as e:
+                self._redis_error(e)
+                blobs = [None] * len(pending)
+            still_pending = []
+            for i, blob in zip(pending, blobs):
+                if blob is None:
+                    still_pending.append(i)
+                    continue
+                found[i] = blob
+                self._put_local(keys[i], blob)
+                with self._lock:
+                    self._stats["redis_hits"] += 1
+            pending = still_pending
+
+        with self._lock:
+            self._stats["misses"] += len(pending)
+        return [unpack_entry(b) if b is not None else None for b in found]
+
+    def put(self, query: str, dense_vec: List[float], sp_indices, sp_values):
+        key = self.make_key(query)
+        blob = pack_entry(dense_vec, sp_indices, sp_values)
+        self._put_local(key, blob)
+
+        if self.redis is not None:
+            try:
+                self.redis.set(key, blob, ex=self.redis_ttl)
+                with self._lock:
+                    self._stats["redis_bytes_written"] += len(blob)
+                    self._stats["redis_entries_written"] += 1
+            except redis.RedisError as e:
+                self._redis_error(e)
+
+    def _put_local(self, key: str, blob: bytes):
+        size = len(blob)
+        if size > self.max_local_bytes:
+            return
+        with self._lock:
+            old = self._lru.pop(key, None)
+            if old is not None:
+                self._local_bytes -= len(old)
+            self._lru[key] = blob
+            self._local_bytes += size
+            # 바이트 예산을 넘으면 가장 오래된 항목부터 제거
+            while self._local_bytes > self.max_local_bytes:
+                _, evicted = self._lru.popitem(last=False)
+                self._local_bytes -= len(evicted)
+                self._stats["local_evictions"] += 1
+
+    def _redis_error(self, e: Exception):
+        with self._lock:
+            self._stats["redis_errors"] += 1
+            first = self._stats["redis_errors"] == 1
+        if first:
+            print(f"[Warning] Embedding cache Redis tier unavailable: {e}")
+
+    # -----------------------------------------------------
+    # Metrics
+    # -----------------------------------------------------
+    def stats(self) -> Dict:
+        """Hit/miss 카운터와 크기 정보 (Redis 256MB 한도 산정용)"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["local_entries"] = len(self._lru)
+            stats["local_bytes"] = self._local_bytes
+        stats["max_local_bytes"] = self.max_local_bytes
+        stats["redis_enabled"] = self.redis is not None
+        stats["redis_ttl"] = self.redis_ttl
+
+        lookups = stats["local_hits"] + stats["redis_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["local_hits"] + stats["redis_hits"]) / lookups if lookups else 0.0
+        stats["avg_entry_bytes"] = (
+            stats["local_bytes"] / stats["local_entries"] if stats["local_entries"] else 0
+        )
+        return stats
+
+    def clear_local(self):
+        with self._lock:
+            self._lru.clear()
+            self._local_bytes = 0
@@ -0,0 +1,284 @@
+import os
+import json
+import time
+import hashlib
+import platform
+import argparse
+import numpy as np
+import onnxruntime as ort
+from typing import Dict, List, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# 튜닝 전/설정이 없을 때의 기존 동작
+DEFAULT_CONFIG = {
+    "intra_op_threads": 4,
+    "inter_op_threads": 1,
+    "execution_mode": "sequential",
+    "graph_optimization": "all",
+    "max_batch": 16
+}
+
+EXECUTION_MODES = {
+    "sequential": ort.ExecutionMode.ORT_SEQUENTIAL,
+    "parallel": ort.ExecutionMode.ORT_PARALLEL,
+}
+GRAPH_OPTIMIZATION_LEVELS = {
+    "basic": ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    "extended": ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    "all": ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+}
+
+# 벤치마크용 대표 쿼리 (실제 서비스 쿼리와 비슷한 길이)
+BENCH_QUERIES = [
+    "수강신청 기간 안내",
+    "2학기 국가장학금 신청 방법",
+    "컴퓨터학부 졸업요건 변경 사항",
+    "기숙사 입사 신청 일정과 제출 서류",
+    "계절학기 수강 신청 및 등록금 납부",
+    "교환학생 파견 프로그램 모집 공고",
+    "학생증 재발급 절차",
+    "대학원 입시 설명회 일정 안내",
+]
+BATCH_SIZES = (1, 2, 4, 8, 16, 32)
+
+
+def available_cores() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def worker_count() -> int:
+    """같은 호스트에서 인코더를 나눠 쓰는 프로세스 수 (uvicorn/gunicorn workers)"""
+    return max(1, int(os.getenv("WEB_CONCURRENCY", os.getenv("UVICORN_WORKERS", "1"))))
+
+
+def _cpu_model() -> str:
+    try:
+        with open("/proc/cpuinfo", "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor() or platform.machine()
+
+
+def host_fingerprint(model_file: str) -> str:
+    """CPU 모델/코어 수/워커 수/ORT 버전/모델 파일이 같으면 같은 fingerprint"""
+    parts = [
+        _cpu_model(),
+        str(available_cores()),
+        str(worker_count()),
+        ort.__version__,
+        os.path.basename(model_file),
+        str(os.path.getsize(model_file)) if os.path.exists(model_file) else "?",
+    ]
+    return hashlib.sha1("|".join(parts).encode()).hexdigest()[:12]
+
+
+def make_session_options(config: Dict) -> ort.SessionOptions:
+    sess_options = ort.SessionOptions()
+    sess_options.intra_op_num_threads = int(config["intra_op_threads"])
+    sess_options.inter_op_num_threads = int(config["inter_op_threads"])
+    sess_options.execution_mode = EXECUTION_MODES[config["execution_mode"]]
+    sess_options.graph_optimization_level = GRAPH_OPTIMIZATION_LEVELS[config["graph_optimization"]]
+    return sess_options
+
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    arr = np.asarray(samples) * 1000
+    return {"p50": round(float(np.percentile(arr, 50)), 2), "p95": round(float(np.percentile(arr, 95)), 2)}
+
+
+class EncoderTuner:
+    """
+    ONNX dense encoder auto-tuning.
+    1. 스레드/실행 모드 sweep (intra-op ∈ 코어 예산 이하의 2의 거듭제곱, sequential vs parallel+inter-op)
+    2. 최적 스레드 설정에서 graph optimization level sweep
+    3. batch size sweep → latency 예산 안에서 처리량이 가장 높은 max_batch 선택
+    단일 쿼리 p95 latency가 가장 낮은 설정을 고릅니다 (검색 hot path 기준).
+    결과는 host fingerprint별로 JSON에 저장되어 다음 기동부터 그대로 사용됩니다.
+    """
+    def __init__(self, model_path: str, tuning_path: str = "./encoder_tuning.json",
+                 repeats: int = 30, latency_budget_ms: float = 100.0):
+        from app.lib.knu_notice_retriever import DenseEncoder
+        self.model_path = model_path
+        self.model_file = DenseEncoder.find_model_file(model_path)
+        self.tuning_path = tuning_path
+        self.repeats = repeats
+        self.latency_budget_ms = latency_budget_ms
+        self.fingerprint = host_fingerprint(self.model_file)
+
+    @classmethod
+    def from_env(cls, model_path: str) -> "EncoderTuner":
+        return cls(
+            model_path,
+            tuning_path=os.getenv("ENCODER_TUNING_PATH", "./encoder_tuning.json"),
+            repeats=int(os.getenv("ENCODER_TUNING_REPEATS", "30")),
+            latency_budget_ms=float(os.getenv("ENCODER_LATENCY_BUDGET_MS", "100"))
+        )
+
+    # -----------------------------------------------------
+    # Persistence
+    # -----------------------------------------------------
+    def _read_all(self) -> Dict:
+        if not os.path.exists(self.tuning_path):
+            return {}
+        try:
+            with open(self.tuning_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"[Warning] Failed to read encoder tuning file ({self.tuning_path}): {e}")
+            return {}
+
+    def load(self) -> Optional[Dict]:
+        """이 호스트 fingerprint로 저장된 최적 설정 (없으면 None)"""
+        entry = self._read_all().get(self.fingerprint)
+        return entry["config"] if entry else None
+
+    def save(self, config: Dict, report: Dict):
+        results = self._read_all()
+        results[self.fingerprint] = {
+            "config": config,
+            "report": report,
+            "cpu": _cpu_model(),
+            "cores": available_cores(),
+            "workers": worker_count(),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S")
+        }
+        tmp_path = self.tuning_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.tuning_path)
+
+    # -----------------------------------------------------
+    # Benchmark
+    # -----------------------------------------------------
+    def _encoder(self, config: Dict):
+        from app.lib.knu_notice_retriever import DenseEncoder
+        return DenseEncoder(self.model_path, make_session_options(config))
+
+    def _time_batches(self, encoder, batch_size: int, repeats: int) -> List[float]:
+        batch = [BENCH_QUERIES[i % len(BENCH_QUERIES)] for i in range(batch_size)]
+        encoder.encode(batch)  # warm-up
+        samples = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            encoder.encode(batch)
+            samples.append(time.perf_counter() - start)
+        return samples
+
+    def measure_latency(self, config: Dict) -> Dict:
+        encoder = self._encoder(config)
+        samples = []
+        for query in BENCH_QUERIES[:2]:
+            encoder.encode([query])  # warm-up
+        for i in range(self.repeats):
+            start = time.perf_counter()
+            encoder.encode([BENCH_QUERIES[i % len(BENCH_QUERIES)]])
+            samples.append(time.perf_counter() - start)
+        return _percentiles(samples)
+
+    def thread_candidates(self) -> List[Dict]:
+        budget = max(1, available_cores() // worker_count())
+        intra = sorted({n for n in (1, 2, 4, 8, 16, 32) if n <= budget} | {budget})
+        candidates = [
+            {"intra_op_threads": n, "inter_op_threads": 1, "execution_mode": "sequential"} for n in intra
+        ]
+        # parallel 모드는 독립 분기 노드를 inter-op 스레드로 동시에 실행 (코어가 충분할 때만)
+        candidates += [
+            {"intra_op_threads": n, "inter_op_threads": 2, "execution_mode": "parallel"}
+            for n in intra if n * 2 <= budget
+        ]
+        return candidates
+
+    def tune(self) -> Dict:
+        """Sweep 후 최적 설정을 저장하고 반환합니다."""
+        start_time = time.perf_counter()
+        print(f"[Tuning] Autotuning ONNX encoder ({self.model_file}, host {self.fingerprint}, "
+              f"{available_cores()} cores / {worker_count()} workers)")
+        report = {"threads": [], "graph": [], "batch": []}
+
+        # 1. Threads / execution mode
+        best = None
+        for candidate in self.thread_candidates():
+            config = {**DEFAULT_CONFIG, **candidate}
+            latency = self.measure_latency(config)
+            report["threads"].append({**candidate, **latency})
+            print(f"   threads {candidate} → p50={latency['p50']}ms p95={latency['p95']}ms")
+            if best is None or latency["p95"] < best[1]["p95"]:
+                best = (config, latency)
+
+        # 2. Graph optimization level
+        for level in GRAPH_OPTIMIZATION_LEVELS:
+            config = {**best[0], "graph_optimization": level}
+            latency = best[1] if level == best[0]["graph_optimization"] else self.measure_latency(config)
+            report["graph"].append({"graph_optimization": level, **latency})
+            print(f"   graph={level} → p50={latency['p50']}ms p95={latency['p95']}ms")
+            if latency["p95"] < best[1]["p95"]:
+                best = (config, latency)
+        config = dict(best[0])
+
+        # 3. Batch size (latency 예산 안에서 처리량 최대)
+        encoder = self._encoder(config)
+        best_batch, best_throughput = 1, 0.0
+        for batch_size in BATCH_SIZES:
+            latency = _percentiles(self._time_batches(encoder, batch_size, max(5, self.repeats // 3)))
+            throughput = round(batch_size / (latency["p50"] / 1000), 1)
+            report["batch"].append({"batch_size": batch_size, **latency, "queries_per_sec": throughput})
+            print(f"   batch={batch_size} → p50={latency['p50']}ms p95={latency['p95']}ms {throughput} q/s")
+            if latency["p95"] > self.latency_budget_ms:
+                break
+            if throughput > best_throughput:
+                best_batch, best_throughput = batch_size, throughput
+        config["max_batch"] = best_batch
+
+        report["best"] = {"config": config, "latency_ms": best[1], "queries_per_sec": best_throughput}
+        report["seconds"] = round(time.perf_counter() - start_time, 1)
+        self.save(config, report)
+        print(f"[Tuning] Best: {config} (p95={best[1]['p95']}ms, {best_throughput} q/s) "
+              f"in {report['seconds']}s → {self.tuning_path}")
+        return config
+
+
+def resolve_encoder_config(model_path: str) -> Dict:
+    """
+    KNUSearcher가 쓰는 인코더 설정.
+    저장된 튜닝 결과 → (ENCODER_AUTOTUNE=1이면) 기동 시 튜닝 → 기본값 순으로 결정하고,
+    ENCODER_INTRA_OP_THREADS가 있으면 스레드 수만 덮어씁니다.
+    """
+    config = dict(DEFAULT_CONFIG)
+    try:
+        tuner = EncoderTuner.from_env(model_path)
+        tuned = tuner.load()
+        if tuned is None and os.getenv("ENCODER_AUTOTUNE", "0") == "1":
+            tuned = tuner.tune()
+        if tuned is not None:
+            config.update(tuned)
+            print(f"[System] Using tuned encoder config for host {tuner.fingerprint}: {config}")
+    except Exception as e:
+        print(f"[Warning] Encoder tuning unavailable, using defaults: {e}")
+
+    if os.getenv("ENCODER_INTRA_OP_THREADS"):
+        config["intra_op_threads"] = int(os.getenv("ENCODER_INTRA_OP_THREADS"))
+    return config
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark ONNX encoder settings and persist the best per host")
+    parser.add_argument("--model-path", default=os.getenv("MODEL_PATH", "./bge-m3-onnx-quantized"))
+    parser.add_argument("--out", default=os.getenv("ENCODER_TUNING_PATH", "./encoder_tuning.json"))
+    parser.add_argument("--repeats", type=int, default=30)
+    parser.add_argument("--latency-budget-ms", type=float, default=float(os.getenv("ENCODER_LATENCY_BUDGET_MS", "100")))
+    parser.add_argument("--show", action="store_true", help="저장된 결과만 출력")
+    args = parser.parse_args()
+
+    tuner = EncoderTuner(args.model_path, args.out, args.repeats, args.latency_budget_ms)
+    if args.show:
+        print(json.dumps(tuner._read_all().get(tuner.fingerprint), ensure_ascii=False, indent=2))
+    else:
+        tuner.tune()
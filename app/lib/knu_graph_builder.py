@@ -227,4 +227,8 @@ if __name__ == "__main__":
         builder.ingest_lectures("knu_full_data_2026_1학기.csv")
         
     builder.close()
-    print("[Graph] Build Complete.")
\ No newline at end of file
+    print("[Graph] Build Complete.")
+
+    # 졸업 요건/강좌 데이터가 바뀌었으므로 ACADEMIC/TIMETABLE 응답 캐시 무효화
+    from app.lib.knu_response_cache import bump_data_version_from_env
+    bump_data_version_from_env("graph")
\ No newline at end of file
@@ -0,0 +1,347 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import tempfile
+import hashlib
+import argparse
+import threading
+import unicodedata
+import numpy as np
+from typing import Dict, Iterable, List, Optional, Tuple
+from qdrant_client import QdrantClient, models
+
+from app.lib.knu_corpus import (
+    DEFAULT_DATA_DIR, PASSAGE_CHARS, PASSAGE_OVERLAP,
+    iter_notices, normalize_notice, document_text, point_id, split_passages, passage_text, passage_payload
+)
+from app.lib.knu_embedding_cache import pack_entry, unpack_entry
+
+# (dense, (sparse indices, sparse values))
+Embedding = Tuple[List[float], Tuple[Optional[List[int]], Optional[List[float]]]]
+
+
+def text_hash(text: str) -> str:
+    """정규화(NFKC + 공백 정리)된 텍스트의 해시"""
+    text = unicodedata.normalize("NFKC", text)
+    text = re.sub(r"\s+", " ", text).strip()
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def content_hash(doc: Dict, encoder_version: str = "") -> str:
+    """
+    문서 변경 감지용 해시 (제목 + 본문 + 나머지 payload 필드 + 인코더 버전).
+    dept/date/detail/첨부만 바뀐 경우나 모델·TermStats 교체 후에도 다시 upsert 되도록 모두 포함합니다.
+    """
+    fields = {key: value for key, value in doc.items() if key not in ("title", "content")}
+    digest = hashlib.sha1(text_hash(document_text(doc)).encode("utf-8"))
+    digest.update(json.dumps(fields, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8"))
+    digest.update(encoder_version.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def build_points(doc: Dict, doc_hash: str, chunking: str, passages: List[Dict],
+                 embeddings: List[Embedding]) -> List[models.PointStruct]:
+    """패시지마다 포인트 하나 (payload는 knu_corpus.passage_payload + 변경 감지 필드)"""
+    points = []
+    for passage, (dense, (indices, values)) in zip(passages, embeddings):
+        vector = {"dense": dense}
+        if indices:
+            vector["sparse"] = models.SparseVector(indices=indices, values=values)
+        payload = {**passage_payload(doc, passage, len(passages)), "content_hash": doc_hash, "chunking": chunking}
+        points.append(models.PointStruct(
+            id=point_id(doc["url"], passage["chunk_index"]), vector=vector, payload=payload
+        ))
+    return points
+
+
+class EmbeddingStore:
+    """
+    On-disk embedding store keyed by (model version, text hash).
+    모델/가중치 버전이 같고 패시지 텍스트가 같으면 다시 인코딩하지 않습니다.
+    값은 쿼리 캐시와 같은 바이너리 포맷(pack_entry)으로 저장합니다.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model_version TEXT NOT NULL,"
+            " content_hash TEXT NOT NULL,"
+            " vectors BLOB NOT NULL,"
+            " PRIMARY KEY (model_version, content_hash))"
+        )
+        self.conn.commit()
+
+    def get_many(self, model_version: str, hashes: List[str]) -> Dict[str, Embedding]:
+        found = {}
+        with self._lock:
+            # SQLite 변수 개수 제한을 피하기 위해 나눠서 조회
+            for start in range(0, len(hashes), 500):
+                chunk = hashes[start:start + 500]
+                rows = self.conn.execute(
+                    f"SELECT content_hash, vectors FROM embeddings WHERE model_version = ? "
+                    f"AND content_hash IN ({','.join('?' * len(chunk))})",
+                    [model_version, *chunk]
+                ).fetchall()
+                for doc_hash, blob in rows:
+                    found[doc_hash] = unpack_entry(blob)
+        return found
+
+    def put_many(self, model_version: str, items: Iterable[Tuple[str, List[float], Tuple]]):
+        rows = [
+            (model_version, doc_hash, pack_entry(dense, indices, values))
+            for doc_hash, dense, (indices, values) in items
+        ]
+        with self._lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model_version, content_hash, vectors) VALUES (?, ?, ?)",
+                rows
+            )
+            self.conn.commit()
+
+    def count(self, model_version: Optional[str] = None) -> int:
+        with self._lock:
+            if model_version is None:
+                return self.conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            return self.conn.execute(
+                "SELECT COUNT(*) FROM embeddings WHERE model_version = ?", (model_version,)
+            ).fetchone()[0]
+
+    def close(self):
+        self.conn.close()
+
+
+class IngestionPipeline:
+    """
+    Incremental notice ingestion.
+    1. data/*.jsonl 스트리밍 + 문서별 content hash 계산
+    2. Qdrant의 기존 content_hash와 비교해 신규/변경 문서만 처리
+    3. 문서를 겹치는 패시지로 나누고, 임베딩 저장소에 없는 패시지만 배치 인코딩
+       (쿼리와 같은 Kiwi + mmh3 해싱)
+    4. URL(+패시지 번호) 기반 point id로 upsert, 줄어든 패시지와 코퍼스에서 사라진 문서는 삭제
+    """
+    def __init__(self, searcher, client: QdrantClient, collection_name: str,
+                 store: Optional[EmbeddingStore] = None, batch_size: int = 32, bulk_embedder=None,
+                 passage_chars: int = PASSAGE_CHARS, passage_overlap: int = PASSAGE_OVERLAP):
+        self.searcher = searcher
+        self.client = client
+        self.collection_name = collection_name
+        self.store = store
+        self.batch_size = batch_size
+        # 전체 재색인용 멀티프로세스 dense 인코더 (knu_bulk_embed.BulkEmbedder)
+        self.bulk_embedder = bulk_embedder
+        # 한 번에 임베딩할 문서 수: bulk 모드는 워커 풀을 채울 만큼 크게
+        self.flush_size = 1024 if bulk_embedder else batch_size * 8
+        self.passage_chars = passage_chars
+        self.passage_overlap = passage_overlap
+        # 분할 설정이 바뀌면 모든 문서를 다시 나누도록 payload에 기록
+        self.chunking = f"{passage_chars}:{passage_overlap}"
+        # 문서 sparse 가중치도 벡터에 포함되므로 두 버전을 함께 키로 사용
+        self.model_version = f"{searcher.model_version}+{searcher.sparse_encoder.version}"
+
+    # -----------------------------------------------------
+    # Embedding
+    # -----------------------------------------------------
+    def _encode_bulk(self, texts: List[str]) -> Tuple[List[List[float]], List]:
+        # 워커들이 dense를 계산하는 동안 부모 프로세스는 sparse(Kiwi)를 처리
+        with tempfile.TemporaryDirectory(prefix="knu_bulk_") as tmp:
+            job = self.bulk_embedder.start(texts, os.path.join(tmp, "dense.npy"))
+            sparse = self.searcher.sparse_encoder.encode_documents(texts)
+            dense = np.asarray(job.result()).tolist()
+        return dense, sparse
+
+    def _encode(self, texts: List[str]) -> Tuple[List[List[float]], List]:
+        if self.bulk_embedder is not None:
+            return self._encode_bulk(texts)
+        dense, sparse = [], []
+        for start in range(0, len(texts), self.batch_size):
+            batch = texts[start:start + self.batch_size]
+            dense.extend(self.searcher._encode_dense_batch(batch).tolist())
+            sparse.extend(self.searcher.sparse_encoder.encode_documents(batch))
+        return dense, sparse
+
+    def embed(self, texts: List[str]) -> Tuple[List[Embedding], int]:
+        """
+        Returns (embeddings in input order, number of texts actually encoded).
+        임베딩 저장소는 텍스트 해시로 조회하므로, 수정된 공지에서도 바뀌지 않은 패시지는 재사용됩니다.
+        """
+        hashes = [text_hash(t) for t in texts]
+        cached = self.store.get_many(self.model_version, hashes) if self.store else {}
+        # 같은 텍스트가 여러 번 나오면 한 번만 인코딩
+        missing = list({h: i for i, h in reversed(list(enumerate(hashes))) if h not in cached}.items())
+
+        computed = {}
+        if missing:
+            dense, sparse = self._encode([texts[i] for _, i in missing])
+            for (h, _), d, sp in zip(missing, dense, sparse):
+                computed[h] = (d, sp)
+            if self.store:
+                self.store.put_many(self.model_version, [(h, d, sp) for h, (d, sp) in computed.items()])
+
+        embeddings = [cached.get(h) or computed[h] for h in hashes]
+        return embeddings, len(missing)
+
+    def _delete_stale_chunks(self, docs: List[Dict], num_chunks: List[int]):
+        """문서가 짧아져 남은 뒤쪽 패시지와, 패시지 분할 이전의 구버전 포인트를 지웁니다."""
+        stale = [
+            models.Filter(must=[
+                models.FieldCondition(key="url", match=models.MatchValue(value=doc["url"])),
+                models.Filter(should=[
+                    models.FieldCondition(key="chunk_index", range=models.Range(gte=n)),
+                    models.IsEmptyCondition(is_empty=models.PayloadField(key="chunk_index"))
+                ])
+            ])
+            for doc, n in zip(docs, num_chunks)
+        ]
+        self.client.delete(
+            collection_name=self.collection_name,
+            points_selector=models.FilterSelector(filter=models.Filter(should=stale)),
+            wait=True
+        )
+
+    def index_documents(self, docs: List[Dict]) -> Dict:
+        """주어진 문서를 패시지 단위로 (필요하면 인코딩 후) upsert 합니다. 문서 단위 삭제는 하지 않습니다."""
+        if not docs:
+            return {"upserted": 0, "passages": 0, "embedded": 0}
+        # 스트림 등 iter_notices를 거치지 않은 입력도 같은 형식으로 (datetime 인덱스용 ISO date)
+        docs = [normalize_notice(d) for d in docs]
+        doc_passages = [split_passages(d.get("content", ""), self.passage_chars, self.passage_overlap) for d in docs]
+        texts = [passage_text(doc, p) for doc, passages in zip(docs, doc_passages) for p in passages]
+        embeddings, encoded = self.embed(texts)
+
+        points, pos = [], 0
+        for doc, passages in zip(docs, doc_passages):
+            points.extend(build_points(
+                doc, content_hash(doc, self.model_version), self.chunking, passages, embeddings[pos:pos + len(passages)]
+            ))
+            pos += len(passages)
+        for start in range(0, len(points), self.batch_size):
+            self.client.upsert(collection_name=self.collection_name, points=points[start:start + self.batch_size], wait=True)
+
+        self._delete_stale_chunks(docs, [len(p) for p in doc_passages])
+        return {"upserted": len(docs), "passages": len(points), "embedded": encoded}
+
+    # -----------------------------------------------------
+    # Incremental sync
+    # -----------------------------------------------------
+    def existing_state(self) -> Tuple[Dict[str, Optional[str]], Dict[str, List]]:
+        """
+        Returns (url → "content_hash/chunking", url → point ids).
+        content_hash가 없는 구버전 포인트는 None이 되어 다시 인덱싱됩니다.
+        """
+        versions, point_ids = {}, {}
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=self.collection_name,
+                limit=1000,
+                offset=offset,
+                with_payload=["url", "content_hash", "chunking"],
+                with_vectors=False
+            )
+            for p in points:
+                payload = p.payload or {}
+                url = payload.get("url")
+                if url is None:
+                    continue
+                version = f"{payload['content_hash']}/{payload.get('chunking')}" if payload.get("content_hash") else None
+                if versions.get(url, version) != version:
+                    # 패시지끼리 버전이 다르면 (중단된 인덱싱 등) 다시 인덱싱
+                    version = None
+                versions[url] = version
+                point_ids.setdefault(url, []).append(p.id)
+            if offset is None:
+                break
+        return versions, point_ids
+
+    def sync(self, data_dir: Optional[str] = None, delete_missing: bool = True) -> Dict:
+        start_time = time.perf_counter()
+        versions, point_ids = self.existing_state()
+        seen = set()
+        stats = {"seen": 0, "unchanged": 0, "upserted": 0, "passages": 0, "embedded": 0, "deleted": 0}
+
+        pending = []
+        for doc in iter_notices(data_dir):
+            seen.add(doc["url"])
+            stats["seen"] += 1
+            if versions.get(doc["url"]) == f"{content_hash(doc, self.model_version)}/{self.chunking}":
+                stats["unchanged"] += 1
+                continue
+            pending.append(doc)
+            if len(pending) >= self.flush_size:
+                for key, value in self.index_documents(pending).items():
+                    stats[key] += value
+                pending = []
+                print(f"[Ingest] {stats['seen']} seen, {stats['upserted']} upserted...", end="\r")
+        if pending:
+            for key, value in self.index_documents(pending).items():
+                stats[key] += value
+
+        if delete_missing:
+            stale_urls = [url for url in point_ids if url not in seen]
+            stale = [pid for url in stale_urls for pid in point_ids[url]]
+            for start in range(0, len(stale), 1000):
+                self.client.delete(
+                    collection_name=self.collection_name,
+                    points_selector=models.PointIdsList(points=stale[start:start + 1000]),
+                    wait=True
+                )
+            stats["deleted"] = len(stale_urls)
+
+        stats["seconds"] = round(time.perf_counter() - start_time, 1)
+        print(f"\n[Ingest] {self.collection_name}: {stats}")
+        return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incrementally sync data/*.jsonl into the Qdrant notice collection")
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR)
+    parser.add_argument("--store", default=os.getenv("EMBEDDING_STORE_PATH", "./embedding_store.sqlite"))
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--passage-chars", type=int, default=PASSAGE_CHARS)
+    parser.add_argument("--passage-overlap", type=int, default=PASSAGE_OVERLAP)
+    parser.add_argument("--no-delete", action="store_true", help="코퍼스에 없는 포인트를 삭제하지 않음")
+    parser.add_argument("--bulk", action="store_true", help="멀티프로세스 dense 인코딩 (전체 재색인/모델 교체 시)")
+    parser.add_argument("--workers", type=int, default=None, help="--bulk 워커 프로세스 수")
+    parser.add_argument("--threads", type=int, default=None, help="--bulk 워커당 intra-op 스레드 수")
+    args = parser.parse_args()
+
+    # 인제스트는 배치 인코딩을 직접 하므로 쿼리용 캐시/배칭/로컬 폴백이 필요 없음
+    os.environ.setdefault("EMBED_CACHE_ENABLED", "0")
+    os.environ.setdefault("ENCODER_MAX_WAIT_MS", "0")
+    os.environ.setdefault("LOCAL_INDEX_FALLBACK", "0")
+
+    from app.lib.knu_notice_retriever import KNUSearcher
+    from app.lib.knu_collection_manager import CollectionManager
+
+    searcher = KNUSearcher()
+    CollectionManager(searcher.client, searcher.collection_name).ensure()
+
+    bulk_embedder = None
+    if args.bulk:
+        from app.lib.knu_bulk_embed import BulkEmbedder
+        bulk_embedder = BulkEmbedder(searcher.model_path, args.workers, args.threads)
+
+    store = EmbeddingStore(args.store)
+    pipeline = IngestionPipeline(
+        searcher, searcher.client, searcher.collection_name, store, args.batch_size, bulk_embedder,
+        args.passage_chars, args.passage_overlap
+    )
+    stats = pipeline.sync(args.data_dir, delete_missing=not args.no_delete)
+    store.close()
+    if stats["upserted"] or stats["deleted"]:
+        # 공지가 바뀌었으면 NOTICE 응답 캐시 무효화
+        from app.lib.knu_response_cache import bump_data_version_from_env
+        bump_data_version_from_env("notice")
+
+    if searcher.tier_policy is not None:
+        # 새로 들어온 공지가 다음 야간 배치 전에도 hot 컬렉션에서 검색되도록
+        from app.lib.knu_tiering import TierManager
+        policy = searcher.tier_policy
+        TierManager(searcher.client, searcher.collection_name, policy.hot_collection, policy.window_days).sync()
+    if bulk_embedder:
+        bulk_embedder.close()
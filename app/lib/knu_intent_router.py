@@ -0,0 +1,344 @@
+import os
+import re
+import json
+import asyncio
+import random
+import argparse
+import threading
+import numpy as np
+from collections import Counter
+from typing import Dict, List, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+INTENTS = ("NOTICE", "ACADEMIC", "TIMETABLE", "LIFESTYLE", "CHITCHAT")
+
+# 로컬 분류 확신 기준 (BGE-M3 cosine 기준)
+DEFAULT_MIN_SIMILARITY = 0.55   # 최근접 centroid와의 유사도 하한
+DEFAULT_MIN_MARGIN = 0.05       # 1위와 2위 centroid 유사도 차이 하한
+
+# 키워드 규칙: 해당 의도를 강하게 시사하는 표현
+KEYWORD_RULES = {
+    "NOTICE": re.compile(r"공지|안내|장학|모집|신청\s*기간|마감|일정|행사|채용|공모|접수"),
+    "ACADEMIC": re.compile(r"졸업\s*(요건|학점|인증|논문)?|전공\s*(필수|선택)|교양\s*(필수|학점)|이수\s*(학점|요건)?|복수\s*전공|부전공|학사\s*규정"),
+    "TIMETABLE": re.compile(r"시간표|공강|수강\s*조합|몇\s*학점\s*들"),
+    "LIFESTYLE": re.compile(r"학식|메뉴|식당|맛집|밥\s*(뭐|어디)|카페|점심|저녁"),
+    "CHITCHAT": re.compile(r"^\s*(안녕|하이|ㅎㅇ|고마워|감사|ㅋㅋ|ㅎㅎ|잘\s*가|반가워)")
+}
+
+# centroid 초기값을 만드는 예시 발화 (INTENT_EXAMPLES_PATH의 라벨 데이터로 보강 가능)
+SEED_EXAMPLES = {
+    "NOTICE": [
+        "이번 학기 장학금 신청 기간 알려줘",
+        "컴퓨터학부 최근 공지사항 뭐 있어?",
+        "계절학기 수강신청 언제야",
+        "교환학생 모집 공고 있어?",
+        "등록금 납부 기간이 언제까지야",
+        "취업 특강 일정 알려줘",
+        "기숙사 입사 신청 안내",
+        "휴학 신청은 어떻게 해?"
+    ],
+    "ACADEMIC": [
+        "졸업하려면 몇 학점 필요해?",
+        "전공필수 과목 뭐 들어야 돼",
+        "졸업 요건 알려줘",
+        "복수전공 이수 조건이 뭐야",
+        "교양 필수 학점은 몇 학점이야",
+        "졸업 인증 요건 중에 영어 성적 기준",
+        "부전공 하려면 몇 학점 들어야 해",
+        "캡스톤디자인 필수야?"
+    ],
+    "TIMETABLE": [
+        "금요일 공강으로 시간표 짜줘",
+        "18학점 시간표 만들어줘",
+        "오전 수업 없는 시간표 추천해줘",
+        "3학년 전공 위주로 시간표 구성해줘",
+        "월수금만 학교 가는 시간표 가능해?",
+        "점심시간 비워서 시간표 짜줘"
+    ],
+    "LIFESTYLE": [
+        "오늘 학식 메뉴 뭐야",
+        "복지관 점심 메뉴 알려줘",
+        "학교 근처 맛집 추천해줘",
+        "북문 쪽에 밥 먹을 데 있어?",
+        "기숙사 식당 저녁 뭐 나와",
+        "조용한 카페 추천해줘"
+    ],
+    "CHITCHAT": [
+        "안녕",
+        "고마워",
+        "너는 누구야?",
+        "심심해",
+        "오늘 기분이 좀 안 좋아",
+        "좋은 하루 보내"
+    ]
+}
+
+
+class IntentRouter:
+    """
+    LLM 앞단의 로컬 의도 분류기.
+    1. 키워드 규칙으로 후보 의도를 찾고
+    2. 검색 엔진의 BGE-M3 쿼리 임베딩(임베딩 캐시 공유)으로 의도별 centroid와 cosine 유사도를 계산
+    3. 확신이 충분하면 바로 의도를 반환하고, 아니면 None (→ router_node가 LLM 호출)
+    NOTICE로 분류된 메시지는 원문 그대로 검색되므로 임베딩 캐시 hit으로 재인코딩도 생략됩니다.
+    """
+    def __init__(self, searcher, examples: Optional[Dict[str, List[str]]] = None,
+                 min_similarity: float = DEFAULT_MIN_SIMILARITY, min_margin: float = DEFAULT_MIN_MARGIN):
+        self.searcher = searcher
+        self.examples = examples or SEED_EXAMPLES
+        self.min_similarity = min_similarity
+        self.min_margin = min_margin
+        self._centroids = None
+        self._lock = threading.Lock()
+        self.counters = {"rule": Counter(), "centroid": Counter(), "keyword": Counter(), "llm": Counter()}
+        # shadow 비교 (로컬 결정 vs LLM): intent → [agree, total]
+        self.shadow = {intent: [0, 0] for intent in INTENTS}
+
+    @classmethod
+    def from_env(cls, searcher) -> Optional["IntentRouter"]:
+        if os.getenv("INTENT_ROUTER", "1") != "1":
+            return None
+        examples = None
+        path = os.getenv("INTENT_EXAMPLES_PATH")
+        if path and os.path.exists(path):
+            examples = {intent: list(texts) for intent, texts in SEED_EXAMPLES.items()}
+            for row in load_labeled(path):
+                examples.setdefault(row["intent"], []).append(row["query"])
+        return cls(
+            searcher,
+            examples=examples,
+            min_similarity=float(os.getenv("INTENT_MIN_SIMILARITY", str(DEFAULT_MIN_SIMILARITY))),
+            min_margin=float(os.getenv("INTENT_MIN_MARGIN", str(DEFAULT_MIN_MARGIN)))
+        )
+
+    # -----------------------------------------------------
+    # Centroids
+    # -----------------------------------------------------
+    @property
+    def centroids(self) -> np.ndarray:
+        """(len(INTENTS), dim) L2 정규화된 의도별 평균 임베딩 (처음 사용할 때 한 번 계산)"""
+        if self._centroids is None:
+            with self._lock:
+                if self._centroids is None:
+                    rows = []
+                    for intent in INTENTS:
+                        vecs = self.searcher._encode_dense_batch(self.examples[intent])
+                        mean = vecs.mean(axis=0)
+                        rows.append(mean / (np.linalg.norm(mean) + 1e-12))
+                    self._centroids = np.stack(rows).astype(np.float32)
+        return self._centroids
+
+    def _query_vector(self, text: str) -> Optional[np.ndarray]:
+        """
+        검색과 같은 경로 (임베딩 캐시 → ONNX)로 인코딩해 NOTICE 검색 시 캐시를 재사용.
+        ONNX 인코딩도 degradation ladder의 in-flight로 집계하고, 과부하(sparse/cached)면
+        인코딩하지 않고 None을 반환합니다 (키워드 규칙 또는 LLM 라우팅으로 대체).
+        """
+        searcher = self.searcher
+        ladder = searcher.degradation
+        if ladder is None:
+            dense_vec, _, _ = searcher._encode_query(text)
+        else:
+            ladder.enter()
+            try:
+                dense_vec = searcher._encode_adaptive(text)[0]
+            finally:
+                ladder.exit()
+        if dense_vec is None:
+            return None
+        return np.asarray(dense_vec, dtype=np.float32)
+
+    # -----------------------------------------------------
+    # Classification
+    # -----------------------------------------------------
+    @staticmethod
+    def keyword_intents(text: str) -> Dict[str, str]:
+        """intent → 매칭된 키워드"""
+        matches = {}
+        for intent, pattern in KEYWORD_RULES.items():
+            m = pattern.search(text)
+            if m:
+                matches[intent] = m.group(0).strip()
+        return matches
+
+    @staticmethod
+    def tool_args(intent: str, text: str, keywords: Dict[str, str]) -> Optional[str]:
+        """LLM이 만들던 tool 인자를 로컬에서 구성합니다 (ACADEMIC은 그래프 CONTAINS 검색용 키워드)."""
+        if intent == "ACADEMIC":
+            return keywords.get("ACADEMIC")
+        if intent in ("NOTICE", "LIFESTYLE"):
+            return text
+        return None
+
+    def classify(self, text: str) -> Optional[Dict]:
+        """
+        Returns {"intent", "args", "source", "similarity", "margin"} 또는 None (LLM으로 escalate).
+        source: "rule" (키워드 + centroid 동의) / "centroid" (임베딩만으로 확신)
+                / "keyword" (과부하로 임베딩을 생략, 키워드가 한 의도만 가리킬 때)
+        """
+        return self._decide(text, self._query_vector(text))
+
+    async def aclassify(self, text: str) -> Optional[Dict]:
+        """
+        classify의 async 버전. dense 인코딩을 검색 엔진의 batch_encoder에 직접 제출하므로
+        encode executor 스레드를 점유하지 않고 동시 요청이 한 배치로 묶입니다.
+        """
+        searcher = self.searcher
+        if self._centroids is None:
+            # 최초 1회 예시 발화 인코딩은 executor에서
+            await asyncio.get_running_loop().run_in_executor(searcher.encode_executor, lambda: self.centroids)
+        ladder = searcher.degradation
+        if ladder is not None:
+            ladder.enter()
+        try:
+            dense_vec = (await searcher._aencode_adaptive(text))[0]
+        finally:
+            if ladder is not None:
+                ladder.exit()
+        query_vec = None if dense_vec is None else np.asarray(dense_vec, dtype=np.float32)
+        return self._decide(text, query_vec)
+
+    def _decide(self, text: str, query_vec: Optional[np.ndarray]) -> Optional[Dict]:
+        keywords = self.keyword_intents(text)
+        if query_vec is None:
+            if len(keywords) != 1:
+                return None
+            intent = next(iter(keywords))
+            args = self.tool_args(intent, text, keywords)
+            if intent == "ACADEMIC" and not args:
+                return None
+            return {"intent": intent, "args": args, "source": "keyword", "similarity": None, "margin": None}
+
+        sims = self.centroids @ query_vec
+        order = np.argsort(-sims)
+        top = INTENTS[order[0]]
+        similarity = float(sims[order[0]])
+        margin = float(sims[order[0]] - sims[order[1]])
+        confident = similarity >= self.min_similarity and margin >= self.min_margin
+
+        intent, source = None, None
+        if len(keywords) == 1:
+            # 키워드가 한 의도만 가리키면 centroid 1위와 같을 때만 채택 (안내/일정/저녁 같은 넓은 키워드 단독은 LLM으로)
+            candidate = next(iter(keywords))
+            if candidate == top:
+                intent, source = candidate, "rule"
+        elif keywords:
+            # 여러 의도의 키워드가 섞이면 centroid 1위가 그중 하나일 때만 채택
+            if top in keywords and margin >= self.min_margin:
+                intent, source = top, "rule"
+        elif confident:
+            intent, source = top, "centroid"
+
+        if intent is None:
+            return None
+        args = self.tool_args(intent, text, keywords)
+        if intent == "ACADEMIC" and not args:
+            # 그래프 검색 키워드를 뽑지 못하면 LLM에 맡김
+            return None
+        return {"intent": intent, "args": args, "source": source, "similarity": similarity, "margin": margin}
+
+    # -----------------------------------------------------
+    # Metrics
+    # -----------------------------------------------------
+    def record(self, source: str, intent: str):
+        self.counters[source][intent] += 1
+
+    def record_shadow(self, local_intent: str, llm_intent: str):
+        """로컬 결정을 LLM 결과와 비교 (INTENT_SHADOW_RATE 비율만큼 샘플링)"""
+        stats = self.shadow.setdefault(local_intent, [0, 0])
+        stats[0] += int(local_intent == llm_intent)
+        stats[1] += 1
+
+    def stats(self) -> Dict:
+        local = sum(sum(self.counters[source].values()) for source in ("rule", "centroid", "keyword"))
+        escalated = sum(self.counters["llm"].values())
+        total = local + escalated
+        return {
+            "total": total,
+            "fallback_rate": round(escalated / total, 4) if total else 0.0,
+            "by_source": {source: dict(counts) for source, counts in self.counters.items()},
+            "shadow_accuracy": {
+                intent: {"agree": agree, "total": n, "accuracy": round(agree / n, 4) if n else None}
+                for intent, (agree, n) in self.shadow.items()
+            }
+        }
+
+
+def load_labeled(path: str) -> List[Dict]:
+    """{"query": ..., "intent": ...} JSONL"""
+    rows = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            row = json.loads(line)
+            if row.get("intent") in INTENTS and row.get("query"):
+                rows.append(row)
+    return rows
+
+
+def evaluate(router: IntentRouter, rows: List[Dict]) -> Dict:
+    """
+    라벨 데이터에 대한 의도별 로컬 정확도와 LLM 폴백 비율.
+    accuracy: 로컬에서 결정한 것 중 정답 비율, coverage: 로컬에서 결정한 비율
+    """
+    per_intent = {intent: {"total": 0, "local": 0, "correct": 0} for intent in INTENTS}
+    for row in rows:
+        stats = per_intent[row["intent"]]
+        stats["total"] += 1
+        decision = router.classify(row["query"])
+        if decision is None:
+            continue
+        stats["local"] += 1
+        stats["correct"] += int(decision["intent"] == row["intent"])
+
+    report = {}
+    for intent, s in per_intent.items():
+        report[intent] = {
+            **s,
+            "accuracy": round(s["correct"] / s["local"], 4) if s["local"] else None,
+            "coverage": round(s["local"] / s["total"], 4) if s["total"] else None
+        }
+    total = sum(s["total"] for s in per_intent.values())
+    local = sum(s["local"] for s in per_intent.values())
+    correct = sum(s["correct"] for s in per_intent.values())
+    report["overall"] = {
+        "total": total,
+        "accuracy": round(correct / local, 4) if local else None,
+        "fallback_rate": round(1 - local / total, 4) if total else None
+    }
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate the local intent router on labeled queries")
+    parser.add_argument("labeled", help='JSONL with {"query": ..., "intent": ...} per line')
+    parser.add_argument("--min-similarity", type=float, default=DEFAULT_MIN_SIMILARITY)
+    parser.add_argument("--min-margin", type=float, default=DEFAULT_MIN_MARGIN)
+    parser.add_argument("--holdout", type=float, default=0.5, help="centroid 보강에 쓰지 않고 평가에만 쓸 비율")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    os.environ.setdefault("EMBED_CACHE_ENABLED", "0")
+    os.environ.setdefault("ENCODER_MAX_WAIT_MS", "0")
+    # 평가 중 부하로 임베딩이 생략되면 centroid 정확도가 측정되지 않음
+    os.environ.setdefault("SEARCH_DEGRADATION", "0")
+    from app.tools.retrieval import get_searcher
+
+    rows = load_labeled(args.labeled)
+    random.Random(args.seed).shuffle(rows)
+    split = int(len(rows) * (1 - args.holdout))
+    examples = {intent: list(texts) for intent, texts in SEED_EXAMPLES.items()}
+    for row in rows[:split]:
+        examples[row["intent"]].append(row["query"])
+
+    router = IntentRouter(get_searcher(), examples, args.min_similarity, args.min_margin)
+    report = evaluate(router, rows[split:])
+    print(f"[Router] Evaluated {report['overall']['total']} held-out queries "
+          f"(accuracy={report['overall']['accuracy']}, fallback_rate={report['overall']['fallback_rate']})")
+    for intent in INTENTS:
+        r = report[intent]
+        print(f"   {intent:<10} n={r['total']:<4} coverage={r['coverage']}  accuracy={r['accuracy']}")
@@ -0,0 +1,315 @@
+import os
+import json
+import mmap
+import time
+import shutil
+import argparse
+import numpy as np
+from typing import List, Dict, Optional, Tuple
+
+from app.lib.knu_corpus import (
+    DEFAULT_DATA_DIR, PASSAGE_CHARS, PASSAGE_OVERLAP,
+    iter_notices, split_passages, passage_text, passage_payload
+)
+
+# Qdrant의 RRF 기본 상수와 동일하게 맞춤
+RRF_K = 2
+# Dense 점수 계산 시 한 번에 float32로 변환하는 행 수 (임시 메모리 제한)
+DENSE_CHUNK_ROWS = 4096
+
+
+class LocalHybridIndex:
+    """
+    Embedded hybrid index (Qdrant 대체/폴백용 로컬 백엔드).
+    - Dense: memory-mapped float16 또는 int8(행 단위 scale) 행렬
+    - Sparse: mmh3 term id 기준 inverted index (CSR 형태의 정렬 배열)
+    - Dept 필터: 미리 계산한 행 마스크
+    - Fusion: Qdrant와 동일한 RRF
+    - 행 = 패시지, 결과는 공지(부모)당 최고 점수 패시지 1개로 접음
+    """
+    def __init__(self, index_dir: str):
+        self.index_dir = index_dir
+
+        with open(os.path.join(index_dir, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.model_version = self.meta.get("model_version")
+        self.dtype = self.meta["dtype"]
+
+        # 1. Dense (mmap)
+        self.dense = np.load(os.path.join(index_dir, "dense.npy"), mmap_mode="r")
+        self.dense_scale = None
+        if self.dtype == "int8":
+            self.dense_scale = np.load(os.path.join(index_dir, "dense_scale.npy"))
+
+        # 2. Sparse inverted index (mmap)
+        self.sparse_terms = np.load(os.path.join(index_dir, "sparse_terms.npy"), mmap_mode="r")
+        self.sparse_offsets = np.load(os.path.join(index_dir, "sparse_offsets.npy"), mmap_mode="r")
+        self.sparse_docs = np.load(os.path.join(index_dir, "sparse_docs.npy"), mmap_mode="r")
+        self.sparse_values = np.load(os.path.join(index_dir, "sparse_values.npy"), mmap_mode="r")
+
+        # 3. Payloads (jsonl을 mmap 하고 행별 byte offset으로 필요할 때만 파싱)
+        self.doc_offsets = np.load(os.path.join(index_dir, "doc_offsets.npy"))
+        self._docs_file = open(os.path.join(index_dir, "docs.jsonl"), "rb")
+        self._docs_mmap = mmap.mmap(self._docs_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        # 4. Dept 행 마스크
+        dept_codes = np.load(os.path.join(index_dir, "dept_codes.npy"))
+        self.dept_masks = {
+            dept: dept_codes == code for code, dept in enumerate(self.meta["depts"])
+        }
+
+        # 5. 패시지 → 공지 매핑 (패시지 분할 이전 인덱스에는 없음: 행 = 공지)
+        self.parents, self.doc_rows = None, None
+        if os.path.exists(os.path.join(index_dir, "parents.npy")):
+            self.parents = np.load(os.path.join(index_dir, "parents.npy"))
+            self.doc_rows = np.load(os.path.join(index_dir, "doc_rows.npy"))
+
+        num_docs = self.meta.get("num_docs", len(self))
+        print(f"[System] Local index loaded: {index_dir} ({num_docs} docs, {len(self)} passages, {self.dtype})")
+
+    def __len__(self):
+        return int(self.dense.shape[0])
+
+    @classmethod
+    def load(cls, index_dir: str) -> Optional["LocalHybridIndex"]:
+        if not os.path.exists(os.path.join(index_dir, "meta.json")):
+            return None
+        return cls(index_dir)
+
+    def close(self):
+        self._docs_mmap.close()
+        self._docs_file.close()
+
+    # -----------------------------------------------------
+    # Query
+    # -----------------------------------------------------
+    def _row_mask(self, target_dept: Optional[str]) -> Optional[np.ndarray]:
+        if not target_dept or target_dept == "공통":
+            return None
+        mask = self.dept_masks.get(target_dept)
+        if mask is None:
+            # 존재하지 않는 학과: Qdrant 필터와 동일하게 결과 없음
+            return np.zeros(len(self), dtype=bool)
+        return mask
+
+    def _dense_scores(self, dense_vec) -> np.ndarray:
+        q = np.asarray(dense_vec, dtype=np.float32)
+        scores = np.empty(len(self), dtype=np.float32)
+        for start in range(0, len(self), DENSE_CHUNK_ROWS):
+            block = np.asarray(self.dense[start:start + DENSE_CHUNK_ROWS], dtype=np.float32)
+            scores[start:start + len(block)] = block @ q
+        if self.dense_scale is not None:
+            scores *= self.dense_scale
+        return scores
+
+    def _sparse_scores(self, sp_indices, sp_values) -> Optional[np.ndarray]:
+        if not sp_indices:
+            return None
+        scores = np.zeros(len(self), dtype=np.float32)
+        terms = np.asarray(sp_indices, dtype=np.uint32)
+        positions = np.searchsorted(self.sparse_terms, terms)
+        for pos, term, q_val in zip(positions, terms, sp_values):
+            if pos >= len(self.sparse_terms) or self.sparse_terms[pos] != term:
+                continue
+            lo, hi = self.sparse_offsets[pos], self.sparse_offsets[pos + 1]
+            # 한 term의 posting 안에서 문서는 중복되지 않으므로 fancy-index 누적이 안전
+            scores[self.sparse_docs[lo:hi]] += q_val * self.sparse_values[lo:hi]
+        return scores
+
+    @staticmethod
+    def _top_rows(scores: np.ndarray, mask: Optional[np.ndarray], limit: int, require_positive: bool = False) -> np.ndarray:
+        candidates = np.ones(len(scores), dtype=bool) if mask is None else mask.copy()
+        if require_positive:
+            candidates &= scores > 0
+        rows = np.flatnonzero(candidates)
+        if len(rows) > limit:
+            part = np.argpartition(-scores[rows], limit - 1)[:limit]
+            rows = rows[part]
+        return rows[np.argsort(-scores[rows], kind="stable")]
+
+    def search(self, dense_vec, sp_indices=None, sp_values=None, target_dept: str = None,
+               final_k: int = 10, prefetch_limit: int = 50) -> List[Tuple[int, float]]:
+        """
+        Hybrid 검색 후 RRF로 융합한 (row, score) 리스트를 반환합니다 (공지당 최고 패시지 1개).
+        dense_vec=None 이면 sparse 결과만 사용합니다 (과부하 시 sparse-only 모드).
+        """
+        mask = self._row_mask(target_dept)
+        ranked_lists = []
+        if dense_vec is not None:
+            ranked_lists.append(self._top_rows(self._dense_scores(dense_vec), mask, prefetch_limit))
+
+        sparse_scores = self._sparse_scores(sp_indices, sp_values)
+        if sparse_scores is not None:
+            ranked_lists.append(self._top_rows(sparse_scores, mask, prefetch_limit, require_positive=True))
+
+        fused: Dict[int, float] = {}
+        for rows in ranked_lists:
+            for rank, row in enumerate(rows):
+                fused[int(row)] = fused.get(int(row), 0.0) + 1.0 / (rank + RRF_K)
+
+        ranked = sorted(fused.items(), key=lambda x: -x[1])
+        if self.parents is None:
+            return ranked[:final_k]
+
+        seen, collapsed = set(), []
+        for row, score in ranked:
+            parent = int(self.parents[row])
+            if parent in seen:
+                continue
+            seen.add(parent)
+            collapsed.append((row, score))
+            if len(collapsed) >= final_k:
+                break
+        return collapsed
+
+    def payload(self, row: int) -> Dict:
+        start, end = int(self.doc_offsets[row]), int(self.doc_offsets[row + 1])
+        return json.loads(self._docs_mmap[start:end].decode("utf-8"))
+
+    def full_payload(self, row: int) -> Dict:
+        """패시지 행이면 같은 공지의 0번 패시지(전체 본문)와 합쳐 반환합니다."""
+        payload = self.payload(row)
+        if self.parents is None or payload.get("chunk_index", 0) == 0:
+            return payload
+        return {**self.payload(int(self.doc_rows[self.parents[row]])), **payload}
+
+    # -----------------------------------------------------
+    # Build
+    # -----------------------------------------------------
+    @staticmethod
+    def build(searcher, index_dir: str, data_dir: Optional[str] = None,
+              dtype: str = "float16", batch_size: int = 32,
+              passage_chars: int = PASSAGE_CHARS, passage_overlap: int = PASSAGE_OVERLAP) -> int:
+        """
+        data/*.jsonl 전체를 패시지로 나눠 인코딩하고 로컬 인덱스를 생성합니다 (Qdrant 인제스트와 같은 분할).
+        Sparse 문서 벡터는 쿼리와 같은 Kiwi + mmh3 해싱을 쓰는 searcher.sparse_encoder로 만듭니다.
+        """
+        if dtype not in ("float16", "int8"):
+            raise ValueError("dtype must be 'float16' or 'int8'")
+        # 기존 인덱스를 mmap 중인 프로세스가 있을 수 있으므로 임시 폴더에 빌드 후 교체
+        final_dir = index_dir
+        index_dir = final_dir.rstrip("/") + ".building"
+        shutil.rmtree(index_dir, ignore_errors=True)
+        os.makedirs(index_dir)
+
+        start_time = time.perf_counter()
+        dense_rows = []
+        post_terms, post_docs, post_values = [], [], []
+        dept_index: Dict[str, int] = {}
+        dept_codes = []
+        doc_offsets = [0]
+        parents, doc_rows = [], []
+
+        with open(os.path.join(index_dir, "docs.jsonl"), "wb") as docs_out:
+            batch = []
+
+            def flush(batch):
+                texts = [passage_text(doc, passage) for doc, passage, _ in batch]
+                dense_rows.append(searcher._encode_dense_batch(texts).astype(np.float32))
+                sparse_vecs = searcher.sparse_encoder.encode_documents(texts)
+                for (doc, passage, num_chunks), (indices, values) in zip(batch, sparse_vecs):
+                    row = len(dept_codes)
+                    if indices:
+                        post_terms.extend(indices)
+                        post_docs.extend([row] * len(indices))
+                        post_values.extend(values)
+
+                    dept = doc.get("dept", "공통")
+                    dept_codes.append(dept_index.setdefault(dept, len(dept_index)))
+
+                    if passage["chunk_index"] == 0:
+                        doc_rows.append(row)
+                    parents.append(len(doc_rows) - 1)
+
+                    payload = passage_payload(doc, passage, num_chunks)
+                    line = (json.dumps(payload, ensure_ascii=False) + "\n").encode("utf-8")
+                    docs_out.write(line)
+                    doc_offsets.append(doc_offsets[-1] + len(line))
+
+            for doc in iter_notices(data_dir):
+                passages = split_passages(doc.get("content", ""), passage_chars, passage_overlap)
+                batch.extend((doc, passage, len(passages)) for passage in passages)
+                if len(batch) >= batch_size:
+                    flush(batch)
+                    batch = []
+                    print(f"[Index] Encoded {len(doc_rows)} docs ({len(dept_codes)} passages)...", end="\r")
+            if batch:
+                flush(batch)
+
+        if not dept_codes:
+            raise ValueError(f"No documents found in {data_dir or DEFAULT_DATA_DIR}")
+
+        # 1. Dense
+        dense = np.concatenate(dense_rows)
+        if dtype == "int8":
+            scale = np.abs(dense).max(axis=1) / 127.0
+            scale[scale == 0] = 1.0
+            np.save(os.path.join(index_dir, "dense.npy"), np.round(dense / scale[:, None]).astype(np.int8))
+            np.save(os.path.join(index_dir, "dense_scale.npy"), scale.astype(np.float32))
+        else:
+            np.save(os.path.join(index_dir, "dense.npy"), dense.astype(np.float16))
+
+        # 2. Sparse (term → postings, CSR)
+        terms = np.asarray(post_terms, dtype=np.uint32)
+        docs = np.asarray(post_docs, dtype=np.int32)
+        values = np.asarray(post_values, dtype=np.float32)
+        order = np.lexsort((docs, terms))
+        terms, docs, values = terms[order], docs[order], values[order]
+        unique_terms, first_pos = np.unique(terms, return_index=True)
+        offsets = np.append(first_pos, len(terms)).astype(np.int64)
+
+        np.save(os.path.join(index_dir, "sparse_terms.npy"), unique_terms)
+        np.save(os.path.join(index_dir, "sparse_offsets.npy"), offsets)
+        np.save(os.path.join(index_dir, "sparse_docs.npy"), docs)
+        np.save(os.path.join(index_dir, "sparse_values.npy"), values)
+
+        # 3. Payload offsets / Dept codes
+        np.save(os.path.join(index_dir, "doc_offsets.npy"), np.asarray(doc_offsets, dtype=np.int64))
+        np.save(os.path.join(index_dir, "dept_codes.npy"), np.asarray(dept_codes, dtype=np.int16))
+        np.save(os.path.join(index_dir, "parents.npy"), np.asarray(parents, dtype=np.int32))
+        np.save(os.path.join(index_dir, "doc_rows.npy"), np.asarray(doc_rows, dtype=np.int32))
+
+        # meta.json은 마지막에 기록 (존재 여부로 빌드 완료를 판단)
+        meta = {
+            "model_version": searcher.model_version,
+            "dim": int(dense.shape[1]),
+            "dtype": dtype,
+            "count": len(dept_codes),
+            "num_docs": len(doc_rows),
+            "chunking": f"{passage_chars}:{passage_overlap}",
+            "depts": list(dept_index.keys()),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S")
+        }
+        with open(os.path.join(index_dir, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+
+        old_dir = final_dir.rstrip("/") + ".old"
+        shutil.rmtree(old_dir, ignore_errors=True)
+        if os.path.exists(final_dir):
+            os.rename(final_dir, old_dir)
+        os.rename(index_dir, final_dir)
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+        elapsed = time.perf_counter() - start_time
+        print(f"\n[Index] Built {len(doc_rows)} docs ({len(dept_codes)} passages), {len(unique_terms)} terms in {elapsed:.1f}s → {final_dir}")
+        return len(dept_codes)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the embedded local hybrid index")
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR)
+    parser.add_argument("--out", default=os.getenv("LOCAL_INDEX_DIR", "./local_index"))
+    parser.add_argument("--dtype", choices=["float16", "int8"], default="float16")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--passage-chars", type=int, default=PASSAGE_CHARS)
+    parser.add_argument("--passage-overlap", type=int, default=PASSAGE_OVERLAP)
+    args = parser.parse_args()
+
+    # 인덱스 빌드에는 Qdrant 연결이 필요 없음
+    os.environ.setdefault("SEARCH_BACKEND", "local")
+    from app.lib.knu_notice_retriever import KNUSearcher
+
+    LocalHybridIndex.build(
+        KNUSearcher(), args.out, args.data_dir, args.dtype, args.batch_size,
+        args.passage_chars, args.passage_overlap
+    )
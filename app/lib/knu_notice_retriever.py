@@ -1,155 +1,523 @@
 import os
 import time
+import asyncio
+import queue
+import threading
 import numpy as np
-import mmh3
-import torch
-from kiwipiepy import Kiwi
-from collections import Counter
-from qdrant_client import QdrantClient, models
+import glob
+import onnxruntime as ort
+from concurrent.futures import Future, ThreadPoolExecutor
+from qdrant_client import QdrantClient, AsyncQdrantClient, models
 from transformers import AutoTokenizer
-from optimum.onnxruntime import ORTModelForFeatureExtraction
 from onnxruntime import SessionOptions
 from typing import List, Dict, Optional, Tuple
 from dotenv import load_dotenv
+from app.lib.knu_embedding_cache import QueryEmbeddingCache, normalize_query
+from app.lib.knu_local_index import LocalHybridIndex
+from app.lib.knu_sparse_encoder import SparseEncoder
+from app.lib.knu_corpus import make_snippet, point_id
+from app.lib.knu_tiering import TierPolicy
+from app.lib.knu_encoder_tuning import resolve_encoder_config, make_session_options
+from app.lib.knu_degradation import DegradationLadder, MODE_HYBRID, MODE_SPARSE, MODE_CACHED
+from app.core.singleflight import SingleFlight, AsyncSingleFlight
 
 # .env 파일 로드 
 load_dotenv()
 
+# 검색 hot path에서 가져오는 payload 필드 (본문/이미지/첨부는 fetch_full로 별도 조회)
+SEARCH_PAYLOAD_FIELDS = ["url", "title", "dept", "detail", "date", "snippet", "passage", "chunk_index", "chunk_start", "chunk_end"]
+# 패시지 포인트를 공지 단위로 묶는 필드 (공지당 가장 잘 맞는 패시지 1개)
+GROUP_BY_FIELD = "url"
+# group API가 없는 batch 질의에서 중복 공지를 걸러낼 여유분
+BATCH_GROUP_OVERSAMPLING = 3
+
+class ThreadedAsyncClient:
+    """
+    주입된 동기 QdrantClient를 AsyncQdrantClient 대신 쓰기 위한 어댑터 (메서드 호출을 스레드에서 실행).
+    in-memory/로컬 클라이언트는 URL로 다시 만들 수 없으므로 같은 인스턴스를 공유해야 합니다.
+    """
+    def __init__(self, client: QdrantClient):
+        self._client = client
+
+    def __getattr__(self, name):
+        method = getattr(self._client, name)
+
+        async def call(*args, **kwargs):
+            return await asyncio.to_thread(method, *args, **kwargs)
+        return call
+
+    async def close(self):
+        # 주입한 쪽이 클라이언트 수명을 관리
+        pass
+
+class DenseEncoder:
+    """
+    BGE-M3 ONNX dense encoder.
+    torch 없이 numpy 텐서를 onnxruntime 세션에 바로 넣고, L2 정규화도 numpy로 수행합니다.
+    """
+    # 양자화 모델을 우선 사용
+    MODEL_FILE_CANDIDATES = ("model_quantized.onnx", "model.onnx", "onnx/model_quantized.onnx", "onnx/model.onnx")
+
+    def __init__(self, model_path: str, sess_options: Optional[SessionOptions] = None, max_length: int = 512):
+        self.model_path = model_path
+        self.max_length = max_length
+        self.tokenizer = AutoTokenizer.from_pretrained(model_path)
+        self.session = ort.InferenceSession(
+            self.find_model_file(model_path),
+            sess_options=sess_options,
+            providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        output_names = [o.name for o in self.session.get_outputs()]
+        self.output_name = "last_hidden_state" if "last_hidden_state" in output_names else output_names[0]
+
+    @classmethod
+    def find_model_file(cls, model_path: str) -> str:
+        for name in cls.MODEL_FILE_CANDIDATES:
+            candidate = os.path.join(model_path, name)
+            if os.path.exists(candidate):
+                return candidate
+        found = sorted(glob.glob(os.path.join(model_path, "**", "*.onnx"), recursive=True))
+        if not found:
+            raise FileNotFoundError(f"No .onnx model file found under {model_path}")
+        return found[0]
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Returns an (N, dim) float32 array of L2-normalized CLS embeddings."""
+        inputs = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self.max_length,
+            return_tensors="np"
+        )
+        feed = {name: value.astype(np.int64) for name, value in inputs.items() if name in self.input_names}
+
+        last_hidden_state = self.session.run([self.output_name], feed)[0]
+        # BGE-M3 uses CLS token (index 0)
+        embedding = last_hidden_state[:, 0].astype(np.float32)
+
+        # Normalize (L2)
+        norm = np.linalg.norm(embedding, ord=2, axis=1, keepdims=True)
+        return embedding / np.maximum(norm, 1e-12)
+
+class DenseBatchEncoder:
+    """
+    Micro-batching front-end for the dense encoder.
+    짧은 시간 창(max_wait_ms) 안에 도착한 쿼리들을 모아 한 번의 ONNX forward pass로 처리하고,
+    각 호출자에게는 자신의 정규화된 CLS 벡터만 돌려줍니다.
+    """
+    def __init__(self, encode_batch_fn, max_batch_size: int = 16, max_wait_ms: float = 5.0):
+        self.encode_batch_fn = encode_batch_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name="dense-batch-encoder", daemon=True)
+        self._worker.start()
+
+    def submit(self, text: str) -> Future:
+        """단일 쿼리를 큐에 넣고 바로 Future를 반환합니다 (async 호출자는 asyncio.wrap_future로 대기)."""
+        future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def encode(self, text: str, timeout: Optional[float] = None) -> List[float]:
+        """단일 쿼리를 큐에 넣고 배치 처리 결과를 기다립니다."""
+        return self.submit(text).result(timeout=timeout)
+
+    def close(self):
+        self._queue.put(None)
+        self._worker.join(timeout=1.0)
+
+    def _collect(self, first) -> list:
+        """첫 요청 이후 max_wait 동안(또는 배치가 찰 때까지) 추가 요청을 모읍니다."""
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                # 종료 신호는 현재 배치를 처리한 뒤 반영
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+
+            batch = [
+                (text, future) for text, future in self._collect(first)
+                if future.set_running_or_notify_cancel()
+            ]
+            if not batch:
+                continue
+
+            try:
+                vectors = self.encode_batch_fn([text for text, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            for (_, future), vec in zip(batch, vectors):
+                future.set_result(vec.tolist())
+
 class KNUSearcher:
     """
     KNU Hybrid Searcher implementing BGE-M3 ONNX (Dense) and Kiwi (Sparse).
-    [cite_start]Synced with ingestion logic defined in embedding.txt [cite: 1-127]
+    Synced with ingestion logic in app/lib/knu_ingest.py
+
+    client/collection_name을 넘기면 환경 변수 대신 주어진 Qdrant 클라이언트를 사용합니다
+    (벤치마크의 in-memory Qdrant 등).
     """
-    def __init__(self):
+    def __init__(self, client: Optional[QdrantClient] = None, collection_name: Optional[str] = None):
         print("[System] Initializing Search Engine from Environment Variables...")
         
         # 1. 환경 변수 로드 및 검증
         self.model_path = os.getenv("MODEL_PATH", "./bge-m3-onnx-quantized")
         self.qdrant_url = os.getenv("QDRANT_URL")
         self.qdrant_api_key = os.getenv("QDRANT_API_KEY")
-        self.collection_name = os.getenv("QDRANT_COLLECTION_NAME", "knu_hybrid_2026")
+        # Blue/green 재색인(knu_reindex) 사용 시 alias를 우선 (Qdrant가 서비스 중인 버전으로 해석)
+        self.collection_name = (
+            collection_name
+            or os.getenv("QDRANT_COLLECTION_ALIAS")
+            or os.getenv("QDRANT_COLLECTION_NAME", "knu_hybrid_2026")
+        )
+        # 캐시 키에 포함되는 모델 버전 (모델 교체 시 캐시가 자동으로 분리됨)
+        self.model_version = os.getenv("MODEL_VERSION", os.path.basename(os.path.normpath(self.model_path)))
+        # 동시 요청 micro-batching 설정 (max_wait_ms=0 이면 배칭 비활성화)
+        self.encoder_max_batch = int(os.getenv("ENCODER_MAX_BATCH", "16"))
+        self.encoder_max_wait_ms = float(os.getenv("ENCODER_MAX_WAIT_MS", "5"))
+        # Async 경로 설정: gRPC 사용 여부 및 인코딩 전용 스레드 수
+        self.prefer_grpc = os.getenv("QDRANT_PREFER_GRPC", "0") == "1"
+        self.grpc_port = int(os.getenv("QDRANT_GRPC_PORT", "6334"))
+        self.encode_workers = int(os.getenv("ENCODER_EXECUTOR_WORKERS", "2"))
+        # int8 양자화 검색 후 원본 벡터로 재정렬할 후보 배수 (knu_collection_manager 참고)
+        self.quantization_oversampling = float(os.getenv("QDRANT_OVERSAMPLING", "2.0"))
+        # 검색 백엔드: "qdrant" (기본) 또는 "local" (프로세스 내장 인덱스)
+        self.search_backend = os.getenv("SEARCH_BACKEND", "qdrant")
+        self.local_index_dir = os.getenv("LOCAL_INDEX_DIR", "./local_index")
+        # Qdrant 장애 시 로컬 인덱스로 폴백할지 여부
+        self.local_fallback = os.getenv("LOCAL_INDEX_FALLBACK", "1") == "1"
 
         # 필수 변수 검증
-        if not self.qdrant_url:
+        if self.search_backend not in ("qdrant", "local"):
+            raise ValueError(f"❌ 지원하지 않는 SEARCH_BACKEND입니다: {self.search_backend}")
+        if self.search_backend == "qdrant" and not self.qdrant_url and client is None:
             raise ValueError("❌ 환경 변수 'QDRANT_URL'이 설정되지 않았습니다. .env 파일을 확인해주세요.")
 
-        # 2. Sparse Encoder Setup (Kiwi)
-        self.kiwi = Kiwi()
-        [cite_start]# [cite: 8] Stop tags from embedding.txt
-        self.stop_tags = {
-            'JKS', 'JKC', 'JKG', 'JKO', 'JKB', 'JKV', 'JKQ', 'JX', 'JC',
-            'EP', 'EF', 'EC', 'ETN', 'ETM',
-            'SP', 'SS', 'SE', 'SO', 'SL', 'SH', 'SN', 'SF', 'SY',
-            'IC', 'XPN', 'XSN', 'XSV', 'XSA', 'XR', 'MM', 'MAG', 'MAJ',
-            'VCP', 'VCN', 'VA', 'VV', 'VX'
-        }
+        # 2. Sparse Encoder Setup (Kiwi + corpus term stats)
+        self.sparse_encoder = SparseEncoder.from_env()
         
-        # 3. Dense Encoder Setup (ONNX)
+        # 3. Dense Encoder Setup (ONNX, 호스트별 튜닝 결과 적용: knu_encoder_tuning)
         print(f"[System] Loading ONNX model from: {self.model_path}")
-        sess_options = SessionOptions()
-        sess_options.intra_op_num_threads = 4
+        self.encoder_config = resolve_encoder_config(self.model_path)
+        if not os.getenv("ENCODER_MAX_BATCH"):
+            self.encoder_max_batch = int(self.encoder_config["max_batch"])
         
         try:
-            self.tokenizer = AutoTokenizer.from_pretrained(self.model_path)
-            self.model = ORTModelForFeatureExtraction.from_pretrained(
-                self.model_path,
-                provider="CPUExecutionProvider",
-                session_options=sess_options
-            )
+            self.dense_encoder = DenseEncoder(self.model_path, make_session_options(self.encoder_config))
         except Exception as e:
             print(f"[Error] Failed to load ONNX model. Check path: {e}")
             raise
 
-        # 4. Qdrant Client Setup
-        try:
-            self.client = QdrantClient(
+        self.batch_encoder = None
+        if self.encoder_max_wait_ms > 0 and self.encoder_max_batch > 1:
+            self.batch_encoder = DenseBatchEncoder(
+                self._encode_dense_batch,
+                max_batch_size=self.encoder_max_batch,
+                max_wait_ms=self.encoder_max_wait_ms
+            )
+
+        # 4. Query Embedding Cache (in-process LRU + Redis)
+        # sparse 가중치 방식이 바뀌어도 캐시가 분리되도록 버전에 포함
+        self.embedding_cache = QueryEmbeddingCache.from_env(f"{self.model_version}+{self.sparse_encoder.version}")
+
+        # 5. Local Hybrid Index (local 백엔드 또는 Qdrant 장애 폴백용)
+        self.local_index = None
+        if self.search_backend == "local" or self.local_fallback:
+            try:
+                self.local_index = LocalHybridIndex.load(self.local_index_dir)
+            except Exception as e:
+                print(f"[Warning] Failed to load local index ({self.local_index_dir}): {e}")
+            if self.local_index is None and self.search_backend == "local":
+                print(f"[Warning] Local index not found at {self.local_index_dir}. Build it with: python -m app.lib.knu_local_index")
+            elif self.local_index is not None and self.local_index.model_version != self.model_version:
+                print(f"[Warning] Local index was built with '{self.local_index.model_version}', current model is '{self.model_version}'")
+
+        # 6. Qdrant Client Setup
+        self.client = client
+        self.client_injected = client is not None
+        if client is not None:
+            print(f"[System] Using provided Qdrant client (Collection: {self.collection_name})")
+        elif not self.qdrant_url:
+            print("[System] QDRANT_URL not set. Serving from local index only.")
+        else:
+            try:
+                self.client = QdrantClient(
+                    url=self.qdrant_url,
+                    api_key=self.qdrant_api_key,
+                    port=443,
+                    https=True,
+                    timeout=60,
+                    # Cloudflare 터널 등 사용 시 인증서 오류 무시 필요할 수 있음
+                    verify=False if "cloudflare" in self.qdrant_url else True
+                )
+                print(f"[System] Connected to Qdrant: {self.qdrant_url} (Collection: {self.collection_name})")
+            except Exception as e:
+                print(f"[Error] Qdrant Connection Failed: {e}")
+                raise
+
+        # 7. Hot/Cold Tiering (SEARCH_TIERING=1: 최근 공지 컬렉션을 먼저 질의)
+        self.tier_policy = TierPolicy.from_env(self.collection_name) if self.client is not None else None
+        self.tier_executor = None
+        if self.tier_policy is not None:
+            # sync 경로에서 hot 융합 질의와 dense 1위 질의를 동시에 보내기 위한 스레드
+            self.tier_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="knu-tier")
+            print(f"[System] Tiered search: {self.tier_policy.hot_collection} → {self.collection_name}")
+
+        # 8. Load-aware Degradation (hybrid → sparse-only → cached results)
+        self.degradation = DegradationLadder.from_env()
+
+        # 9. Async Path (AsyncQdrantClient는 이벤트 루프 안에서 처음 사용할 때 생성)
+        self._aclient = None
+        # CPU-bound 인코딩은 이벤트 루프가 아닌 전용 executor에서 실행
+        self.encode_executor = ThreadPoolExecutor(
+            max_workers=self.encode_workers,
+            thread_name_prefix="knu-encode"
+        )
+
+        # 10. Request Coalescing (같은 쿼리의 동시 인코딩/Qdrant 질의를 한 번만 실행)
+        self.encode_flight = SingleFlight.from_env("encode")
+        self.aencode_flight = AsyncSingleFlight.from_env("encode_async")
+        self.search_flight = AsyncSingleFlight.from_env("qdrant")
+
+    @property
+    def aclient(self) -> AsyncQdrantClient:
+        if self._aclient is None and self.client_injected:
+            # 주입된 클라이언트(벤치마크의 in-memory Qdrant 등)는 QDRANT_URL과 무관 → 같은 인스턴스를 스레드에서 사용
+            self._aclient = ThreadedAsyncClient(self.client)
+            print("[System] Async path uses the provided Qdrant client (threaded)")
+        elif self._aclient is None:
+            self._aclient = AsyncQdrantClient(
                 url=self.qdrant_url,
                 api_key=self.qdrant_api_key,
                 port=443,
                 https=True,
                 timeout=60,
-                # Cloudflare 터널 등 사용 시 인증서 오류 무시 필요할 수 있음
+                prefer_grpc=self.prefer_grpc,
+                grpc_port=self.grpc_port,
                 verify=False if "cloudflare" in self.qdrant_url else True
             )
-            print(f"[System] Connected to Qdrant: {self.qdrant_url} (Collection: {self.collection_name})")
-        except Exception as e:
-            print(f"[Error] Qdrant Connection Failed: {e}")
-            raise
+            transport = "gRPC" if self.prefer_grpc else "HTTP"
+            print(f"[System] Async Qdrant client ready ({transport}): {self.qdrant_url}")
+        return self._aclient
+
+    async def aclose(self):
+        if self._aclient is not None:
+            await self._aclient.close()
+            self._aclient = None
 
     def _encode_sparse(self, text: str) -> Tuple[Optional[List[int]], Optional[List[float]]]:
         """
         Generates sparse vector using Kiwi morph analysis and MMH3 hashing.
-        [cite_start]Consistent with sparse_encoder logic in embedding.txt [cite: 30-45]
+        Consistent with document encoding in app/lib/knu_ingest.py
         """
         try:
-            tokens = self.kiwi.tokenize(text)
-            # Filter stop tags and short tokens
-            keywords = [
-                t.form for t in tokens 
-                if t.tag not in self.stop_tags and len(t.form) > 1
-            ]
-            
-            if not keywords: 
-                return None, None
-            
-            # Count frequency (Basic BM25 approximation for query side)
-            term_counts = Counter(keywords)
-            
-            indices = []
-            values = []
-            
-            for term, count in term_counts.items():
-                [cite_start]# [cite: 44] Hashing must match ingestion logic
-                idx = mmh3.hash(term, signed=False)
-                # Query-side weighting: simple sqrt or count is standard for Splade/BM25
-                val = float(np.sqrt(count)) 
-                
-                indices.append(idx)
-                values.append(val)
-                
-            return indices, values
+            return self.sparse_encoder.encode_query(text)
         except Exception as e:
             print(f"[Warning] Sparse encoding error: {e}")
             return None, None
 
+    def _encode_dense_batch(self, texts: List[str]) -> np.ndarray:
+        """
+        Generates dense vectors for a batch of texts using BGE-M3 ONNX.
+        Returns an (N, dim) float32 array of L2-normalized CLS embeddings.
+        """
+        return self.dense_encoder.encode(texts)
+
     def _encode_dense(self, text: str) -> List[float]:
         """
         Generates dense vector using BGE-M3 ONNX.
+        같은 쿼리(정규화 기준)의 동시 요청은 encode_flight로 한 번만 인코딩하고,
+        서로 다른 쿼리는 batch_encoder를 통해 하나의 forward pass로 묶입니다.
         """
-        inputs = self.tokenizer(
-            text, 
-            padding=True, 
-            truncation=True, 
-            max_length=512, 
-            return_tensors="pt"
-        )
-        
-        outputs = self.model(**inputs)
-        [cite_start]# [cite: 6] BGE-M3 uses CLS token (index 0)
-        embedding = outputs.last_hidden_state[:, 0]
-        
-        [cite_start]# [cite: 6] Normalize (L2)
-        norm = torch.norm(embedding, p=2, dim=1, keepdim=True)
-        embedding = embedding.div(norm)
-        
-        return embedding[0].detach().numpy().tolist()
+        if self.encode_flight is not None:
+            return self.encode_flight.do(normalize_query(text), self._encode_dense_once, text)
+        return self._encode_dense_once(text)
 
-    def search(self, query: str, target_dept: str = None, final_k: int = 10):
+    def _encode_dense_once(self, text: str) -> List[float]:
+        if self.batch_encoder is not None:
+            return self.batch_encoder.encode(text)
+        return self._encode_dense_batch([text])[0].tolist()
+
+    def _encode_query(self, query: str):
         """
-        Hybrid Search with Dept Filtering.
-        Returns processed list of dicts with all metadata guaranteed.
+        Dense + Sparse 쿼리 인코딩 (임베딩 캐시 우선 조회).
+        Returns (dense_vec, sp_indices, sp_values)
         """
-        start_time = time.perf_counter()
-        
-        # 1. Query Encoding
+        if self.embedding_cache is not None:
+            cached = self.embedding_cache.get(query)
+            if cached is not None:
+                dense_vec, (sp_indices, sp_values) = cached
+                return dense_vec, sp_indices, sp_values
+
         dense_vec = self._encode_dense(query)
         sp_indices, sp_values = self._encode_sparse(query)
-        encode_end_time = time.perf_counter()
-        
-        # 2. Build Filter
-        search_filter = None
+
+        if self.embedding_cache is not None:
+            self.embedding_cache.put(query, dense_vec, sp_indices, sp_values)
+        return dense_vec, sp_indices, sp_values
+
+    def _encode_queries(self, queries: List[str]):
+        """
+        Batched version of _encode_query: 캐시 미스만 한 번의 ONNX 호출로 인코딩합니다.
+        Returns a list of (dense_vec, sp_indices, sp_values)
+        """
+        encoded = [None] * len(queries)
+        if self.embedding_cache is not None:
+            for i, cached in enumerate(self.embedding_cache.get_many(queries)):
+                if cached is not None:
+                    dense_vec, (sp_indices, sp_values) = cached
+                    encoded[i] = (dense_vec, sp_indices, sp_values)
+
+        misses = [i for i, e in enumerate(encoded) if e is None]
+        if misses:
+            dense_vecs = self._encode_dense_batch([queries[i] for i in misses]).tolist()
+            for i, dense_vec in zip(misses, dense_vecs):
+                sp_indices, sp_values = self._encode_sparse(queries[i])
+                encoded[i] = (dense_vec, sp_indices, sp_values)
+                if self.embedding_cache is not None:
+                    self.embedding_cache.put(queries[i], dense_vec, sp_indices, sp_values)
+        return encoded
+
+    def warmup(self, query: str = "수강신청 기간 안내"):
+        """기동 직후 첫 요청의 지연을 없애기 위한 워밍업 인퍼런스 (캐시를 거치지 않음)"""
+        self._encode_dense_batch([query])
+        self._encode_sparse(query)
+
+    def _encode_adaptive(self, query: str, target_dept: str = None, final_k: int = 10):
+        """
+        부하에 따라 모드를 골라 쿼리를 인코딩합니다 (knu_degradation).
+        Returns (dense_vec, sp_indices, sp_values, mode, cached_results)
+        - hybrid: _encode_query와 동일 (임베딩 캐시 hit은 부하와 무관하게 hybrid)
+        - sparse: ONNX를 건너뛰고 dense_vec=None
+        - cached: 최근 hybrid 결과가 있으면 cached_results로 반환, 없으면 sparse로 진행
+        """
+        ladder = self.degradation
+        if ladder is None:
+            return (*self._encode_query(query), MODE_HYBRID, None)
+
+        if self.embedding_cache is not None:
+            cached = self.embedding_cache.get(query)
+            if cached is not None:
+                dense_vec, (sp_indices, sp_values) = cached
+                return dense_vec, sp_indices, sp_values, MODE_HYBRID, None
+
+        mode = ladder.choose()
+        if mode == MODE_CACHED:
+            cached_results = ladder.result_cache.get(query, target_dept, final_k)
+            if cached_results is not None:
+                return None, None, None, MODE_CACHED, cached_results
+            mode = MODE_SPARSE
+
+        sp_indices, sp_values = self._encode_sparse(query)
+        if mode == MODE_SPARSE and sp_indices:
+            return None, sp_indices, sp_values, MODE_SPARSE, None
+
+        # hybrid (또는 sparse 토큰이 하나도 없어 dense가 필요한 경우)
+        dense_start = time.perf_counter()
+        dense_vec = self._encode_dense(query)
+        ladder.record_dense((time.perf_counter() - dense_start) * 1000)
+        if self.embedding_cache is not None:
+            self.embedding_cache.put(query, dense_vec, sp_indices, sp_values)
+        return dense_vec, sp_indices, sp_values, MODE_HYBRID, None
+
+    async def _aencode_dense(self, text: str) -> List[float]:
+        """batch_encoder에 직접 제출하고 이벤트 루프에서 기다립니다 (executor 스레드를 점유하지 않음)."""
+        if self.aencode_flight is not None:
+            return await self.aencode_flight.do(normalize_query(text), self._asubmit_dense, text)
+        return await self._asubmit_dense(text)
+
+    async def _asubmit_dense(self, text: str) -> List[float]:
+        return await asyncio.wrap_future(self.batch_encoder.submit(text))
+
+    async def _aencode_adaptive(self, query: str, target_dept: str = None, final_k: int = 10):
+        """
+        _encode_adaptive의 async 버전 (같은 반환 형식).
+        dense 인코딩은 batch_encoder 큐에 바로 넣으므로 encode executor 스레드 수와 무관하게
+        동시 쿼리가 한 forward pass로 묶입니다. 캐시 조회와 Kiwi 분석만 executor에서 실행합니다.
+        """
+        loop = asyncio.get_running_loop()
+        if self.batch_encoder is None:
+            return await loop.run_in_executor(self.encode_executor, self._encode_adaptive, query, target_dept, final_k)
+
+        if self.embedding_cache is not None:
+            cached = await loop.run_in_executor(self.encode_executor, self.embedding_cache.get, query)
+            if cached is not None:
+                dense_vec, (sp_indices, sp_values) = cached
+                return dense_vec, sp_indices, sp_values, MODE_HYBRID, None
+
+        ladder = self.degradation
+        mode = ladder.choose() if ladder is not None else MODE_HYBRID
+        if mode == MODE_CACHED:
+            cached_results = ladder.result_cache.get(query, target_dept, final_k)
+            if cached_results is not None:
+                return None, None, None, MODE_CACHED, cached_results
+            mode = MODE_SPARSE
+
+        # hybrid면 dense 제출과 Kiwi 분석을 동시에 진행
+        dense_start = time.perf_counter()
+        dense_task = asyncio.ensure_future(self._aencode_dense(query)) if mode == MODE_HYBRID else None
+        try:
+            sp_indices, sp_values = await loop.run_in_executor(self.encode_executor, self._encode_sparse, query)
+        except BaseException:
+            if dense_task is not None:
+                dense_task.cancel()
+            raise
+        if mode == MODE_SPARSE and sp_indices:
+            return None, sp_indices, sp_values, MODE_SPARSE, None
+
+        # hybrid (또는 sparse 토큰이 하나도 없어 dense가 필요한 경우)
+        if dense_task is None:
+            dense_start = time.perf_counter()
+            dense_task = asyncio.ensure_future(self._aencode_dense(query))
+        dense_vec = await dense_task
+        if ladder is not None:
+            ladder.record_dense((time.perf_counter() - dense_start) * 1000)
+        if self.embedding_cache is not None:
+            await loop.run_in_executor(self.encode_executor, self.embedding_cache.put, query, dense_vec, sp_indices, sp_values)
+        return dense_vec, sp_indices, sp_values, MODE_HYBRID, None
+
+    def _finish_mode(self, query: str, target_dept: str, final_k: int, mode: str, results: List[Dict]):
+        """모드별 카운터 갱신 + hybrid 결과를 cached 모드용으로 보관"""
+        if self.degradation is None:
+            return
+        self.degradation.count(mode)
+        if mode == MODE_HYBRID:
+            self.degradation.result_cache.put(query, target_dept, final_k, results)
+
+    def degradation_stats(self) -> Dict:
+        """모드별 응답 수, in-flight 인코딩 수, dense 인코딩 EWMA (비활성화 시 빈 dict)"""
+        return self.degradation.stats() if self.degradation is not None else {}
+
+    def cache_stats(self) -> Dict:
+        """임베딩 캐시 hit/miss 및 크기 통계"""
+        return self.embedding_cache.stats() if self.embedding_cache is not None else {}
+
+    def _build_filter(self, target_dept: str = None) -> Optional[models.Filter]:
         if target_dept and target_dept != "공통": # '공통'이 아닌 경우에만 필터링
-            search_filter = models.Filter(
+            return models.Filter(
                 must=[
                     models.FieldCondition(
                         key="dept",
@@ -157,19 +525,27 @@ class KNUSearcher:
                     )
                 ]
             )
+        return None
 
-        # 3. Prefetch Setup
+    def _build_prefetch(self, dense_vec, sp_indices, sp_values, search_filter) -> List[models.Prefetch]:
         # Strategy: Increase prefetch limit to 50 to improve RRF recall
         prefetch_limit = 50 
         prefetch = []
         
-        # Dense Prefetch
-        prefetch.append(models.Prefetch(
-            query=dense_vec,
-            using="dense",
-            limit=prefetch_limit,
-            filter=search_filter
-        ))
+        # Dense Prefetch (int8 quantized search + rescoring). sparse-only 모드에서는 생략
+        if dense_vec is not None:
+            prefetch.append(models.Prefetch(
+                query=dense_vec,
+                using="dense",
+                limit=prefetch_limit,
+                filter=search_filter,
+                params=models.SearchParams(
+                    quantization=models.QuantizationSearchParams(
+                        rescore=True,
+                        oversampling=self.quantization_oversampling
+                    )
+                )
+            ))
         
         # Sparse Prefetch
         if sp_indices:
@@ -179,47 +555,472 @@ class KNUSearcher:
                 limit=prefetch_limit,
                 filter=search_filter
             ))
+        return prefetch
+
+    def _latencies(self, start_time: float, encode_end_time: float, end_time: float) -> Dict:
+        return {
+            "total": (end_time - start_time) * 1000,
+            "encode": (encode_end_time - start_time) * 1000,
+            "db": (end_time - encode_end_time) * 1000
+        }
+
+    def _make_item(self, score: float, point_id, payload: Dict) -> Dict:
+        # Extract essential fields safely
+        snippet = payload.get("snippet")
+        if snippet is None:
+            # snippet 필드가 없는 (구버전) 포인트/로컬 문서는 본문에서 생성
+            snippet = make_snippet(payload.get("content", ""))
+        return {
+            "score": score,
+            "id": point_id,
+            "url": payload.get("url", "URL 없음"),
+            "title": payload.get("title", "제목 없음"),
+            "dept": payload.get("dept", "공통"),
+            "detail": payload.get("detail", ""),
+            "date": payload.get("date", ""),
+            "snippet": snippet,
+            # Use this for RAG context: 가장 잘 맞는 패시지 (패시지 분할 전 포인트는 snippet)
+            "passage": payload.get("passage") or snippet,
+            "chunk_index": payload.get("chunk_index", 0),
+            "chunk_start": payload.get("chunk_start"),
+            "chunk_end": payload.get("chunk_end")
+        }
+
+    def _parse_points(self, points) -> List[Dict]:
+        """Convert Qdrant points to Agent-friendly dicts"""
+        return [self._make_item(point.score, point.id, point.payload or {}) for point in points or []]
+
+    def _parse_groups(self, result) -> List[Dict]:
+        """query_points_groups 결과: 공지(url)별 최고 점수 패시지"""
+        return self._parse_points([group.hits[0] for group in result.groups if group.hits])
+
+    def _collapse(self, points, final_k: int) -> List[Dict]:
+        """패시지 결과를 공지(url)당 1개로 줄입니다 (점수 내림차순 입력 가정)."""
+        seen, collapsed = set(), []
+        for point in points or []:
+            url = (point.payload or {}).get(GROUP_BY_FIELD, point.id)
+            if url in seen:
+                continue
+            seen.add(url)
+            collapsed.append(point)
+            if len(collapsed) >= final_k:
+                break
+        return self._parse_points(collapsed)
+
+    def _search_local(self, dense_vec, sp_indices, sp_values, target_dept: str = None, final_k: int = 10) -> List[Dict]:
+        """내장 로컬 인덱스로 Hybrid 검색 (Qdrant와 동일한 결과 형식)"""
+        if self.local_index is None:
+            return []
+        hits = self.local_index.search(dense_vec, sp_indices, sp_values, target_dept=target_dept, final_k=final_k)
+        return [self._make_item(score, row, self.local_index.payload(row)) for row, score in hits]
+
+    def _query_groups(self, collection_name: str, prefetch, final_k: int) -> List[Dict]:
+        """RRF Fusion 후 공지당 최고 패시지 1개"""
+        results = self.client.query_points_groups(
+            collection_name=collection_name,
+            prefetch=prefetch,
+            query=models.FusionQuery(fusion=models.Fusion.RRF),
+            group_by=GROUP_BY_FIELD,
+            group_size=1,
+            limit=final_k,
+            with_payload=SEARCH_PAYLOAD_FIELDS, # 필요한 필드만 전송
+            with_vectors=False # Save bandwidth
+        )
+        return self._parse_groups(results)
+
+    async def _aquery_groups(self, collection_name: str, prefetch, final_k: int) -> List[Dict]:
+        results = await self.aclient.query_points_groups(
+            collection_name=collection_name,
+            prefetch=prefetch,
+            query=models.FusionQuery(fusion=models.Fusion.RRF),
+            group_by=GROUP_BY_FIELD,
+            group_size=1,
+            limit=final_k,
+            with_payload=SEARCH_PAYLOAD_FIELDS,
+            with_vectors=False
+        )
+        return self._parse_groups(results)
+
+    @staticmethod
+    def _dense_leg(prefetch) -> Optional[models.Prefetch]:
+        return next((p for p in prefetch if p.using == "dense"), None)
+
+    def _top_dense(self, collection_name: str, prefetch) -> Optional[float]:
+        """collection에서 dense 1위 cosine (tier 관련도 판단용, limit=1). sparse-only 모드면 None"""
+        leg = self._dense_leg(prefetch)
+        if leg is None:
+            return None
+        points = self.client.query_points(
+            collection_name=collection_name, query=leg.query, using="dense", query_filter=leg.filter,
+            search_params=leg.params, limit=1, with_payload=False, with_vectors=False
+        ).points
+        return points[0].score if points else 0.0
+
+    async def _atop_dense(self, collection_name: str, prefetch) -> Optional[float]:
+        leg = self._dense_leg(prefetch)
+        if leg is None:
+            return None
+        points = (await self.aclient.query_points(
+            collection_name=collection_name, query=leg.query, using="dense", query_filter=leg.filter,
+            search_params=leg.params, limit=1, with_payload=False, with_vectors=False
+        )).points
+        return points[0].score if points else 0.0
+
+    def _query_tiered(self, query: str, prefetch, final_k: int) -> Tuple[List[Dict], str]:
+        """
+        Returns (results, tier). tiering이 꺼져 있으면 전체 컬렉션만 질의합니다 (tier="all").
+        hot 질의가 실패해도 cold로 넘어가므로 hot 컬렉션이 아직 없어도 안전합니다.
+        """
+        policy = self.tier_policy
+        if policy is None:
+            return self._query_groups(self.collection_name, prefetch, final_k), "all"
+        if not policy.skip_hot(query):
+            try:
+                # 융합 질의와 dense 1위 질의를 동시에 (round trip 1회 분량)
+                probe = self.tier_executor.submit(self._top_dense, policy.hot_collection, prefetch)
+                results = self._query_groups(policy.hot_collection, prefetch, final_k)
+                top_dense = probe.result()
+                if not policy.needs_cold(results, final_k, top_dense):
+                    return results, "hot"
+            except Exception as e:
+                print(f"[Warning] Hot tier query failed, using cold: {e}")
+        return self._query_groups(self.collection_name, prefetch, final_k), "cold"
+
+    async def _aquery_tiered(self, query: str, prefetch, final_k: int) -> Tuple[List[Dict], str]:
+        policy = self.tier_policy
+        if policy is None:
+            return await self._aquery_groups(self.collection_name, prefetch, final_k), "all"
+        if not policy.skip_hot(query):
+            try:
+                # 융합 질의와 dense 1위 질의를 동시에 (추가 지연 없음)
+                results, top_dense = await asyncio.gather(
+                    self._aquery_groups(policy.hot_collection, prefetch, final_k),
+                    self._atop_dense(policy.hot_collection, prefetch)
+                )
+                if not policy.needs_cold(results, final_k, top_dense):
+                    return results, "hot"
+            except Exception as e:
+                print(f"[Warning] Async hot tier query failed, using cold: {e}")
+        return await self._aquery_groups(self.collection_name, prefetch, final_k), "cold"
+
+    async def _aquery_coalesced(self, query: str, target_dept: str, final_k: int, mode: str,
+                                prefetch) -> Tuple[List[Dict], str]:
+        """
+        _aquery_tiered + singleflight. prefetch는 (query, mode, target_dept)로 결정되므로
+        이 값들이 같은 동시 요청은 Qdrant 질의 한 번의 결과를 공유합니다.
+        """
+        if self.search_flight is None:
+            return await self._aquery_tiered(query, prefetch, final_k)
+        key = (self.collection_name, normalize_query(query), target_dept, final_k, mode)
+        return await self.search_flight.do(key, self._aquery_tiered, query, prefetch, final_k)
+
+    def tier_stats(self) -> Dict:
+        """hot/cold 질의 분포 (tiering 비활성화 시 빈 dict)"""
+        return self.tier_policy.stats() if self.tier_policy is not None else {}
+
+    def search(self, query: str, target_dept: str = None, final_k: int = 10):
+        """
+        Hybrid Search with Dept Filtering.
+        Returns processed list of dicts with all metadata guaranteed.
+        """
+        start_time = time.perf_counter()
+        
+        # 1. Query Encoding (cache → ONNX/Kiwi, 과부하 시 sparse-only/cached로 강등)
+        if self.degradation is not None:
+            self.degradation.enter()
+        try:
+            dense_vec, sp_indices, sp_values, mode, cached_results = self._encode_adaptive(query, target_dept, final_k)
+        finally:
+            if self.degradation is not None:
+                self.degradation.exit()
+        encode_end_time = time.perf_counter()
+
+        if cached_results is not None:
+            self._finish_mode(query, target_dept, final_k, mode, cached_results)
+            latencies = self._latencies(start_time, encode_end_time, encode_end_time)
+            latencies["mode"] = mode
+            return cached_results, latencies, dense_vec
+        
+        if self.search_backend == "local":
+            parsed_results = self._search_local(dense_vec, sp_indices, sp_values, target_dept, final_k)
+            end_time = time.perf_counter()
+            self._finish_mode(query, target_dept, final_k, mode, parsed_results)
+            latencies = self._latencies(start_time, encode_end_time, end_time)
+            latencies["mode"] = mode
+            return parsed_results, latencies, dense_vec
+
+        # 2. Build Filter
+        search_filter = self._build_filter(target_dept)
+
+        # 3. Prefetch Setup
+        prefetch = self._build_prefetch(dense_vec, sp_indices, sp_values, search_filter)
             
-        # 4. Execute Hybrid Search (RRF Fusion)
+        # 4. Execute Hybrid Search (RRF Fusion, 공지당 최고 패시지 1개, hot → cold)
         try:
-            results = self.client.query_points(
-                collection_name=self.collection_name, # 환경변수 사용
-                prefetch=prefetch,
-                query=models.FusionQuery(fusion=models.Fusion.RRF),
-                limit=final_k,
-                with_payload=True, # Fetch all metadata
-                with_vectors=False # Save bandwidth
-            )
+            parsed_results, tier = self._query_tiered(query, prefetch, final_k)
         except Exception as e:
-            # 🚨 Error Handling: Return empty list safely
+            # 🚨 Error Handling: 로컬 인덱스가 있으면 폴백, 없으면 빈 결과
             print(f"[Error] Qdrant query failed: {e}")
-            return [], {"total": 0, "encode": 0, "db": 0}, dense_vec
+            if self.local_index is None:
+                return [], {"total": 0, "encode": 0, "db": 0, "mode": mode}, dense_vec
+            print("[Warning] Falling back to local index")
+            parsed_results, tier = self._search_local(dense_vec, sp_indices, sp_values, target_dept, final_k), "local"
 
         end_time = time.perf_counter()
+        self._finish_mode(query, target_dept, final_k, mode, parsed_results)
+
+        latencies = self._latencies(start_time, encode_end_time, end_time)
+        latencies["tier"] = tier
+        latencies["mode"] = mode
         
-        # 5. Parse Results (Convert to Agent-friendly Dict)
-        parsed_results = []
-        if results and results.points:
-            for point in results.points:
-                payload = point.payload or {}
-                
-                # Extract essential fields safely
-                item = {
-                    "score": point.score,
-                    "id": point.id,
-                    "url": payload.get("url", "URL 없음"),
-                    "title": payload.get("title", "제목 없음"),
-                    "dept": payload.get("dept", "공통"),
-                    "date": payload.get("date", ""),
-                    "content": payload.get("content", ""), # Use this for RAG context
-                    "metadata": payload # Keep full metadata just in case
-                }
-                parsed_results.append(item)
-
-        latencies = {
-            "total": (end_time - start_time) * 1000,
-            "encode": (encode_end_time - start_time) * 1000,
-            "db": (end_time - encode_end_time) * 1000
-        }
-        
-        return parsed_results, latencies, dense_vec
\ No newline at end of file
+        return parsed_results, latencies, dense_vec
+
+    async def asearch(self, query: str, target_dept: str = None, final_k: int = 10):
+        """
+        Async Hybrid Search (search와 동일한 반환 형식).
+        dense 인코딩은 batch_encoder에 직접 제출하고 (캐시 조회/Kiwi만 encode_executor),
+        Qdrant 질의는 AsyncQdrantClient로 수행하여 느린 호출이 이벤트 루프를 막지 않도록 합니다.
+        """
+        start_time = time.perf_counter()
+        loop = asyncio.get_running_loop()
+
+        # 1. Query Encoding (off-loop). 배치 대기 중인 요청도 in-flight로 집계
+        if self.degradation is not None:
+            self.degradation.enter()
+        try:
+            dense_vec, sp_indices, sp_values, mode, cached_results = await self._aencode_adaptive(
+                query, target_dept, final_k
+            )
+        finally:
+            if self.degradation is not None:
+                self.degradation.exit()
+        encode_end_time = time.perf_counter()
+
+        if cached_results is not None:
+            self._finish_mode(query, target_dept, final_k, mode, cached_results)
+            latencies = self._latencies(start_time, encode_end_time, encode_end_time)
+            latencies["mode"] = mode
+            return cached_results, latencies, dense_vec
+
+        if self.search_backend == "local":
+            parsed_results = await loop.run_in_executor(
+                self.encode_executor, self._search_local, dense_vec, sp_indices, sp_values, target_dept, final_k
+            )
+            end_time = time.perf_counter()
+            self._finish_mode(query, target_dept, final_k, mode, parsed_results)
+            latencies = self._latencies(start_time, encode_end_time, end_time)
+            latencies["mode"] = mode
+            return parsed_results, latencies, dense_vec
+
+        # 2. Filter & Prefetch
+        search_filter = self._build_filter(target_dept)
+        prefetch = self._build_prefetch(dense_vec, sp_indices, sp_values, search_filter)
+
+        # 3. Execute Hybrid Search (RRF Fusion, hot → cold)
+        try:
+            parsed_results, tier = await self._aquery_coalesced(query, target_dept, final_k, mode, prefetch)
+        except Exception as e:
+            print(f"[Error] Async Qdrant query failed: {e}")
+            if self.local_index is None:
+                return [], {"total": 0, "encode": 0, "db": 0, "mode": mode}, dense_vec
+            print("[Warning] Falling back to local index")
+            parsed_results = await loop.run_in_executor(
+                self.encode_executor, self._search_local, dense_vec, sp_indices, sp_values, target_dept, final_k
+            )
+            tier = "local"
+
+        end_time = time.perf_counter()
+        self._finish_mode(query, target_dept, final_k, mode, parsed_results)
+        latencies = self._latencies(start_time, encode_end_time, end_time)
+        latencies["tier"] = tier
+        latencies["mode"] = mode
+
+        return parsed_results, latencies, dense_vec
+
+    def search_many(self, queries: List[str], depts=None, final_k: int = 10):
+        """
+        Batched Hybrid Search.
+        모든 쿼리를 한 번의 ONNX 호출로 인코딩하고, Qdrant에는 query_batch_points 한 번으로 질의합니다.
+        depts: None, 단일 학과 문자열, 또는 queries와 같은 길이의 리스트
+        벤치마크/재색인 검증용 경로: 부하 강등(degradation)과 hot/cold 티어링을 거치지 않고
+        항상 hybrid로 전체 아카이브(collection_name)를 질의합니다 (latencies["mode"]는 항상 hybrid).
+        Returns a list of (results, latencies, dense_vec) tuples in query order.
+        """
+        if not queries:
+            return []
+        if depts is None or isinstance(depts, str):
+            depts = [depts] * len(queries)
+        if len(depts) != len(queries):
+            raise ValueError("depts must have the same length as queries")
+
+        start_time = time.perf_counter()
+
+        # 1. Query Encoding (cache misses in a single forward pass)
+        encoded = self._encode_queries(list(queries))
+        dense_vecs = [e[0] for e in encoded]
+        encode_end_time = time.perf_counter()
+
+        if self.search_backend == "local":
+            batch_parsed = [
+                self._search_local(dense_vec, sp_indices, sp_values, dept, final_k)
+                for (dense_vec, sp_indices, sp_values), dept in zip(encoded, depts)
+            ]
+            latencies = self._latencies(start_time, encode_end_time, time.perf_counter())
+            latencies["mode"] = MODE_HYBRID
+            return [(parsed, dict(latencies), vec) for parsed, vec in zip(batch_parsed, dense_vecs)]
+
+        # 2. Build Requests
+        requests = []
+        for (dense_vec, sp_indices, sp_values), dept in zip(encoded, depts):
+            search_filter = self._build_filter(dept)
+            requests.append(models.QueryRequest(
+                prefetch=self._build_prefetch(dense_vec, sp_indices, sp_values, search_filter),
+                query=models.FusionQuery(fusion=models.Fusion.RRF),
+                # batch 질의에는 group API가 없으므로 여유 있게 받아 클라이언트에서 공지 단위로 접음
+                limit=final_k * BATCH_GROUP_OVERSAMPLING,
+                with_payload=SEARCH_PAYLOAD_FIELDS,
+                with_vector=False
+            ))
+
+        # 3. Execute Batch
+        try:
+            batch_results = self.client.query_batch_points(
+                collection_name=self.collection_name,
+                requests=requests
+            )
+            batch_parsed = [self._collapse(res.points, final_k) for res in batch_results]
+        except Exception as e:
+            print(f"[Error] Qdrant batch query failed: {e}")
+            if self.local_index is None:
+                return [([], {"total": 0, "encode": 0, "db": 0, "mode": MODE_HYBRID}, vec) for vec in dense_vecs]
+            print("[Warning] Falling back to local index")
+            batch_parsed = [
+                self._search_local(dense_vec, sp_indices, sp_values, dept, final_k)
+                for (dense_vec, sp_indices, sp_values), dept in zip(encoded, depts)
+            ]
+
+        end_time = time.perf_counter()
+
+        # 배치 전체 소요 시간을 각 쿼리에 동일하게 기록
+        latencies = self._latencies(start_time, encode_end_time, end_time)
+        latencies["mode"] = MODE_HYBRID
+
+        return [(parsed, dict(latencies), vec) for parsed, vec in zip(batch_parsed, dense_vecs)]
+
+    @staticmethod
+    def _parent_ids(points) -> List:
+        """전체 본문이 없는 패시지(chunk_index > 0)의 0번 패시지 id"""
+        return [
+            point_id(p.payload["url"]) for p in points
+            if (p.payload or {}).get("chunk_index", 0) > 0 and p.payload.get("url")
+        ]
+
+    @staticmethod
+    def _merge_full(points, parents) -> List[Dict]:
+        # 패시지 id로 요청해도 부모 공지의 전체 payload를 돌려줌 (요청 id와 패시지 정보는 유지)
+        by_url = {(p.payload or {}).get("url"): p.payload for p in parents}
+        merged = []
+        for p in points:
+            payload = p.payload or {}
+            if payload.get("chunk_index", 0) > 0 and payload.get("url") in by_url:
+                payload = {**by_url[payload["url"]], **payload}
+            merged.append({"id": p.id, **payload})
+        return merged
+
+    def fetch_full(self, ids: List) -> List[Dict]:
+        """
+        검색 결과 id로 전체 문서(content, images, attachments 포함)를 조회합니다.
+        패시지 id면 같은 공지의 0번 패시지에서 전체 본문을 가져옵니다.
+        Returns a list of payload dicts (with "id") in the order Qdrant returns them.
+        """
+        if not ids:
+            return []
+        if self.search_backend == "local":
+            return self._fetch_full_local(ids)
+        try:
+            points = self.client.retrieve(
+                collection_name=self.collection_name,
+                ids=ids,
+                with_payload=True,
+                with_vectors=False
+            )
+            parent_ids = self._parent_ids(points)
+            parents = self.client.retrieve(
+                collection_name=self.collection_name,
+                ids=parent_ids,
+                with_payload=True,
+                with_vectors=False
+            ) if parent_ids else []
+        except Exception as e:
+            print(f"[Error] Qdrant retrieve failed: {e}")
+            return self._fetch_full_local(ids) if self.local_index is not None else []
+        return self._merge_full(points, parents)
+
+    async def afetch_full(self, ids: List) -> List[Dict]:
+        """fetch_full의 async 버전"""
+        if not ids:
+            return []
+        if self.search_backend == "local":
+            return self._fetch_full_local(ids)
+        try:
+            points = await self.aclient.retrieve(
+                collection_name=self.collection_name,
+                ids=ids,
+                with_payload=True,
+                with_vectors=False
+            )
+            parent_ids = self._parent_ids(points)
+            parents = await self.aclient.retrieve(
+                collection_name=self.collection_name,
+                ids=parent_ids,
+                with_payload=True,
+                with_vectors=False
+            ) if parent_ids else []
+        except Exception as e:
+            print(f"[Error] Async Qdrant retrieve failed: {e}")
+            return self._fetch_full_local(ids) if self.local_index is not None else []
+        return self._merge_full(points, parents)
+
+    def _fetch_full_local(self, ids: List) -> List[Dict]:
+        if self.local_index is None:
+            return []
+        rows = [i for i in ids if isinstance(i, int) and 0 <= i < len(self.local_index)]
+        return [{"id": row, **self.local_index.full_payload(row)} for row in rows]
+
+
+def backfill_snippets(client: QdrantClient, collection_name: str, batch_size: int = 256) -> int:
+    """
+    snippet 필드가 없는 기존 포인트에 본문에서 만든 snippet을 채웁니다 (1회성 마이그레이션).
+    Returns the number of updated points.
+    """
+    updated = 0
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            collection_name=collection_name,
+            limit=batch_size,
+            offset=offset,
+            with_payload=["content", "snippet"],
+            with_vectors=False
+        )
+        for point in points:
+            payload = point.payload or {}
+            if "snippet" in payload:
+                continue
+            client.set_payload(
+                collection_name=collection_name,
+                payload={"snippet": make_snippet(payload.get("content", ""))},
+                points=[point.id],
+                wait=False
+            )
+            updated += 1
+        if offset is None:
+            break
+    print(f"[System] Snippet backfill done: {updated} points updated in {collection_name}")
+    return updated
+
+
+if __name__ == "__main__":
+    # 기존 컬렉션 snippet 마이그레이션: python -m app.lib.knu_notice_retriever
+    searcher = KNUSearcher()
+    backfill_snippets(searcher.client, searcher.collection_name)
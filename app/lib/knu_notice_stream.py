@@ -0,0 +1,311 @@
+import os
+import json
+import time
+import socket
+import argparse
+from typing import Dict, List, Optional, Tuple
+import redis
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# 크롤러 → 인덱서 Redis Stream
+DEFAULT_STREAM = "knu:notices"
+DEFAULT_GROUP = "indexer"
+# 스트림 길이 상한 (근사 트리밍). 인덱서가 오래 멈춰도 Redis 메모리가 무한히 늘지 않도록
+DEFAULT_MAXLEN = 50000
+# 이 횟수 이상 전달됐는데도 처리하지 못한 메시지는 dead-letter 스트림으로 이동
+DEFAULT_MAX_DELIVERIES = 5
+# 컨슈머가 죽어 ack되지 않은 메시지를 다른 컨슈머가 가져가기까지의 대기 시간
+DEFAULT_MIN_IDLE_MS = 60000
+
+
+def _redis_from_env(**kwargs) -> Optional[redis.Redis]:
+    """NOTICE_STREAM_REDIS_URL 우선, 없으면 REDIS_HOST/REDIS_PORT. 둘 다 없으면 None."""
+    url = os.getenv("NOTICE_STREAM_REDIS_URL")
+    if url:
+        return redis.Redis.from_url(url, decode_responses=True, **kwargs)
+    host = os.getenv("REDIS_HOST")
+    if not host:
+        return None
+    return redis.Redis(host=host, port=int(os.getenv("REDIS_PORT", "6379")), db=0, decode_responses=True, **kwargs)
+
+
+class NoticePublisher:
+    """
+    크롤러 쪽 publisher. 새 공지를 저장할 때마다 스트림에 XADD 합니다.
+    Redis가 설정되지 않았거나 연결에 실패하면 조용히 비활성화되어 크롤링(JSONL 저장)에는 영향이 없습니다.
+    """
+    def __init__(self, client: redis.Redis, stream: str = DEFAULT_STREAM, maxlen: int = DEFAULT_MAXLEN):
+        self.client = client
+        self.stream = stream
+        self.maxlen = maxlen
+        self.enabled = True
+        self.published = 0
+
+    @classmethod
+    def from_env(cls) -> Optional["NoticePublisher"]:
+        if os.getenv("NOTICE_STREAM_ENABLED", "1") != "1":
+            return None
+        client = _redis_from_env(socket_timeout=2, socket_connect_timeout=2)
+        if client is None:
+            return None
+        return cls(
+            client,
+            stream=os.getenv("NOTICE_STREAM", DEFAULT_STREAM),
+            maxlen=int(os.getenv("NOTICE_STREAM_MAXLEN", str(DEFAULT_MAXLEN)))
+        )
+
+    def publish(self, post: Dict) -> Optional[str]:
+        if not self.enabled:
+            return None
+        try:
+            message_id = self.client.xadd(
+                self.stream,
+                {"doc": json.dumps(post, ensure_ascii=False), "published_at": f"{time.time():.3f}"},
+                maxlen=self.maxlen,
+                approximate=True
+            )
+            self.published += 1
+            return message_id
+        except redis.RedisError as e:
+            # 한 번 실패하면 이번 크롤링 동안은 더 시도하지 않음 (일일 JSONL 커밋 + 인제스트가 여전히 보장)
+            self.enabled = False
+            print(f"[Warning] Notice stream disabled ({self.stream}): {e}")
+            return None
+
+
+class NoticeStreamIndexer:
+    """
+    Consumer-group 인덱서 (장기 실행 프로세스, 여러 개 띄워도 됨).
+    1. XAUTOCLAIM: 죽은 컨슈머가 ack하지 못한 오래된 메시지를 가져와 재시도
+    2. XREADGROUP: 새 메시지를 batch_size개씩 (block_ms 동안 대기)
+    3. IngestionPipeline.index_documents로 패시지 인코딩 + upsert 후 XACK
+    배치가 실패하면 공지별로 다시 시도해 성공한 메시지는 ack하고, 실패한 메시지만 pending으로 남아
+    min_idle_ms 후 재시도됩니다.
+    max_deliveries번 넘게 실패한 메시지는 <stream>:dead 로 옮기고 ack합니다.
+    포인트 id/content_hash가 일일 인제스트와 같으므로 이후 knu_ingest sync는 이 공지를 unchanged로 건너뜁니다.
+    """
+    def __init__(self, client: redis.Redis, pipeline, stream: str = DEFAULT_STREAM, group: str = DEFAULT_GROUP,
+                 consumer: Optional[str] = None, batch_size: int = 16, block_ms: int = 5000,
+                 max_deliveries: int = DEFAULT_MAX_DELIVERIES, min_idle_ms: int = DEFAULT_MIN_IDLE_MS,
+                 tier_manager=None, hot_sync_interval: float = 300.0):
+        self.client = client
+        self.pipeline = pipeline
+        self.stream = stream
+        self.group = group
+        self.consumer = consumer or f"{socket.gethostname()}-{os.getpid()}"
+        self.dead_stream = f"{stream}:dead"
+        self.batch_size = batch_size
+        self.block_ms = block_ms
+        self.max_deliveries = max_deliveries
+        self.min_idle_ms = min_idle_ms
+        self.tier_manager = tier_manager
+        self.hot_sync_interval = hot_sync_interval
+        self._last_hot_sync = 0.0
+        self._hot_dirty = False
+        self.counters = {"indexed": 0, "passages": 0, "failed_batches": 0, "dead_lettered": 0}
+
+    def ensure_group(self):
+        try:
+            # "0": 그룹 생성 전에 쌓인 메시지도 처리
+            self.client.xgroup_create(self.stream, self.group, id="0", mkstream=True)
+            print(f"[Stream] Created consumer group '{self.group}' on {self.stream}")
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    # -----------------------------------------------------
+    # Delivery
+    # -----------------------------------------------------
+    def _claim_stale(self) -> List[Tuple[str, Dict]]:
+        """다른(죽은) 컨슈머에 min_idle_ms 이상 묶여 있던 메시지를 가져옵니다."""
+        result = self.client.xautoclaim(
+            self.stream, self.group, self.consumer,
+            min_idle_time=self.min_idle_ms, start_id="0-0", count=self.batch_size
+        )
+        # redis-py: [next_id, messages] 또는 [next_id, messages, deleted_ids] (Redis 7+)
+        return [(mid, fields) for mid, fields in result[1] if fields]
+
+    def _read_new(self) -> List[Tuple[str, Dict]]:
+        response = self.client.xreadgroup(
+            self.group, self.consumer, {self.stream: ">"}, count=self.batch_size, block=self.block_ms
+        )
+        return [(mid, fields) for _, messages in response or [] for mid, fields in messages]
+
+    def _delivery_counts(self, message_ids: List[str]) -> Dict[str, int]:
+        counts = {}
+        ordered = sorted(message_ids, key=lambda m: tuple(int(part) for part in m.split("-")))
+        for entry in self.client.xpending_range(
+            self.stream, self.group, min=ordered[0], max=ordered[-1], count=len(message_ids) * 4
+        ):
+            counts[entry["message_id"]] = entry["times_delivered"]
+        return counts
+
+    def _dead_letter(self, message_id: str, fields: Dict, reason: str):
+        self.client.xadd(self.dead_stream, {**fields, "source_id": message_id, "error": reason[:500]})
+        self.client.xack(self.stream, self.group, message_id)
+        self.counters["dead_lettered"] += 1
+        print(f"[Stream] Dead-lettered {message_id}: {reason}")
+
+    # -----------------------------------------------------
+    # Processing
+    # -----------------------------------------------------
+    def process(self, messages: List[Tuple[str, Dict]]) -> int:
+        """메시지 배치를 인덱싱하고 ack합니다. Returns number of acked messages."""
+        if not messages:
+            return 0
+
+        # 1. 디코딩 (깨진 메시지는 재시도해도 소용없으므로 바로 dead-letter)
+        docs, ids_by_url = {}, {}
+        for message_id, fields in messages:
+            try:
+                doc = json.loads(fields["doc"])
+                if not doc.get("url"):
+                    raise ValueError("missing url")
+            except (KeyError, ValueError) as e:
+                self._dead_letter(message_id, fields, f"decode error: {e}")
+                continue
+            # 같은 배치 안의 중복 url은 마지막 버전만 인덱싱
+            docs[doc["url"]] = doc
+            ids_by_url.setdefault(doc["url"], []).append(message_id)
+        if not docs:
+            return 0
+
+        # 2. 인코딩 + upsert (배치 단위)
+        try:
+            stats = self.pipeline.index_documents(list(docs.values()))
+            acked = [mid for ids in ids_by_url.values() for mid in ids]
+        except Exception as e:
+            # 공지 하나 때문에 배치 전체가 dead-letter 되지 않도록 메시지별로 다시 시도
+            self.counters["failed_batches"] += 1
+            print(f"[Error] Stream batch failed ({len(docs)} notices), retrying one by one: {e}")
+            stats, acked = self._process_individually(messages, docs, ids_by_url, e)
+            if not acked:
+                return 0
+
+        # 3. ack (upsert가 끝난 뒤에만)
+        self.client.xack(self.stream, self.group, *acked)
+        self.counters["indexed"] += stats["upserted"]
+        self.counters["passages"] += stats["passages"]
+        self._hot_dirty = True
+        # 새 공지가 반영되었으므로 NOTICE 응답 캐시 무효화
+        from app.lib.knu_response_cache import bump_data_version
+        bump_data_version(self.client, "notice")
+        print(f"[Stream] Indexed {stats['upserted']} notices ({stats['passages']} passages, {stats['embedded']} embedded)")
+        return len(acked)
+
+    def _process_individually(self, messages: List[Tuple[str, Dict]], docs: Dict[str, Dict],
+                              ids_by_url: Dict[str, List[str]], batch_error: Exception) -> Tuple[Dict, List[str]]:
+        """
+        배치 실패 후 공지별 재시도. 성공한 메시지 id 목록과 합산 stats를 반환합니다.
+        계속 실패하는 메시지만 pending으로 남고, max_deliveries를 넘으면 dead-letter 됩니다.
+        """
+        stats = {"upserted": 0, "passages": 0, "embedded": 0}
+        acked, failed = [], {}
+        for url, doc in docs.items():
+            try:
+                if len(docs) == 1:
+                    # 공지가 하나뿐이면 같은 호출을 반복할 필요 없음
+                    raise batch_error
+                for key, value in self.pipeline.index_documents([doc]).items():
+                    stats[key] += value
+                acked.extend(ids_by_url[url])
+            except Exception as e:
+                print(f"[Error] Stream notice failed ({url}): {e}")
+                for message_id in ids_by_url[url]:
+                    failed[message_id] = str(e)
+
+        if failed:
+            delivered = self._delivery_counts(list(failed))
+            fields_by_id = dict(messages)
+            for message_id, reason in failed.items():
+                if delivered.get(message_id, 0) >= self.max_deliveries:
+                    self._dead_letter(message_id, fields_by_id[message_id], reason)
+        return stats, acked
+
+    def _maybe_sync_hot(self):
+        """tiering 사용 시 새 공지가 hot 컬렉션에도 반영되도록 주기적으로 동기화"""
+        if self.tier_manager is None or not self._hot_dirty:
+            return
+        if time.monotonic() - self._last_hot_sync < self.hot_sync_interval:
+            return
+        try:
+            self.tier_manager.sync()
+            self._hot_dirty = False
+        except Exception as e:
+            print(f"[Warning] Hot tier sync failed: {e}")
+        self._last_hot_sync = time.monotonic()
+
+    def run_once(self) -> int:
+        acked = self.process(self._claim_stale())
+        acked += self.process(self._read_new())
+        self._maybe_sync_hot()
+        return acked
+
+    def run(self, max_idle_loops: Optional[int] = None):
+        """max_idle_loops: 연속으로 빈 배치가 이만큼 나오면 종료 (None이면 무한 실행)"""
+        self.ensure_group()
+        print(f"[Stream] Consumer '{self.consumer}' reading {self.stream} (group: {self.group})")
+        idle = 0
+        while max_idle_loops is None or idle < max_idle_loops:
+            try:
+                idle = 0 if self.run_once() else idle + 1
+            except redis.RedisError as e:
+                print(f"[Error] Redis error in stream indexer: {e}")
+                time.sleep(5)
+
+    def stats(self) -> Dict:
+        info = self.client.xpending(self.stream, self.group)
+        return {
+            **self.counters,
+            "pending": info["pending"],
+            "stream_length": self.client.xlen(self.stream),
+            "dead_letters": self.client.xlen(self.dead_stream)
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Index newly crawled notices from the Redis stream in near real time")
+    parser.add_argument("command", choices=["run", "stats"])
+    parser.add_argument("--stream", default=os.getenv("NOTICE_STREAM", DEFAULT_STREAM))
+    parser.add_argument("--group", default=DEFAULT_GROUP)
+    parser.add_argument("--consumer", default=None, help="컨슈머 이름 (기본: hostname-pid)")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--block-ms", type=int, default=5000)
+    parser.add_argument("--max-deliveries", type=int, default=DEFAULT_MAX_DELIVERIES)
+    parser.add_argument("--store", default=os.getenv("EMBEDDING_STORE_PATH", "./embedding_store.sqlite"))
+    args = parser.parse_args()
+
+    client = _redis_from_env()
+    if client is None:
+        raise SystemExit("❌ NOTICE_STREAM_REDIS_URL 또는 REDIS_HOST 환경 변수가 필요합니다.")
+
+    if args.command == "stats":
+        print(NoticeStreamIndexer(client, None, args.stream, args.group).stats())
+    else:
+        # 배치 인덱싱용 설정: 쿼리 캐시/마이크로배칭 불필요
+        os.environ.setdefault("EMBED_CACHE_ENABLED", "0")
+        os.environ.setdefault("ENCODER_MAX_WAIT_MS", "0")
+
+        from app.lib.knu_notice_retriever import KNUSearcher
+        from app.lib.knu_ingest import EmbeddingStore, IngestionPipeline
+        from app.lib.knu_tiering import TierManager
+
+        searcher = KNUSearcher()
+        pipeline = IngestionPipeline(searcher, searcher.client, searcher.collection_name, EmbeddingStore(args.store))
+        tier_manager = None
+        if searcher.tier_policy is not None:
+            tier_manager = TierManager(
+                searcher.client, searcher.collection_name,
+                searcher.tier_policy.hot_collection, searcher.tier_policy.window_days
+            )
+        indexer = NoticeStreamIndexer(
+            client, pipeline, args.stream, args.group, args.consumer,
+            batch_size=args.batch_size, block_ms=args.block_ms,
+            max_deliveries=args.max_deliveries, tier_manager=tier_manager
+        )
+        try:
+            indexer.run()
+        except KeyboardInterrupt:
+            print(f"[Stream] Stopped: {indexer.counters}")
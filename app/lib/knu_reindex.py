@@ -0,0 +1,269 @@
+import os
+import time
+import random
+import argparse
+from typing import Dict, List, Optional
+from qdrant_client import QdrantClient, models
+from dotenv import load_dotenv
+
+from app.lib.knu_corpus import DEFAULT_DATA_DIR, iter_notices
+from app.lib.knu_tiering import TierManager, TierPolicy
+
+load_dotenv()
+
+# 새 버전 컬렉션 이름: <alias>__<YYYYmmddHHMMSS>
+VERSION_SEPARATOR = "__"
+# 승격 전 검증 기준
+DEFAULT_MIN_RECALL = 0.8        # 샘플 쿼리 recall@10 하한
+DEFAULT_RECALL_TOLERANCE = 0.02  # 현재 서비스 중인 버전 대비 허용 하락폭
+
+
+class ReindexManager:
+    """
+    Blue/green reindexing via Qdrant collection aliases.
+    1. build: 버전 컬렉션(<alias>__<timestamp>)을 새로 만들고 전체 코퍼스를 인제스트
+    2. validate: 포인트 수 + 샘플 쿼리 recall@10 (현재 버전 대비 회귀 여부 포함)
+    3. promote: alias를 새 버전으로 원자적으로 교체 (update_collection_aliases 한 번)
+    4. gc: 서비스 중인 버전과 롤백용 직전 버전만 남기고 삭제
+    KNUSearcher는 QDRANT_COLLECTION_ALIAS를 읽으므로 검색은 교체 순간까지 이전 버전을 그대로 사용합니다.
+    """
+    def __init__(self, client: QdrantClient, alias: str, keep_versions: int = 2):
+        self.client = client
+        self.alias = alias
+        self.keep_versions = max(1, keep_versions)
+
+    # -----------------------------------------------------
+    # State
+    # -----------------------------------------------------
+    def current(self) -> Optional[str]:
+        """alias가 가리키는 컬렉션 (없으면 None)"""
+        for alias in self.client.get_aliases().aliases:
+            if alias.alias_name == self.alias:
+                return alias.collection_name
+        return None
+
+    def versions(self) -> List[str]:
+        """이 alias의 버전 컬렉션 목록 (오래된 순)"""
+        prefix = self.alias + VERSION_SEPARATOR
+        return sorted(c.name for c in self.client.get_collections().collections if c.name.startswith(prefix))
+
+    def new_version_name(self) -> str:
+        return f"{self.alias}{VERSION_SEPARATOR}{time.strftime('%Y%m%d%H%M%S')}"
+
+    # -----------------------------------------------------
+    # Build / Validate
+    # -----------------------------------------------------
+    def wait_until_indexed(self, collection_name: str, timeout: float = 1800.0, poll: float = 2.0):
+        """옵티마이저(HNSW/양자화 빌드)가 끝나 컬렉션이 green이 될 때까지 대기"""
+        deadline = time.monotonic() + timeout
+        while True:
+            status = self.client.get_collection(collection_name).status
+            if status == models.CollectionStatus.GREEN:
+                return
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"{collection_name} is still {status} after {timeout:.0f}s")
+            time.sleep(poll)
+
+    def build(self, searcher, data_dir: Optional[str] = None, store=None, bulk_embedder=None,
+              batch_size: int = 32) -> Dict:
+        """새 버전 컬렉션을 만들고 인제스트합니다. Returns ingest stats (+ "collection")."""
+        from app.lib.knu_collection_manager import CollectionManager
+        from app.lib.knu_ingest import IngestionPipeline
+
+        name = self.new_version_name()
+        dense_dim = searcher._encode_dense_batch(["dimension probe"]).shape[1]
+        CollectionManager(self.client, name, dense_dim=dense_dim).create()
+
+        pipeline = IngestionPipeline(searcher, self.client, name, store, batch_size, bulk_embedder)
+        stats = pipeline.sync(data_dir)
+        self.wait_until_indexed(name)
+        return {**stats, "collection": name}
+
+    def sample_recall(self, searcher, collection_name: str, queries: List[Dict], final_k: int = 10) -> float:
+        """주어진 컬렉션에 대해 title 쿼리의 recall@final_k"""
+        if not queries:
+            return 1.0
+        original = searcher.collection_name
+        searcher.collection_name = collection_name
+        try:
+            hits = 0
+            for q in queries:
+                results, _, _ = searcher.search(q["query"], target_dept=q["dept"], final_k=final_k)
+                hits += any(r["url"] == q["expected_url"] for r in results)
+        finally:
+            searcher.collection_name = original
+        return hits / len(queries)
+
+    def validate(self, searcher, collection_name: str, expected_points: int, docs: List[Dict],
+                 num_queries: int = 100, min_recall: float = DEFAULT_MIN_RECALL,
+                 recall_tolerance: float = DEFAULT_RECALL_TOLERANCE, seed: int = 42) -> List[str]:
+        """승격을 막는 문제 목록을 반환합니다 (빈 리스트면 통과)."""
+        from app.lib.knu_retrieval_bench import build_query_set
+
+        problems = []
+        count = self.client.count(collection_name, exact=True).count
+        if count != expected_points:
+            problems.append(f"point count {count} != expected {expected_points}")
+
+        queries = [q for q in build_query_set(docs, num_queries * 2, seed) if q["type"] == "title"][:num_queries]
+        recall = self.sample_recall(searcher, collection_name, queries)
+        print(f"[Reindex] {collection_name}: {count} points, sample recall@10={recall:.3f} ({len(queries)} queries)")
+        if recall < min_recall:
+            problems.append(f"sample recall@10 {recall:.3f} < {min_recall}")
+
+        current = self.current()
+        if current and current != collection_name:
+            current_recall = self.sample_recall(searcher, current, queries)
+            print(f"[Reindex] {current} (serving): sample recall@10={current_recall:.3f}")
+            if recall < current_recall - recall_tolerance:
+                problems.append(f"sample recall@10 {recall:.3f} regressed from {current_recall:.3f} ({current})")
+        return problems
+
+    # -----------------------------------------------------
+    # Alias switch / GC
+    # -----------------------------------------------------
+    def promote(self, collection_name: str):
+        """alias를 collection_name으로 원자적으로 교체합니다."""
+        previous = self.current()
+        operations = []
+        if previous is not None:
+            operations.append(models.DeleteAliasOperation(delete_alias=models.DeleteAlias(alias_name=self.alias)))
+        operations.append(models.CreateAliasOperation(
+            create_alias=models.CreateAlias(collection_name=collection_name, alias_name=self.alias)
+        ))
+        # 한 요청 안의 alias 변경은 원자적으로 적용됨 (검색이 alias 없는 순간을 보지 않음)
+        self.client.update_collection_aliases(change_aliases_operations=operations)
+        print(f"[Reindex] Alias '{self.alias}': {previous} → {collection_name}")
+
+    def rollback(self) -> Optional[str]:
+        """현재 버전 직전의 버전으로 alias를 되돌립니다."""
+        current = self.current()
+        older = [v for v in self.versions() if current is None or v < current]
+        if not older:
+            print(f"[Reindex] No older version to roll back to (current: {current})")
+            return None
+        self.promote(older[-1])
+        return older[-1]
+
+    def gc(self) -> List[str]:
+        """서비스 중인 버전 + 최근 keep_versions개만 남기고 버전 컬렉션을 삭제합니다."""
+        current = self.current()
+        versions = self.versions()
+        keep = set(versions[-self.keep_versions:])
+        if current:
+            keep.add(current)
+        deleted = []
+        for name in versions:
+            if name in keep:
+                continue
+            self.client.delete_collection(name)
+            deleted.append(name)
+            print(f"[Reindex] Deleted old version {name}")
+        return deleted
+
+    def adopt(self, collection_name: str):
+        """기존 컬렉션(예: knu_hybrid_2026)을 alias 뒤로 옮깁니다 (최초 1회 마이그레이션)."""
+        if not self.client.collection_exists(collection_name):
+            raise ValueError(f"❌ 컬렉션이 존재하지 않습니다: {collection_name}")
+        self.promote(collection_name)
+
+
+def _sync_hot_tier(client: QdrantClient, alias: str, policy: Optional[TierPolicy]):
+    """alias가 바뀌면 <alias>_hot에 이전 버전(이전 모델)의 벡터가 남으므로 새 버전 기준으로 다시 동기화"""
+    if policy is None:
+        return
+    TierManager(client, alias, policy.hot_collection, policy.window_days).sync()
+
+
+def _make_client() -> QdrantClient:
+    qdrant_url = os.getenv("QDRANT_URL")
+    if not qdrant_url:
+        raise ValueError("❌ 환경 변수 'QDRANT_URL'이 설정되지 않았습니다. .env 파일을 확인해주세요.")
+    return QdrantClient(
+        url=qdrant_url,
+        api_key=os.getenv("QDRANT_API_KEY"),
+        port=443,
+        https=True,
+        timeout=60,
+        verify=False if "cloudflare" in qdrant_url else True
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Blue/green reindexing of the KNU notice collection via aliases")
+    parser.add_argument("command", choices=["status", "build", "promote", "rollback", "gc", "adopt"])
+    parser.add_argument("--alias", default=os.getenv("QDRANT_COLLECTION_ALIAS", "knu_notices"))
+    parser.add_argument("--collection", default=None, help="promote/adopt 대상 컬렉션")
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR)
+    parser.add_argument("--store", default=os.getenv("EMBEDDING_STORE_PATH", "./embedding_store.sqlite"))
+    parser.add_argument("--keep", type=int, default=2, help="남겨둘 버전 수 (롤백용)")
+    parser.add_argument("--bulk", action="store_true", help="멀티프로세스 dense 인코딩")
+    parser.add_argument("--num-queries", type=int, default=100, help="검증용 샘플 쿼리 수")
+    parser.add_argument("--min-recall", type=float, default=DEFAULT_MIN_RECALL)
+    parser.add_argument("--no-promote", action="store_true", help="빌드/검증만 하고 alias는 그대로 둠")
+    args = parser.parse_args()
+
+    client = _make_client()
+    manager = ReindexManager(client, args.alias, keep_versions=args.keep)
+    # build 분기에서 SEARCH_TIERING을 끄기 전에 읽어 둠
+    tier_policy = TierPolicy.from_env(args.alias)
+
+    if args.command == "status":
+        current = manager.current()
+        print(f"[Reindex] Alias '{args.alias}' → {current}")
+        for name in manager.versions():
+            marker = "*" if name == current else " "
+            print(f"   {marker} {name} ({client.count(name, exact=False).count} points)")
+    elif args.command in ("promote", "adopt"):
+        if not args.collection:
+            raise SystemExit("--collection is required")
+        if args.command == "adopt":
+            manager.adopt(args.collection)
+        else:
+            manager.promote(args.collection)
+        _sync_hot_tier(client, args.alias, tier_policy)
+    elif args.command == "rollback":
+        if manager.rollback():
+            _sync_hot_tier(client, args.alias, tier_policy)
+    elif args.command == "gc":
+        manager.gc()
+    else:
+        # 검증 쿼리가 캐시/로컬 인덱스 폴백으로 통과하지 않도록 끔
+        os.environ.setdefault("EMBED_CACHE_ENABLED", "0")
+        os.environ.setdefault("ENCODER_MAX_WAIT_MS", "0")
+        os.environ["LOCAL_INDEX_FALLBACK"] = "0"
+        # 느린 호스트에서 sparse-only로 강등되거나 <alias>_hot을 질의하면 새 컬렉션의 recall이 아님
+        os.environ.setdefault("SEARCH_DEGRADATION", "0")
+        os.environ["SEARCH_TIERING"] = "0"
+
+        from app.lib.knu_notice_retriever import KNUSearcher
+        from app.lib.knu_ingest import EmbeddingStore
+
+        searcher = KNUSearcher(client=client, collection_name=args.alias)
+        bulk_embedder = None
+        if args.bulk:
+            from app.lib.knu_bulk_embed import BulkEmbedder
+            bulk_embedder = BulkEmbedder(searcher.model_path)
+
+        store = EmbeddingStore(args.store)
+        stats = manager.build(searcher, args.data_dir, store, bulk_embedder)
+        store.close()
+        if bulk_embedder:
+            bulk_embedder.close()
+
+        docs = list(iter_notices(args.data_dir))
+        problems = manager.validate(
+            searcher, stats["collection"], stats["passages"], random.Random(42).sample(docs, min(len(docs), 2000)),
+            num_queries=args.num_queries, min_recall=args.min_recall
+        )
+        if problems:
+            print(f"[Reindex] Validation failed; alias '{args.alias}' unchanged:")
+            for problem in problems:
+                print(f"   - {problem}")
+            raise SystemExit(1)
+        if args.no_promote:
+            print(f"[Reindex] Validated {stats['collection']} (not promoted)")
+        else:
+            manager.promote(stats["collection"])
+            _sync_hot_tier(client, args.alias, tier_policy)
+            manager.gc()
@@ -0,0 +1,222 @@
+import os
+import re
+import time
+import hashlib
+import argparse
+import threading
+import numpy as np
+import redis
+from collections import OrderedDict
+from typing import Dict, Optional
+from dotenv import load_dotenv
+
+from app.lib.knu_embedding_cache import normalize_query
+
+load_dotenv()
+
+# 의도별 기본 TTL (초). 공지/메뉴는 자주 바뀌고 졸업 요건·잡담은 오래 유효
+DEFAULT_TTLS = {
+    "NOTICE": 1800,
+    "ACADEMIC": 24 * 3600,
+    "TIMETABLE": 3600,
+    "LIFESTYLE": 600,
+    "CHITCHAT": 24 * 3600
+}
+# 의도 → 응답이 의존하는 데이터 소스. 소스 버전이 바뀌면 해당 의도의 캐시 키가 모두 바뀜
+DATA_SOURCES = {
+    "NOTICE": "notice",
+    "ACADEMIC": "graph",
+    "TIMETABLE": "graph",
+    "LIFESTYLE": "menu"
+}
+DATA_VERSION_KEY = "data_version:{source}"
+# 이전 대화를 가리키는 표현이 있으면 답이 대화 맥락에 의존하므로 캐시하지 않음
+_CONTEXT_DEPENDENT = re.compile(r"그거|그건|그럼|그러면|거기|아까|위에|방금|이거|저거|그 중|그중")
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+def bump_data_version(client: redis.Redis, source: str) -> int:
+    """데이터 소스(notice/graph/menu) 갱신 후 호출 → 관련 응답 캐시가 즉시 무효화됨"""
+    version = client.incr(DATA_VERSION_KEY.format(source=source))
+    print(f"[Cache] Data version '{source}' → {version}")
+    return version
+
+
+def bump_data_version_from_env(source: str) -> Optional[int]:
+    """배치 스크립트용: REDIS_HOST가 없으면 아무것도 하지 않음"""
+    host = os.getenv("REDIS_HOST")
+    if not host:
+        return None
+    try:
+        client = redis.Redis(host=host, port=int(os.getenv("REDIS_PORT", "6379")), db=0, socket_timeout=2)
+        return bump_data_version(client, source)
+    except redis.RedisError as e:
+        print(f"[Warning] Failed to bump data version '{source}': {e}")
+        return None
+
+
+class ResponseCache:
+    """
+    generator_node LLM 응답 캐시 (Redis).
+    key: resp:<intent>:<data version>:<hash(tool_output)>:<hash(context)>:<hash(normalized query)>
+    - 같은 의도 + 같은 도구 결과 + 같은 대화 맥락 + 같은 (정규화된) 질문이면 LLM 호출 없이 저장된 답변을 반환
+    - context: 프롬프트에 들어가는 사용자별 정보 (요약 + 최근 대화, CHITCHAT은 프로필까지).
+      첫 턴은 context가 비어 있어 사용자 간에 공유되고, 이어지는 턴은 그 대화에서만 재사용됨
+    - semantic: 정확히 일치하지 않아도 같은 (의도, 버전, 도구 결과, 맥락) 안에서 쿼리 임베딩 cosine이
+      threshold 이상인 질문이 있으면 그 답변을 사용 (프로세스 내 인덱스)
+    - 데이터 버전(data_version:<source>)은 version_refresh 초마다 다시 읽음
+    """
+    def __init__(self, client, ttls: Optional[Dict[str, int]] = None, key_prefix: str = "resp",
+                 version_refresh: float = 5.0, semantic_threshold: Optional[float] = None,
+                 semantic_buckets: int = 4096, semantic_per_bucket: int = 32):
+        self.client = client
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.key_prefix = key_prefix
+        self.version_refresh = version_refresh
+        self.semantic_threshold = semantic_threshold
+        self.semantic_buckets = semantic_buckets
+        self.semantic_per_bucket = semantic_per_bucket
+
+        self._versions = {}  # source → (version, fetched_at)
+        # (intent, version, tool hash, context hash) → [(unit vector, query hash)]
+        self._semantic = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "semantic_hits": 0, "misses": 0, "skipped": 0, "stores": 0}
+
+    @classmethod
+    def from_env(cls, client) -> Optional["ResponseCache"]:
+        if os.getenv("RESPONSE_CACHE_ENABLED", "1") != "1":
+            return None
+        ttls = {}
+        for intent in DEFAULT_TTLS:
+            value = os.getenv(f"RESPONSE_CACHE_TTL_{intent}")
+            if value:
+                ttls[intent] = int(value)
+        threshold = os.getenv("RESPONSE_CACHE_SEMANTIC_THRESHOLD")
+        return cls(client, ttls=ttls, semantic_threshold=float(threshold) if threshold else None)
+
+    # -----------------------------------------------------
+    # Keys
+    # -----------------------------------------------------
+    async def _data_version(self, intent: str) -> str:
+        source = DATA_SOURCES.get(intent)
+        if source is None:
+            return "static"
+        cached = self._versions.get(source)
+        if cached is not None and time.monotonic() - cached[1] < self.version_refresh:
+            return cached[0]
+        version = await self.client.get(DATA_VERSION_KEY.format(source=source)) or "0"
+        if isinstance(version, bytes):
+            version = version.decode()
+        self._versions[source] = (version, time.monotonic())
+        return version
+
+    def _key(self, intent: str, version: str, tool_hash: str, context_hash: str, query_hash: str) -> str:
+        return f"{self.key_prefix}:{intent}:{version}:{tool_hash}:{context_hash}:{query_hash}"
+
+    @staticmethod
+    def _context_hash(context: str) -> str:
+        return _digest(context) if context else "-"
+
+    @staticmethod
+    def cacheable(intent: str, query: str, has_history: bool) -> bool:
+        if intent not in DEFAULT_TTLS:
+            return False
+        return not (has_history and _CONTEXT_DEPENDENT.search(query))
+
+    # -----------------------------------------------------
+    # Semantic index (near-duplicate queries)
+    # -----------------------------------------------------
+    def _semantic_lookup(self, bucket, vec: np.ndarray) -> Optional[str]:
+        with self._lock:
+            entries = self._semantic.get(bucket)
+            if not entries:
+                return None
+            self._semantic.move_to_end(bucket)
+            best_hash, best_sim = None, self.semantic_threshold
+            for other, query_hash in entries:
+                sim = float(other @ vec)
+                if sim >= best_sim:
+                    best_hash, best_sim = query_hash, sim
+            return best_hash
+
+    def _semantic_add(self, bucket, vec: np.ndarray, query_hash: str):
+        with self._lock:
+            entries = self._semantic.setdefault(bucket, [])
+            self._semantic.move_to_end(bucket)
+            entries.append((vec, query_hash))
+            del entries[:-self.semantic_per_bucket]
+            while len(self._semantic) > self.semantic_buckets:
+                self._semantic.popitem(last=False)
+
+    @staticmethod
+    def _unit(vec) -> Optional[np.ndarray]:
+        if vec is None:
+            return None
+        vec = np.asarray(vec, dtype=np.float32)
+        return vec / (np.linalg.norm(vec) + 1e-12)
+
+    # -----------------------------------------------------
+    # Get / Put
+    # -----------------------------------------------------
+    async def aget(self, intent: str, tool_output: Optional[str], query: str, query_vec=None,
+                   context: str = "") -> Optional[str]:
+        version = await self._data_version(intent)
+        tool_hash = _digest(str(tool_output or ""))
+        context_hash = self._context_hash(context)
+        query_hash = _digest(normalize_query(query))
+
+        answer = await self.client.get(self._key(intent, version, tool_hash, context_hash, query_hash))
+        if answer is None and self.semantic_threshold is not None and query_vec is not None:
+            similar = self._semantic_lookup((intent, version, tool_hash, context_hash), self._unit(query_vec))
+            if similar is not None:
+                answer = await self.client.get(self._key(intent, version, tool_hash, context_hash, similar))
+                if answer is not None:
+                    self.counters["semantic_hits"] += 1
+        elif answer is not None:
+            self.counters["hits"] += 1
+
+        if answer is None:
+            self.counters["misses"] += 1
+            return None
+        return answer.decode() if isinstance(answer, bytes) else answer
+
+    async def aput(self, intent: str, tool_output: Optional[str], query: str, answer: str, query_vec=None,
+                   context: str = ""):
+        if not answer or tool_output and str(tool_output).startswith("Error:"):
+            # 도구 오류로 만든 답변은 캐시하지 않음
+            return
+        version = await self._data_version(intent)
+        tool_hash = _digest(str(tool_output or ""))
+        context_hash = self._context_hash(context)
+        query_hash = _digest(normalize_query(query))
+        await self.client.set(self._key(intent, version, tool_hash, context_hash, query_hash), answer,
+                              ex=self.ttls[intent])
+        self.counters["stores"] += 1
+        if self.semantic_threshold is not None and query_vec is not None:
+            self._semantic_add((intent, version, tool_hash, context_hash), self._unit(query_vec), query_hash)
+
+    def skip(self):
+        self.counters["skipped"] += 1
+
+    def stats(self) -> Dict:
+        hits = self.counters["hits"] + self.counters["semantic_hits"]
+        lookups = hits + self.counters["misses"]
+        return {
+            **self.counters,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "semantic": self.semantic_threshold is not None,
+            "data_versions": {source: version for source, (version, _) in self._versions.items()}
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Invalidate cached chat responses by bumping a data source version")
+    parser.add_argument("command", choices=["bump"])
+    parser.add_argument("source", choices=sorted(set(DATA_SOURCES.values())))
+    args = parser.parse_args()
+    if bump_data_version_from_env(args.source) is None:
+        raise SystemExit("❌ REDIS_HOST 환경 변수가 필요합니다.")
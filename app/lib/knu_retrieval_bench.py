@@ -0,0 +1,218 @@
+import os
+import re
+import json
+import time
+import random
+import argparse
+import numpy as np
+from typing import Dict, List, Optional
+
+from app.lib.knu_corpus import DEFAULT_DATA_DIR, iter_notices
+
+K_VALUES = (1, 5, 10)
+# baseline 대비 회귀로 판단하는 기준
+DEFAULT_QUALITY_TOLERANCE = 0.01   # recall/MRR 절대값 하락
+DEFAULT_LATENCY_TOLERANCE = 0.20   # p50/p95 latency 상대 증가
+
+# 제목 앞의 [경북대학교], (공지) 같은 머리말
+_TITLE_PREFIX = re.compile(r"^\s*(\[[^\]]*\]|\([^)]*\)|【[^】]*】)\s*")
+
+
+def _strip_prefixes(title: str) -> str:
+    prev = None
+    while prev != title:
+        prev, title = title, _TITLE_PREFIX.sub("", title)
+    return title.strip()
+
+
+def title_fragment(title: str, rng: random.Random) -> Optional[str]:
+    """
+    제목의 일부만 남긴 paraphrase 쿼리 (머리말 제거 + 연속된 단어 60% 창).
+    단어가 너무 적으면 None.
+    """
+    words = _strip_prefixes(title).split()
+    if len(words) < 3:
+        return None
+    size = max(2, int(round(len(words) * 0.6)))
+    start = rng.randint(0, len(words) - size)
+    return " ".join(words[start:start + size])
+
+
+def build_query_set(docs: List[Dict], num_queries: int = 300, seed: int = 42) -> List[Dict]:
+    """
+    문서 제목으로 라벨된 쿼리셋을 자동 생성합니다.
+    각 쿼리는 {"query", "type", "dept", "expected_url"} 형태이며, 절반은 학과 필터를 겁니다.
+    """
+    rng = random.Random(seed)
+    candidates = [d for d in docs if d.get("title")]
+    rng.shuffle(candidates)
+
+    # 같은 제목의 공지가 여러 학과에 올라오는 경우 정답이 모호하므로 제외
+    title_counts = {}
+    for d in docs:
+        title_counts[d.get("title")] = title_counts.get(d.get("title"), 0) + 1
+
+    queries = []
+    for doc in candidates:
+        if len(queries) >= num_queries:
+            break
+        if title_counts[doc["title"]] > 1:
+            continue
+        dept = doc.get("dept") if rng.random() < 0.5 else None
+        queries.append({"query": doc["title"], "type": "title", "dept": dept, "expected_url": doc["url"]})
+
+        fragment = title_fragment(doc["title"], rng)
+        if fragment and len(queries) < num_queries:
+            queries.append({"query": fragment, "type": "fragment", "dept": dept, "expected_url": doc["url"]})
+    return queries
+
+
+def index_corpus(searcher, client, collection_name: str, docs: List[Dict], batch_size: int = 32):
+    """벤치마크용 로컬 Qdrant에 문서를 인덱싱합니다 (운영 컬렉션/인제스트와 같은 설정)."""
+    from app.lib.knu_collection_manager import CollectionManager
+    from app.lib.knu_ingest import IngestionPipeline
+
+    dense_dim = searcher._encode_dense_batch(["dimension probe"]).shape[1]
+    CollectionManager(client, collection_name, dense_dim=dense_dim).create()
+
+    pipeline = IngestionPipeline(searcher, client, collection_name, batch_size=batch_size)
+    for start in range(0, len(docs), batch_size * 8):
+        pipeline.index_documents(docs[start:start + batch_size * 8])
+        print(f"[Bench] Indexed {min(start + batch_size * 8, len(docs))}/{len(docs)} docs...", end="\r")
+    print()
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0}
+    arr = np.asarray(values)
+    return {f"p{p}": round(float(np.percentile(arr, p)), 2) for p in (50, 95, 99)}
+
+
+def _quality(ranks: List[Optional[int]]) -> Dict[str, float]:
+    n = len(ranks) or 1
+    metrics = {f"recall@{k}": round(sum(1 for r in ranks if r is not None and r < k) / n, 4) for k in K_VALUES}
+    metrics["mrr@10"] = round(sum(1.0 / (r + 1) for r in ranks if r is not None and r < 10) / n, 4)
+    return metrics
+
+
+def run_benchmark(searcher, queries: List[Dict], final_k: int = 10) -> Dict:
+    """각 쿼리를 search()로 실행하고 품질/지연 지표를 집계합니다."""
+    ranks, by_type = [], {}
+    latencies = {"encode": [], "db": [], "total": []}
+
+    for q in queries:
+        results, lat, _ = searcher.search(q["query"], target_dept=q["dept"], final_k=final_k)
+        urls = [r["url"] for r in results]
+        rank = urls.index(q["expected_url"]) if q["expected_url"] in urls else None
+        ranks.append(rank)
+        by_type.setdefault(q["type"], []).append(rank)
+        for key in latencies:
+            latencies[key].append(lat.get(key, 0.0))
+
+    return {
+        "num_queries": len(queries),
+        "quality": _quality(ranks),
+        "quality_by_type": {t: _quality(r) for t, r in by_type.items()},
+        "latency_ms": {key: _percentiles(values) for key, values in latencies.items()}
+    }
+
+
+def compare_to_baseline(report: Dict, baseline: Dict,
+                        quality_tol: float = DEFAULT_QUALITY_TOLERANCE,
+                        latency_tol: float = DEFAULT_LATENCY_TOLERANCE) -> List[str]:
+    """baseline 대비 회귀 목록을 반환합니다 (빈 리스트면 통과)."""
+    regressions = []
+    for metric, base in baseline["metrics"]["quality"].items():
+        current = report["metrics"]["quality"].get(metric, 0.0)
+        if current < base - quality_tol:
+            regressions.append(f"{metric}: {base:.4f} → {current:.4f}")
+
+    for stage, base_pcts in baseline["metrics"]["latency_ms"].items():
+        for pct in ("p50", "p95"):
+            base = base_pcts.get(pct, 0.0)
+            current = report["metrics"]["latency_ms"].get(stage, {}).get(pct, 0.0)
+            if base > 0 and current > base * (1 + latency_tol):
+                regressions.append(f"latency.{stage}.{pct}: {base:.1f}ms → {current:.1f}ms")
+    return regressions
+
+
+def print_report(report: Dict):
+    metrics = report["metrics"]
+    print(f"\n[Bench] {metrics['num_queries']} queries over {report['config']['num_docs']} docs")
+    print("   " + "  ".join(f"{k}={v:.4f}" for k, v in metrics["quality"].items()))
+    for qtype, quality in metrics["quality_by_type"].items():
+        print(f"   [{qtype}] " + "  ".join(f"{k}={v:.4f}" for k, v in quality.items()))
+    for stage, pcts in metrics["latency_ms"].items():
+        print(f"   {stage:<7} " + "  ".join(f"{p}={v:.1f}ms" for p, v in pcts.items()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline retrieval benchmark (recall@k, MRR, latency) on a local Qdrant")
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR)
+    parser.add_argument("--max-docs", type=int, default=2000, help="인덱싱할 최대 문서 수 (0 = 전체)")
+    parser.add_argument("--num-queries", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--qdrant-path", default=None, help="로컬 Qdrant 저장 경로 (기본: in-memory)")
+    parser.add_argument("--out", default="bench_report.json")
+    parser.add_argument("--baseline", default=None, help="비교할 baseline 리포트 (JSON)")
+    parser.add_argument("--quality-tol", type=float, default=DEFAULT_QUALITY_TOLERANCE)
+    parser.add_argument("--latency-tol", type=float, default=DEFAULT_LATENCY_TOLERANCE)
+    args = parser.parse_args()
+
+    # 측정 왜곡 방지: 임베딩 캐시, micro-batching 대기, 부하 기반 강등(sparse-only)을 끔
+    os.environ.setdefault("EMBED_CACHE_ENABLED", "0")
+    os.environ.setdefault("ENCODER_MAX_WAIT_MS", "0")
+    os.environ.setdefault("SEARCH_DEGRADATION", "0")
+    os.environ.setdefault("LOCAL_INDEX_FALLBACK", "0")
+
+    from qdrant_client import QdrantClient
+    from app.lib.knu_notice_retriever import KNUSearcher
+
+    rng = random.Random(args.seed)
+    docs = list(iter_notices(args.data_dir))
+    if args.max_docs and len(docs) > args.max_docs:
+        docs = rng.sample(docs, args.max_docs)
+
+    client = QdrantClient(path=args.qdrant_path) if args.qdrant_path else QdrantClient(location=":memory:")
+    collection_name = "knu_bench"
+    searcher = KNUSearcher(client=client, collection_name=collection_name)
+
+    if client.collection_exists(collection_name):
+        client.delete_collection(collection_name)
+    index_start = time.perf_counter()
+    index_corpus(searcher, client, collection_name, docs)
+    index_seconds = time.perf_counter() - index_start
+
+    queries = build_query_set(docs, args.num_queries, args.seed)
+    searcher.warmup()
+
+    report = {
+        "config": {
+            "model_version": searcher.model_version,
+            "sparse_version": searcher.sparse_encoder.version,
+            "num_docs": len(docs),
+            "seed": args.seed,
+            "index_seconds": round(index_seconds, 1),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S")
+        },
+        "metrics": run_benchmark(searcher, queries)
+    }
+    print_report(report)
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"[Bench] Report written to {args.out}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline["config"].get("num_docs") != len(docs) or baseline["config"].get("seed") != args.seed:
+            print("[Warning] Baseline was produced with a different corpus sample; results are not directly comparable.")
+        regressions = compare_to_baseline(report, baseline, args.quality_tol, args.latency_tol)
+        if regressions:
+            print("[Bench] Regressions vs baseline:")
+            for r in regressions:
+                print(f"   - {r}")
+            raise SystemExit(1)
+        print("[Bench] No regressions vs baseline.")
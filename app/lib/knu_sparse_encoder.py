@@ -0,0 +1,246 @@
+import os
+import json
+import time
+import hashlib
+import argparse
+import numpy as np
+import mmh3
+from collections import Counter
+from functools import lru_cache
+from typing import Iterable, List, Optional, Tuple
+from kiwipiepy import Kiwi
+
+from app.lib.knu_corpus import (
+    DEFAULT_DATA_DIR, PASSAGE_CHARS, PASSAGE_OVERLAP, iter_notices, split_passages, passage_text
+)
+
+# Stop tags from embedding.txt
+STOP_TAGS = {
+    'JKS', 'JKC', 'JKG', 'JKO', 'JKB', 'JKV', 'JKQ', 'JX', 'JC',
+    'EP', 'EF', 'EC', 'ETN', 'ETM',
+    'SP', 'SS', 'SE', 'SO', 'SL', 'SH', 'SN', 'SF', 'SY',
+    'IC', 'XPN', 'XSN', 'XSV', 'XSA', 'XR', 'MM', 'MAG', 'MAJ',
+    'VCP', 'VCN', 'VA', 'VV', 'VX'
+}
+
+SparseVector = Tuple[Optional[List[int]], Optional[List[float]]]
+
+
+def term_id(term: str) -> int:
+    # Hashing must match ingestion logic (app/lib/knu_ingest.py)
+    return mmh3.hash(term, signed=False)
+
+
+class TermStats:
+    """
+    Corpus term statistics artifact (mmh3 term id → document frequency).
+    정렬된 uint32 배열 두 개로 저장하고 mmap으로 로드합니다.
+    """
+    def __init__(self, stats_dir: str):
+        self.stats_dir = stats_dir
+        with open(os.path.join(stats_dir, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.num_docs = int(self.meta["num_docs"])
+        self.avg_doc_len = float(self.meta["avg_doc_len"])
+        self.version = self.meta["version"]
+
+        self.term_ids = np.load(os.path.join(stats_dir, "term_ids.npy"), mmap_mode="r")
+        self.doc_freq = np.load(os.path.join(stats_dir, "doc_freq.npy"), mmap_mode="r")
+
+    @classmethod
+    def load(cls, stats_dir: str) -> Optional["TermStats"]:
+        if not os.path.exists(os.path.join(stats_dir, "meta.json")):
+            return None
+        return cls(stats_dir)
+
+    def df(self, ids: Iterable[int]) -> np.ndarray:
+        ids = np.asarray(list(ids), dtype=np.uint32)
+        if ids.size == 0 or self.term_ids.size == 0:
+            return np.zeros(ids.size, dtype=np.int64)
+        pos = np.minimum(np.searchsorted(self.term_ids, ids), self.term_ids.size - 1)
+        return np.where(self.term_ids[pos] == ids, self.doc_freq[pos], 0).astype(np.int64)
+
+    def idf(self, df: np.ndarray) -> np.ndarray:
+        # BM25 IDF (Lucene 방식, 항상 양수)
+        return np.log1p((self.num_docs - df + 0.5) / (df + 0.5))
+
+    @staticmethod
+    def build(stats_dir: str, data_dir: Optional[str] = None, num_workers: int = 1, batch_size: int = 256,
+              passage_chars: int = PASSAGE_CHARS, passage_overlap: int = PASSAGE_OVERLAP) -> "TermStats":
+        """
+        data/*.jsonl 전체를 형태소 분석해 term 통계를 만듭니다.
+        색인 단위와 같게 패시지(제목 + 본문 조각)를 한 문서로 세므로 DF와 avg_doc_len이
+        BM25 길이 정규화 대상(패시지 길이)과 일치합니다. 청킹 설정은 knu_ingest와 같아야 합니다.
+        """
+        encoder = SparseEncoder(num_workers=num_workers)
+        start_time = time.perf_counter()
+        doc_freq = Counter()
+        num_docs, total_len = 0, 0
+
+        def consume(texts):
+            nonlocal num_docs, total_len
+            for keywords in encoder.analyze_many(texts):
+                num_docs += 1
+                total_len += len(keywords)
+                doc_freq.update({term_id(t) for t in keywords})
+
+        batch = []
+        for doc in iter_notices(data_dir):
+            batch.extend(passage_text(doc, p) for p in split_passages(doc.get("content", ""), passage_chars, passage_overlap))
+            if len(batch) >= batch_size:
+                consume(batch)
+                batch = []
+                print(f"[TermStats] Analyzed {num_docs} passages...", end="\r")
+        if batch:
+            consume(batch)
+
+        if num_docs == 0:
+            raise ValueError(f"No documents found in {data_dir or DEFAULT_DATA_DIR}")
+
+        os.makedirs(stats_dir, exist_ok=True)
+        ids = np.fromiter(doc_freq.keys(), dtype=np.uint32, count=len(doc_freq))
+        dfs = np.fromiter(doc_freq.values(), dtype=np.uint32, count=len(doc_freq))
+        order = np.argsort(ids)
+        np.save(os.path.join(stats_dir, "term_ids.npy"), ids[order])
+        np.save(os.path.join(stats_dir, "doc_freq.npy"), dfs[order])
+
+        meta = {
+            "num_docs": num_docs,
+            "avg_doc_len": total_len / num_docs,
+            "chunking": f"{passage_chars}:{passage_overlap}",
+            "num_terms": int(ids.size),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S")
+        }
+        meta["version"] = hashlib.sha1(json.dumps(meta, sort_keys=True).encode()).hexdigest()[:12]
+        # meta.json은 마지막에 기록 (존재 여부로 빌드 완료를 판단)
+        with open(os.path.join(stats_dir, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+
+        elapsed = time.perf_counter() - start_time
+        print(f"\n[TermStats] {num_docs} passages, {ids.size} terms in {elapsed:.1f}s → {stats_dir}")
+        return TermStats(stats_dir)
+
+
+class SparseEncoder:
+    """
+    Kiwi + MMH3 sparse encoder.
+    - 쿼리 형태소 분석 결과는 LRU로 메모이즈
+    - 문서는 kiwi.tokenize(list)로 배치/멀티스레드 분석
+    - TermStats가 있으면 BM25 가중치(쿼리: IDF, 문서: TF 포화 + 길이 정규화)를 쓰고
+      너무 흔한 term(df/N > max_df_ratio)은 벡터에서 제외
+    - TermStats가 없으면 기존과 동일한 sqrt(count) 가중치
+    """
+    def __init__(self, term_stats: Optional[TermStats] = None, num_workers: int = 1,
+                 cache_size: int = 4096, k1: float = 1.2, b: float = 0.75, max_df_ratio: float = 0.5):
+        # num_workers > 1 이면 리스트 입력을 Kiwi 내부 스레드 풀에서 병렬 분석
+        self.kiwi = Kiwi(num_workers=num_workers)
+        self.stop_tags = STOP_TAGS
+        self.term_stats = term_stats
+        self.k1 = k1
+        self.b = b
+        self.max_df_ratio = max_df_ratio
+        self._analyze_cached = lru_cache(maxsize=cache_size)(self._analyze)
+
+    @classmethod
+    def from_env(cls) -> "SparseEncoder":
+        stats_dir = os.getenv("TERM_STATS_DIR", "./term_stats")
+        term_stats = TermStats.load(stats_dir)
+        if term_stats is None:
+            print(f"[System] Term stats not found at {stats_dir}. Using sqrt(tf) sparse weights.")
+        else:
+            print(f"[System] Term stats loaded: {stats_dir} ({term_stats.num_docs} docs)")
+        return cls(
+            term_stats=term_stats,
+            num_workers=int(os.getenv("KIWI_NUM_WORKERS", "1")),
+            cache_size=int(os.getenv("KIWI_CACHE_SIZE", "4096")),
+            max_df_ratio=float(os.getenv("SPARSE_MAX_DF_RATIO", "0.5"))
+        )
+
+    @property
+    def version(self) -> str:
+        """캐시 키 등에 쓰이는 가중치 방식 식별자"""
+        return f"bm25-{self.term_stats.version}" if self.term_stats else "sqrt-tf"
+
+    # -----------------------------------------------------
+    # Morphological analysis
+    # -----------------------------------------------------
+    def _keywords(self, tokens) -> Tuple[str, ...]:
+        # Filter stop tags and short tokens
+        return tuple(t.form for t in tokens if t.tag not in self.stop_tags and len(t.form) > 1)
+
+    def _analyze(self, text: str) -> Tuple[str, ...]:
+        return self._keywords(self.kiwi.tokenize(text))
+
+    def analyze(self, text: str) -> Tuple[str, ...]:
+        """Memoized analysis (쿼리용)"""
+        return self._analyze_cached(text)
+
+    def analyze_many(self, texts: List[str]) -> List[Tuple[str, ...]]:
+        """Batched analysis (문서용, Kiwi 내부 멀티스레딩 사용)"""
+        return [self._keywords(tokens) for tokens in self.kiwi.tokenize(texts)]
+
+    def cache_info(self):
+        return self._analyze_cached.cache_info()
+
+    # -----------------------------------------------------
+    # Weighting
+    # -----------------------------------------------------
+    def _term_counts(self, keywords: Tuple[str, ...]) -> Tuple[np.ndarray, np.ndarray]:
+        counts = Counter(term_id(t) for t in keywords)
+        ids = np.fromiter(counts.keys(), dtype=np.uint32, count=len(counts))
+        tfs = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+        return ids, tfs
+
+    def _drop_common(self, ids: np.ndarray, tfs: np.ndarray):
+        """Returns (ids, tfs, idf) with ultra-common terms removed."""
+        df = self.term_stats.df(ids)
+        keep = df <= self.max_df_ratio * self.term_stats.num_docs
+        return ids[keep], tfs[keep], self.term_stats.idf(df[keep])
+
+    def _weights_to_vector(self, ids: np.ndarray, values: np.ndarray) -> SparseVector:
+        if ids.size == 0:
+            return None, None
+        return ids.tolist(), values.astype(np.float32).tolist()
+
+    def _encode_query_keywords(self, keywords: Tuple[str, ...]) -> SparseVector:
+        if not keywords:
+            return None, None
+        ids, tfs = self._term_counts(keywords)
+        if self.term_stats is None:
+            # Query-side weighting: simple sqrt or count is standard for Splade/BM25
+            return self._weights_to_vector(ids, np.sqrt(tfs))
+        ids, tfs, idf = self._drop_common(ids, tfs)
+        return self._weights_to_vector(ids, idf * tfs)
+
+    def _encode_document_keywords(self, keywords: Tuple[str, ...]) -> SparseVector:
+        if not keywords:
+            return None, None
+        ids, tfs = self._term_counts(keywords)
+        if self.term_stats is None:
+            return self._weights_to_vector(ids, np.sqrt(tfs))
+        ids, tfs, _ = self._drop_common(ids, tfs)
+        # BM25 TF 포화 + 문서 길이 정규화 (IDF는 쿼리 쪽에 곱해짐)
+        norm = self.k1 * (1 - self.b + self.b * len(keywords) / self.term_stats.avg_doc_len)
+        return self._weights_to_vector(ids, tfs * (self.k1 + 1) / (tfs + norm))
+
+    def encode_query(self, text: str) -> SparseVector:
+        return self._encode_query_keywords(self.analyze(text))
+
+    def encode_queries(self, texts: List[str]) -> List[SparseVector]:
+        return [self.encode_query(t) for t in texts]
+
+    def encode_documents(self, texts: List[str]) -> List[SparseVector]:
+        return [self._encode_document_keywords(k) for k in self.analyze_many(texts)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build corpus term statistics for BM25 sparse weighting")
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR)
+    parser.add_argument("--out", default=os.getenv("TERM_STATS_DIR", "./term_stats"))
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--passage-chars", type=int, default=PASSAGE_CHARS)
+    parser.add_argument("--passage-overlap", type=int, default=PASSAGE_OVERLAP)
+    args = parser.parse_args()
+
+    TermStats.build(args.out, args.data_dir, num_workers=args.workers,
+                    passage_chars=args.passage_chars, passage_overlap=args.passage_overlap)
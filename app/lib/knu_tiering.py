@@ -0,0 +1,193 @@
+import os
+import re
+import time
+import argparse
+import threading
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+from qdrant_client import QdrantClient, models
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DEFAULT_HOT_WINDOW_DAYS = 120
+# hot 결과가 이보다 적으면 cold(전체) 컬렉션으로 재질의
+DEFAULT_MIN_HOT_RESULTS = 3
+# hot 컬렉션 최고 dense cosine(BGE-M3) 하한. RRF 융합 점수는 순위 기반이라 1위가 항상 0.5 이상이므로
+# 관련도 판단에는 쓸 수 없음 → dense 검색 1위의 절대 유사도가 이보다 낮으면 hot에 맞는 공지가 없다고 보고 cold로 재질의
+DEFAULT_MIN_HOT_DENSE_SCORE = 0.45
+
+# 과거 자료를 찾는 쿼리 (예: "작년 장학금", "2023년 졸업요건")
+_ARCHIVE_KEYWORDS = re.compile(r"작년|재작년|지난\s*해|지난\s*학기|예전|과거|옛날|이전\s*공지")
+_YEAR = re.compile(r"(20\d{2})\s*(년|학년도)?")
+
+
+def hot_cutoff(window_days: int, today: Optional[date] = None) -> str:
+    """hot 구간의 시작 날짜 (payload date와 같은 YYYY-MM-DD 형식)"""
+    return ((today or date.today()) - timedelta(days=window_days)).isoformat()
+
+
+def wants_archive(query: str, window_days: int, today: Optional[date] = None) -> bool:
+    """쿼리가 hot 구간보다 오래된 자료를 명시적으로 찾는지 여부"""
+    if _ARCHIVE_KEYWORDS.search(query):
+        return True
+    cutoff_year = int(hot_cutoff(window_days, today)[:4])
+    return any(int(m.group(1)) < cutoff_year for m in _YEAR.finditer(query))
+
+
+class TierPolicy:
+    """
+    Hot/cold 검색 정책.
+    hot: 최근 window_days 공지만 담은 작은 컬렉션 (먼저 질의)
+    cold: 전체 아카이브 (= 기존 컬렉션/alias). 아래 경우에만 질의합니다.
+      - 쿼리가 과거 자료를 찾을 때 (hot을 건너뜀)
+      - hot 결과 수가 min_results 미만이거나 hot 최고 dense cosine이 min_dense_score 미만일 때
+        (sparse-only 모드처럼 dense 점수가 없으면 결과 수만 봄)
+    """
+    def __init__(self, hot_collection: str, window_days: int = DEFAULT_HOT_WINDOW_DAYS,
+                 min_results: int = DEFAULT_MIN_HOT_RESULTS, min_dense_score: float = DEFAULT_MIN_HOT_DENSE_SCORE):
+        self.hot_collection = hot_collection
+        self.window_days = window_days
+        self.min_results = min_results
+        self.min_dense_score = min_dense_score
+        self.counters = {"hot": 0, "cold_escalated": 0, "cold_archive": 0}
+        # 검색은 encode executor/이벤트 루프 등 여러 스레드에서 동시에 실행됨
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, base_collection: str) -> Optional["TierPolicy"]:
+        if os.getenv("SEARCH_TIERING", "0") != "1":
+            return None
+        return cls(
+            hot_collection=os.getenv("QDRANT_HOT_COLLECTION", f"{base_collection}_hot"),
+            window_days=int(os.getenv("HOT_WINDOW_DAYS", str(DEFAULT_HOT_WINDOW_DAYS))),
+            min_results=int(os.getenv("HOT_MIN_RESULTS", str(DEFAULT_MIN_HOT_RESULTS))),
+            min_dense_score=float(os.getenv("HOT_MIN_DENSE_SCORE", str(DEFAULT_MIN_HOT_DENSE_SCORE)))
+        )
+
+    def skip_hot(self, query: str) -> bool:
+        if wants_archive(query, self.window_days):
+            self._count("cold_archive")
+            return True
+        return False
+
+    def needs_cold(self, results: List[Dict], final_k: int, top_dense: Optional[float] = None) -> bool:
+        """top_dense: hot 컬렉션에서 쿼리와 가장 가까운 패시지의 dense cosine (없으면 None)"""
+        enough = min(self.min_results, final_k)
+        weak = top_dense is not None and top_dense < self.min_dense_score
+        if len(results) < enough or weak:
+            self._count("cold_escalated")
+            return True
+        self._count("hot")
+        return False
+
+    def _count(self, key: str):
+        with self._lock:
+            self.counters[key] += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counters = dict(self.counters)
+        return {"hot_collection": self.hot_collection, "window_days": self.window_days, **counters}
+
+
+class TierManager:
+    """
+    Hot 컬렉션 동기화 (야간 배치 또는 인제스트 직후 실행).
+    원본(cold) 컬렉션에서 최근 window_days 포인트를 벡터째 복사하고,
+    구간을 벗어났거나 원본에서 사라진/바뀐 포인트는 hot에서 제거합니다.
+    """
+    def __init__(self, client: QdrantClient, source_collection: str, hot_collection: str,
+                 window_days: int = DEFAULT_HOT_WINDOW_DAYS, batch_size: int = 256):
+        self.client = client
+        self.source_collection = source_collection
+        self.hot_collection = hot_collection
+        self.window_days = window_days
+        self.batch_size = batch_size
+
+    def _recent_filter(self, cutoff: str) -> models.Filter:
+        return models.Filter(must=[
+            models.FieldCondition(key="date", range=models.DatetimeRange(gte=cutoff))
+        ])
+
+    def _scroll_hashes(self, collection_name: str, scroll_filter: Optional[models.Filter] = None) -> Dict:
+        """point id → content_hash"""
+        hashes, offset = {}, None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=collection_name,
+                scroll_filter=scroll_filter,
+                limit=1000,
+                offset=offset,
+                with_payload=["content_hash"],
+                with_vectors=False
+            )
+            for p in points:
+                hashes[p.id] = (p.payload or {}).get("content_hash")
+            if offset is None:
+                return hashes
+
+    def ensure_hot(self):
+        from app.lib.knu_collection_manager import CollectionManager
+        dense = self.client.get_collection(self.source_collection).config.params.vectors["dense"]
+        if self.client.collection_exists(self.hot_collection):
+            hot_dense = self.client.get_collection(self.hot_collection).config.params.vectors["dense"]
+            if hot_dense.size == dense.size:
+                return
+            # 재색인으로 모델(차원)이 바뀐 경우: 이전 벡터는 재사용할 수 없으므로 새로 만듦
+            print(f"[Tiering] Dense dim changed ({hot_dense.size} → {dense.size}); recreating {self.hot_collection}")
+            self.client.delete_collection(self.hot_collection)
+        CollectionManager(self.client, self.hot_collection, dense_dim=dense.size).create()
+
+    def sync(self, today: Optional[date] = None) -> Dict:
+        start_time = time.perf_counter()
+        self.ensure_hot()
+        cutoff = hot_cutoff(self.window_days, today)
+
+        source = self._scroll_hashes(self.source_collection, self._recent_filter(cutoff))
+        hot = self._scroll_hashes(self.hot_collection)
+
+        to_copy = [pid for pid, h in source.items() if pid not in hot or hot[pid] != h or h is None]
+        to_delete = [pid for pid in hot if pid not in source]
+
+        for start in range(0, len(to_copy), self.batch_size):
+            records = self.client.retrieve(
+                collection_name=self.source_collection,
+                ids=to_copy[start:start + self.batch_size],
+                with_payload=True,
+                with_vectors=True
+            )
+            self.client.upsert(
+                collection_name=self.hot_collection,
+                points=[models.PointStruct(id=r.id, vector=r.vector, payload=r.payload) for r in records],
+                wait=True
+            )
+        for start in range(0, len(to_delete), 1000):
+            self.client.delete(
+                collection_name=self.hot_collection,
+                points_selector=models.PointIdsList(points=to_delete[start:start + 1000]),
+                wait=True
+            )
+
+        stats = {
+            "cutoff": cutoff,
+            "hot_points": len(source),
+            "copied": len(to_copy),
+            "expired": len(to_delete),
+            "seconds": round(time.perf_counter() - start_time, 1)
+        }
+        print(f"[Tiering] {self.source_collection} → {self.hot_collection}: {stats}")
+        return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sync the hot (recent notices) collection from the full archive")
+    parser.add_argument("command", choices=["sync"])
+    parser.add_argument("--window-days", type=int, default=int(os.getenv("HOT_WINDOW_DAYS", str(DEFAULT_HOT_WINDOW_DAYS))))
+    args = parser.parse_args()
+
+    from app.lib.knu_collection_manager import CollectionManager
+
+    source = CollectionManager.from_env()
+    hot_collection = os.getenv("QDRANT_HOT_COLLECTION", f"{source.collection_name}_hot")
+    TierManager(source.client, source.collection_name, hot_collection, args.window_days).sync()
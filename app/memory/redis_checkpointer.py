@@ -0,0 +1,214 @@
+import os
+import zlib
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Sequence, Tuple
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+
+# 대화 세션 기본 TTL (마지막 요청 이후 3일)
+DEFAULT_SESSION_TTL = 3 * 24 * 3600
+
+
+class RedisCheckpointSaver(BaseCheckpointSaver):
+    """
+    LangGraph checkpointer backed by Redis (thread_id = user_id).
+    - 스레드당 최신 체크포인트 1개만 보관 (히스토리/time-travel 없음): <prefix>:<thread>:<ns>
+    - 값은 serde(msgpack) 직렬화 후 zlib 압축, 매 저장마다 TTL 갱신
+    - pending writes는 <prefix>:<thread>:<ns>:writes 해시에 저장하고 새 체크포인트 저장 시 함께 삭제
+    메시지 수는 그래프의 요약 노드가 윈도우 크기로 유지하므로 세션당 메모리는 O(window)입니다.
+    그래프를 durability="exit"로 실행하면 요청당 GET 1회(pipeline) + SET 1회입니다.
+    """
+    def __init__(self, aclient=None, client=None, ttl: int = DEFAULT_SESSION_TTL,
+                 key_prefix: str = "chat:ckpt", compress_level: int = 6, serde=None):
+        super().__init__(serde=serde)
+        self.aclient = aclient
+        self.client = client
+        self.ttl = ttl
+        self.key_prefix = key_prefix
+        self.compress_level = compress_level
+
+    @classmethod
+    def from_env(cls, db) -> Optional["RedisCheckpointSaver"]:
+        """CHAT_HISTORY=0 이면 None (요청마다 새 상태, 기존 동작)"""
+        if os.getenv("CHAT_HISTORY", "1") != "1":
+            return None
+        # 압축된 바이너리 값을 다루므로 decode_responses=False 클라이언트 사용
+        return cls(
+            aclient=db.aredis_binary,
+            client=db.redis_binary,
+            ttl=int(os.getenv("CHAT_SESSION_TTL", str(DEFAULT_SESSION_TTL)))
+        )
+
+    # -----------------------------------------------------
+    # Encoding
+    # -----------------------------------------------------
+    def _pack(self, obj: Any) -> bytes:
+        type_, data = self.serde.dumps_typed(obj)
+        return zlib.compress(type_.encode() + b"\0" + data, self.compress_level)
+
+    def _unpack(self, raw: bytes) -> Any:
+        type_, _, data = zlib.decompress(raw).partition(b"\0")
+        return self.serde.loads_typed((type_.decode(), data))
+
+    def _keys(self, config: RunnableConfig) -> Tuple[str, str]:
+        configurable = config["configurable"]
+        key = f"{self.key_prefix}:{configurable['thread_id']}:{configurable.get('checkpoint_ns', '')}"
+        return key, f"{key}:writes"
+
+    def _encode_put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata):
+        entry = {
+            "checkpoint": checkpoint,
+            "metadata": get_checkpoint_metadata(config, metadata),
+            "parent_id": config["configurable"].get("checkpoint_id")
+        }
+        configurable = config["configurable"]
+        next_config = {
+            "configurable": {
+                "thread_id": configurable["thread_id"],
+                "checkpoint_ns": configurable.get("checkpoint_ns", ""),
+                "checkpoint_id": checkpoint["id"]
+            }
+        }
+        return self._pack(entry), next_config
+
+    def _encode_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]],
+                       task_id: str, task_path: str) -> Dict[str, bytes]:
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        fields = {}
+        for idx, (channel, value) in enumerate(writes):
+            write_idx = WRITES_IDX_MAP.get(channel, idx)
+            fields[f"{checkpoint_id}|{task_id}|{write_idx}"] = self._pack((task_path, channel, value))
+        return fields
+
+    def _decode_tuple(self, config: RunnableConfig, raw, raw_writes) -> Optional[CheckpointTuple]:
+        if raw is None:
+            return None
+        entry = self._unpack(raw)
+        checkpoint = entry["checkpoint"]
+        requested_id = get_checkpoint_id(config)
+        if requested_id and requested_id != checkpoint["id"]:
+            # 최신 체크포인트만 보관하므로 과거 id는 찾을 수 없음
+            return None
+
+        configurable = config["configurable"]
+        thread_id, checkpoint_ns = configurable["thread_id"], configurable.get("checkpoint_ns", "")
+        pending = []
+        for field, value in (raw_writes or {}).items():
+            field = field.decode() if isinstance(field, bytes) else field
+            checkpoint_id, task_id, idx = field.split("|")
+            if checkpoint_id != checkpoint["id"]:
+                continue
+            task_path, channel, write = self._unpack(value)
+            pending.append(((task_path, task_id, int(idx)), (task_id, channel, write)))
+        pending.sort(key=lambda item: item[0])
+
+        parent_id = entry["parent_id"]
+        return CheckpointTuple(
+            config={"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint["id"]}},
+            checkpoint=checkpoint,
+            metadata=entry["metadata"],
+            parent_config=(
+                {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": parent_id}}
+                if parent_id else None
+            ),
+            pending_writes=[write for _, write in pending]
+        )
+
+    # -----------------------------------------------------
+    # Async API (서버 경로)
+    # -----------------------------------------------------
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        key, writes_key = self._keys(config)
+        async with self.aclient.pipeline(transaction=False) as pipe:
+            pipe.get(key)
+            pipe.hgetall(writes_key)
+            raw, raw_writes = await pipe.execute()
+        return self._decode_tuple(config, raw, raw_writes)
+
+    async def alist(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None,
+                    before: Optional[RunnableConfig] = None, limit: Optional[int] = None) -> AsyncIterator[CheckpointTuple]:
+        if config is None:
+            return
+        checkpoint_tuple = await self.aget_tuple(config)
+        if checkpoint_tuple is not None and limit != 0:
+            yield checkpoint_tuple
+
+    async def aput(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+                   new_versions: ChannelVersions) -> RunnableConfig:
+        key, writes_key = self._keys(config)
+        value, next_config = self._encode_put(config, checkpoint, metadata)
+        async with self.aclient.pipeline(transaction=False) as pipe:
+            pipe.set(key, value, ex=self.ttl)
+            # 이전 체크포인트의 pending writes는 더 이상 필요 없음
+            pipe.delete(writes_key)
+            await pipe.execute()
+        return next_config
+
+    async def aput_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]],
+                          task_id: str, task_path: str = "") -> None:
+        fields = self._encode_writes(config, writes, task_id, task_path)
+        if not fields:
+            return
+        _, writes_key = self._keys(config)
+        async with self.aclient.pipeline(transaction=False) as pipe:
+            pipe.hset(writes_key, mapping=fields)
+            pipe.expire(writes_key, self.ttl)
+            await pipe.execute()
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        keys = [key async for key in self.aclient.scan_iter(match=f"{self.key_prefix}:{thread_id}:*")]
+        if keys:
+            await self.aclient.delete(*keys)
+
+    # -----------------------------------------------------
+    # Sync API (스크립트/디버깅용)
+    # -----------------------------------------------------
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        key, writes_key = self._keys(config)
+        pipe = self.client.pipeline(transaction=False)
+        pipe.get(key)
+        pipe.hgetall(writes_key)
+        raw, raw_writes = pipe.execute()
+        return self._decode_tuple(config, raw, raw_writes)
+
+    def list(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None,
+             before: Optional[RunnableConfig] = None, limit: Optional[int] = None) -> Iterator[CheckpointTuple]:
+        if config is None:
+            return
+        checkpoint_tuple = self.get_tuple(config)
+        if checkpoint_tuple is not None and limit != 0:
+            yield checkpoint_tuple
+
+    def put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+            new_versions: ChannelVersions) -> RunnableConfig:
+        key, writes_key = self._keys(config)
+        value, next_config = self._encode_put(config, checkpoint, metadata)
+        pipe = self.client.pipeline(transaction=False)
+        pipe.set(key, value, ex=self.ttl)
+        pipe.delete(writes_key)
+        pipe.execute()
+        return next_config
+
+    def put_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]],
+                   task_id: str, task_path: str = "") -> None:
+        fields = self._encode_writes(config, writes, task_id, task_path)
+        if not fields:
+            return
+        _, writes_key = self._keys(config)
+        pipe = self.client.pipeline(transaction=False)
+        pipe.hset(writes_key, mapping=fields)
+        pipe.expire(writes_key, self.ttl)
+        pipe.execute()
+
+    def delete_thread(self, thread_id: str) -> None:
+        keys = list(self.client.scan_iter(match=f"{self.key_prefix}:{thread_id}:*"))
+        if keys:
+            self.client.delete(*keys)
@@ -4,6 +4,7 @@ from app.core.databases import db
 class LongTermMemory:
     def __init__(self, user_id: str):
         self.r = db.redis
+        self.ar = db.aredis
         self.user_id = user_id
         self.profile_key = f"user:{user_id}:profile"
         
@@ -18,6 +19,16 @@ class LongTermMemory:
         current.update(profile_data)
         self.r.set(self.profile_key, json.dumps(current))
         
+    async def aget_profile(self) -> dict:
+        """사용자 프로필 로드 (async)"""
+        data = await self.ar.get(self.profile_key)
+        return json.loads(data) if data else {}
+
+    async def aset_profile(self, profile_data: dict):
+        current = await self.aget_profile()
+        current.update(profile_data)
+        await self.ar.set(self.profile_key, json.dumps(current))
+
     def get_context_string(self) -> str:
         """프롬프트 주입용"""
         p = self.get_profile()
@@ -1,12 +1,15 @@
 from typing import TypedDict, List, Optional, Annotated
 from langchain_core.messages import BaseMessage
-import operator
+from langgraph.graph.message import add_messages
 
 class AgentState(TypedDict):
     user_id: str
-    messages: Annotated[List[BaseMessage], operator.add]
+    # add_messages: id 기반 병합 + RemoveMessage 지원 (요약된 오래된 턴을 체크포인트에서 제거)
+    messages: Annotated[List[BaseMessage], add_messages]
+    summary: str               # 윈도우 밖으로 밀려난 대화의 누적 요약
     user_profile: dict         # Redis에서 로드한 장기 기억
     intent: str                # 분류된 의도
     tool_output: Optional[str] # 도구 실행 결과
+    speculative_output: Optional[str] # 라우팅 중 미리 실행한 공지 검색 결과 (의도가 NOTICE일 때만 설정)
     error_count: int           # 에러 반복 횟수 (무한 루프 방지)
     final_answer: str
\ No newline at end of file
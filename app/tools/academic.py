@@ -1,19 +1,36 @@
 from app.core.databases import db
+from app.core.singleflight import AsyncSingleFlight
+
+# 같은 (학과, 키워드) 동시 조회는 Neo4j 질의 한 번으로 합침
+_rule_flight = AsyncSingleFlight.from_env("neo4j_rule")
+
+GRADUATION_RULE_QUERY = """
+MATCH (d:Department {name: $dept})-[:HAS_RULE]->(req:Requirement)
+WHERE req.content CONTAINS $keyword OR req.category CONTAINS $keyword
+RETURN req.category as cat, req.content as content
+LIMIT 3
+"""
+
+def _format_rules(dept: str, keyword: str, rules: list) -> str:
+    if not rules:
+        return f"{dept}의 '{keyword}' 관련 졸업 요건 정보를 찾을 수 없습니다."
+    return "\n".join(rules)
 
 def query_graduation_rule(dept: str, keyword: str) -> str:
     """졸업 요건 및 학사 규정 조회 (Graph DB)"""
-    #
-    cypher = """
-    MATCH (d:Department {name: $dept})-[:HAS_RULE]->(req:Requirement)
-    WHERE req.content CONTAINS $keyword OR req.category CONTAINS $keyword
-    RETURN req.category as cat, req.content as content
-    LIMIT 3
-    """
-    
     with db.neo4j_driver.session() as session:
-        result = session.run(cypher, dept=dept, keyword=keyword)
+        result = session.run(GRADUATION_RULE_QUERY, dept=dept, keyword=keyword)
         rules = [f"[{r['cat']}] {r['content']}" for r in result]
-        
-    if not rules:
-        return f"{dept}의 '{keyword}' 관련 졸업 요건 정보를 찾을 수 없습니다."
-    return "\n".join(rules)
\ No newline at end of file
+    return _format_rules(dept, keyword, rules)
+
+async def aquery_graduation_rule(dept: str, keyword: str) -> str:
+    """졸업 요건 조회 (async Neo4j 드라이버, 이벤트 루프 비차단)"""
+    if _rule_flight is None:
+        return await _aquery_graduation_rule(dept, keyword)
+    return await _rule_flight.do((dept, keyword), _aquery_graduation_rule, dept, keyword)
+
+async def _aquery_graduation_rule(dept: str, keyword: str) -> str:
+    async with db.aneo4j_driver.session() as session:
+        result = await session.run(GRADUATION_RULE_QUERY, dept=dept, keyword=keyword)
+        rules = [f"[{r['cat']}] {r['content']}" async for r in result]
+    return _format_rules(dept, keyword, rules)
\ No newline at end of file
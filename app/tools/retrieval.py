@@ -1,19 +1,45 @@
-from app.lib.knu_notice_retriever import KNUSearcher
+import asyncio
+import threading
 
-# 전역 인스턴스 (메모리 절약)
-searcher = KNUSearcher()
+# 전역 인스턴스 (메모리 절약). 모델 로딩이 무거우므로 처음 사용할 때 생성합니다.
+_searcher = None
+_searcher_lock = threading.Lock()
 
-def search_notice(query: str, dept: str = "공통") -> str:
-    """공지사항 검색 도구"""
-    # search 메소드 활용
-    results, _, _ = searcher.search(query, target_dept=dept)
-    
+def get_searcher():
+    """KNUSearcher lazy singleton (ONNX/Kiwi import도 이 시점에 일어남)"""
+    global _searcher
+    if _searcher is None:
+        with _searcher_lock:
+            if _searcher is None:
+                from app.lib.knu_notice_retriever import KNUSearcher
+                _searcher = KNUSearcher()
+    return _searcher
+
+def is_searcher_loaded() -> bool:
+    return _searcher is not None
+
+def _format_results(results) -> str:
     if not results:
         return "관련된 공지사항을 찾을 수 없습니다."
         
     # LLM이 읽기 좋게 포맷팅
     context_list = []
     for r in results[:3]: # 상위 3개만 사용 (토큰 절약)
-        context_list.append(f"- [{r['date']}] {r['title']}: {r['content'][:150]}... (링크: {r['url']})")
+        # 공지 전체가 아닌, 쿼리와 가장 잘 맞는 패시지만 전달
+        context = r.get('passage') or r['snippet']
+        context_list.append(f"- [{r['date']}] {r['title']}: {context}... (링크: {r['url']})")
     
-    return "\n".join(context_list)
\ No newline at end of file
+    return "\n".join(context_list)
+
+def search_notice(query: str, dept: str = "공통") -> str:
+    """공지사항 검색 도구"""
+    # search 메소드 활용
+    results, _, _ = get_searcher().search(query, target_dept=dept)
+    return _format_results(results)
+
+async def asearch_notice(query: str, dept: str = "공통") -> str:
+    """공지사항 검색 도구 (async, 이벤트 루프 비차단)"""
+    # 아직 로딩 전이면 모델 로딩이 이벤트 루프를 막지 않도록 스레드에서 생성
+    searcher = get_searcher() if is_searcher_loaded() else await asyncio.to_thread(get_searcher)
+    results, _, _ = await searcher.asearch(query, target_dept=dept)
+    return _format_results(results)
@@ -1,23 +1,23 @@
+import json
+import asyncio
 from app.lib.knu_scheduler import KnuScheduler # [cite: 1]
 import pandas as pd
 from app.core.databases import db
+from app.core.singleflight import AsyncSingleFlight
 
-def generate_timetable(dept: str, grade: str, constraints: list) -> str:
-    """
-    제약조건 기반 시간표 생성
-    constraints 예시: [{"type": "block", "day": 4, "start": 900, "end": 1800}] (금공강)
-    """
-    # 1. Neo4j에서 해당 학과/학년 강좌 데이터 로드
-    cypher = """
-    MATCH (d:Department {name: $dept})-[:OFFERS]->(c:Course)-[:HAS_INSTANCE]->(l:Lecture)
-    WHERE l.grade = $grade
-    RETURN l.id as id, l.name as name, l.credit as credit, l.time as time, l.prof as prof
-    """
-    # 실제로는 Building 좌표(lat, lon)도 가져와야 함
-    
-    with db.neo4j_driver.session() as session:
-        data = session.run(cypher, dept=dept, grade=grade).data()
-    
+# 같은 (학과, 학년, 제약조건) 동시 요청은 강좌 조회 + 솔버 실행 한 번으로 합침
+_timetable_flight = AsyncSingleFlight.from_env("timetable")
+
+# 해당 학과/학년 강좌 데이터
+# 실제로는 Building 좌표(lat, lon)도 가져와야 함
+LECTURE_QUERY = """
+MATCH (d:Department {name: $dept})-[:OFFERS]->(c:Course)-[:HAS_INSTANCE]->(l:Lecture)
+WHERE l.grade = $grade
+RETURN l.id as id, l.name as name, l.credit as credit, l.time as time, l.prof as prof
+"""
+
+def _solve_timetable(data: list, grade: str, constraints: list) -> str:
+    """강좌 데이터로 스케줄러를 실행하고 결과를 요약합니다 (CPU-bound: OR-Tools)."""
     if not data:
         return "해당 학과/학년의 개설 강좌 정보를 찾을 수 없습니다."
         
@@ -43,4 +43,27 @@ def generate_timetable(dept: str, grade: str, constraints: list) -> str:
     # 결과 요약
     best = solutions[0]['lectures']
     summary = "\n".join([f"- {l['name']} ({l['time']})" for l in best])
-    return f"추천 시간표(총 {solutions[0]['total_credit']}학점):\n{summary}"
\ No newline at end of file
+    return f"추천 시간표(총 {solutions[0]['total_credit']}학점):\n{summary}"
+
+def generate_timetable(dept: str, grade: str, constraints: list) -> str:
+    """
+    제약조건 기반 시간표 생성
+    constraints 예시: [{"type": "block", "day": 4, "start": 900, "end": 1800}] (금공강)
+    """
+    # 1. Neo4j에서 해당 학과/학년 강좌 데이터 로드
+    with db.neo4j_driver.session() as session:
+        data = session.run(LECTURE_QUERY, dept=dept, grade=grade).data()
+    return _solve_timetable(data, grade, constraints)
+
+async def agenerate_timetable(dept: str, grade: str, constraints: list) -> str:
+    """시간표 생성 (async): 강좌 조회는 async 드라이버로, 솔버는 스레드에서 실행"""
+    if _timetable_flight is None:
+        return await _agenerate_timetable(dept, grade, constraints)
+    key = (dept, grade, json.dumps(constraints, sort_keys=True, ensure_ascii=False))
+    return await _timetable_flight.do(key, _agenerate_timetable, dept, grade, constraints)
+
+async def _agenerate_timetable(dept: str, grade: str, constraints: list) -> str:
+    async with db.aneo4j_driver.session() as session:
+        result = await session.run(LECTURE_QUERY, dept=dept, grade=grade)
+        data = await result.data()
+    return await asyncio.to_thread(_solve_timetable, data, grade, constraints)
\ No newline at end of file
@@ -2,13 +2,15 @@ from langgraph.graph import StateGraph, END
 from app.models.state import AgentState
 from app.workflows import nodes
 
-def build_graph():
+def build_graph(checkpointer=None):
+    """checkpointer: 멀티턴 대화용 (app.memory.redis_checkpointer). None이면 요청마다 새 상태"""
     workflow = StateGraph(AgentState)
     
     workflow.add_node("memory", nodes.load_memory_node)
     workflow.add_node("router", nodes.router_node)
     workflow.add_node("tools", nodes.tool_node)
     workflow.add_node("generator", nodes.generator_node)
+    workflow.add_node("summarize", nodes.summarize_node)
     
     workflow.set_entry_point("memory")
     
@@ -21,6 +23,9 @@ def build_graph():
         
     workflow.add_conditional_edges("router", route_logic, {"tools": "tools", "generator": "generator"})
     workflow.add_edge("tools", "generator")
-    workflow.add_edge("generator", END)
+    # 윈도우를 넘으면 오래된 턴을 요약 (응답 생성 이후라 /chat/stream의 첫 토큰에는 영향 없음)
+    workflow.add_conditional_edges("generator", lambda state: "summarize" if nodes.needs_summary(state) else END,
+                                   {"summarize": "summarize", END: END})
+    workflow.add_edge("summarize", END)
     
-    return workflow.compile()
\ No newline at end of file
+    return workflow.compile(checkpointer=checkpointer)
\ No newline at end of file
@@ -1,7 +1,14 @@
+import os
+import time
 import json
+import random
+import asyncio
 from langchain_upstage import ChatUpstage
-from langchain_core.messages import SystemMessage, HumanMessage
+from langchain_core.messages import SystemMessage, HumanMessage, AIMessage, RemoveMessage
 from app.core.config import settings
+from app.core.databases import db
+from app.core.singleflight import AsyncSingleFlight, prompt_key
+from app.lib.knu_response_cache import ResponseCache
 from app.memory.redis_memory import LongTermMemory
 from app.tools import retrieval, academic, schedule, lifestyle
 
@@ -9,10 +16,21 @@ from app.tools import retrieval, academic, schedule, lifestyle
 # API Key는 config.py를 통해 .env에서 가져옵니다.
 llm = ChatUpstage(api_key=settings.UPSTAGE_API_KEY, model="solar-pro")
 
-def load_memory_node(state: dict):
+# 모든 노드는 async: /chat 하나가 LLM/Redis/Neo4j를 기다리는 동안 이벤트 루프가 다른 요청을 처리합니다.
+# (graph는 ainvoke로만 실행)
+
+# 프롬프트가 완전히 같은 동시 LLM 호출은 한 번만 실행하고 결과를 공유 (점심시간 학식/같은 공지 질문 몰림)
+_llm_flight = AsyncSingleFlight.from_env("llm")
+
+async def _ainvoke_llm(prompt: str):
+    if _llm_flight is None:
+        return await llm.ainvoke(prompt)
+    return await _llm_flight.do(prompt_key(prompt), llm.ainvoke, prompt)
+
+async def load_memory_node(state: dict):
     """메모리 로드 및 필수 정보 체크"""
     mem = LongTermMemory(state["user_id"])
-    profile = mem.get_profile()
+    profile = await mem.aget_profile()
     
     # [하이브리드 온보딩 전략]
     # 프로필에 필수 정보(dept, grade)가 없으면 intent를 'ONBOARDING'으로 강제 전환
@@ -21,14 +39,22 @@ def load_memory_node(state: dict):
         
     return {"user_profile": profile, "error_count": 0}
 
-def router_node(state: dict):
-    """의도 분류"""
-    if state.get("intent") == "ONBOARDING":
-        return {"intent": "ONBOARDING"}
+# 로컬 의도 분류기 (knu_intent_router). 검색 엔진과 같은 BGE-M3 인코더를 사용하므로 엔진 로딩 후 생성
+_intent_router = None
+_intent_router_loaded = False
+# 로컬에서 결정한 메시지 중 LLM 결과와 비교(shadow)할 비율 → 의도별 정확도 리포트
+INTENT_SHADOW_RATE = float(os.getenv("INTENT_SHADOW_RATE", "0.0"))
+_shadow_tasks = set()
 
-    profile = state["user_profile"]
-    last_msg = state["messages"][-1].content
-    
+def get_intent_router():
+    global _intent_router, _intent_router_loaded
+    if not _intent_router_loaded and retrieval.is_searcher_loaded():
+        from app.lib.knu_intent_router import IntentRouter
+        _intent_router = IntentRouter.from_env(retrieval.get_searcher())
+        _intent_router_loaded = True
+    return _intent_router
+
+async def _llm_route(profile: dict, last_msg: str) -> dict:
     # Upstage LLM을 활용한 추론
     prompt = f"""
     Context: {profile}
@@ -40,7 +66,7 @@ def router_node(state: dict):
         "args": "arguments for tool"
     }}
     """
-    response = llm.invoke(prompt)
+    response = await _ainvoke_llm(prompt)
     try:
         # JSON 파싱 로직 (실제론 OutputParser 사용 권장)
         parsed = json.loads(response.content.strip().replace("```json", "").replace("```", ""))
@@ -48,7 +74,97 @@ def router_node(state: dict):
     except:
         return {"intent": "CHITCHAT"}
 
-def tool_node(state: dict):
+async def _shadow_route(router, profile: dict, last_msg: str, local_intent: str):
+    try:
+        router.record_shadow(local_intent, (await _llm_route(profile, last_msg))["intent"])
+    except Exception as e:
+        print(f"[Warning] Shadow intent check failed: {e}")
+
+# [Speculative prefetch] 라우터 LLM을 기다리는 동안 가장 흔한 도구(공지 검색)를 원문 그대로 미리 실행
+SPECULATIVE_NOTICE = os.getenv("SPECULATIVE_NOTICE", "0") == "1"
+_speculation = {"started": 0, "won": 0, "cancelled": 0, "failed": 0, "saved_ms": 0.0}
+
+def speculation_stats() -> dict:
+    """won: 의도가 NOTICE로 확정되어 결과를 사용, saved_ms: 라우터 LLM과 겹쳐 절약한 검색 시간 합계"""
+    started = _speculation["started"]
+    return {
+        "enabled": SPECULATIVE_NOTICE,
+        **_speculation,
+        "saved_ms": round(_speculation["saved_ms"], 1),
+        "win_rate": round(_speculation["won"] / started, 4) if started else 0.0,
+        "avg_saved_ms": round(_speculation["saved_ms"] / _speculation["won"], 1) if _speculation["won"] else 0.0
+    }
+
+async def _route_with_speculation(profile: dict, last_msg: str) -> dict:
+    """LLM 라우팅과 공지 검색을 동시에 실행하고, 의도가 NOTICE일 때만 검색 결과를 사용합니다."""
+    start = time.perf_counter()
+    search_done = {}
+
+    async def search():
+        result = await retrieval.asearch_notice(last_msg, profile.get("dept", "공통"))
+        search_done["at"] = time.perf_counter()
+        return result
+
+    task = asyncio.create_task(search())
+    # 취소/버려진 검색의 예외가 "never retrieved" 경고로 남지 않도록
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+    _speculation["started"] += 1
+    try:
+        routed = await _llm_route(profile, last_msg)
+    except BaseException:
+        task.cancel()
+        raise
+    routed_at = time.perf_counter()
+
+    if routed["intent"] != "NOTICE":
+        task.cancel()
+        _speculation["cancelled"] += 1
+        return {**routed, "speculative_output": None}
+    try:
+        result = await task
+    except Exception as e:
+        # 실패하면 tool_node가 평소처럼 검색
+        _speculation["failed"] += 1
+        print(f"[Warning] Speculative notice search failed: {e}")
+        return {**routed, "speculative_output": None}
+    _speculation["won"] += 1
+    # 라우터 LLM과 겹친 구간만큼 도구 단계가 짧아짐
+    _speculation["saved_ms"] += (min(search_done["at"], routed_at) - start) * 1000
+    return {**routed, "speculative_output": result}
+
+async def router_node(state: dict):
+    """의도 분류 (로컬 분류기 우선, 확신이 낮으면 LLM)"""
+    if state.get("intent") == "ONBOARDING":
+        return {"intent": "ONBOARDING", "speculative_output": None}
+
+    profile = state["user_profile"]
+    last_msg = state["messages"][-1].content
+
+    router = get_intent_router()
+    if router is not None:
+        try:
+            # 임베딩은 검색 엔진의 batch_encoder로 (이벤트 루프에서 대기, executor 스레드 비점유)
+            decision = await router.aclassify(last_msg)
+        except Exception as e:
+            print(f"[Warning] Local intent router failed: {e}")
+            decision = None
+        if decision is not None:
+            router.record(decision["source"], decision["intent"])
+            if INTENT_SHADOW_RATE > 0 and random.random() < INTENT_SHADOW_RATE:
+                task = asyncio.create_task(_shadow_route(router, profile, last_msg, decision["intent"]))
+                _shadow_tasks.add(task)
+                task.add_done_callback(_shadow_tasks.discard)
+            return {"intent": decision["intent"], "tool_output": decision["args"], "speculative_output": None}
+
+    if SPECULATIVE_NOTICE:
+        routed = await _route_with_speculation(profile, last_msg)
+    else:
+        routed = await _llm_route(profile, last_msg)
+    if router is not None:
+        router.record("llm", routed["intent"])
+    return routed
+
+async def tool_node(state: dict):
     """도구 실행"""
     intent = state["intent"]
     args = state.get("tool_output")
@@ -56,13 +172,16 @@ def tool_node(state: dict):
     
     result = ""
     try:
-        if intent == "NOTICE":
-            result = retrieval.search_notice(args, profile.get("dept", "공통"))
+        if intent == "NOTICE" and state.get("speculative_output"):
+            # 라우터 단계에서 미리 실행한 검색 결과 (SPECULATIVE_NOTICE=1)
+            result = state["speculative_output"]
+        elif intent == "NOTICE":
+            result = await retrieval.asearch_notice(args, profile.get("dept", "공통"))
         elif intent == "ACADEMIC":
-            result = academic.query_graduation_rule(profile.get("dept"), args)
+            result = await academic.aquery_graduation_rule(profile.get("dept"), args)
         elif intent == "TIMETABLE":
             # args가 단순 문자열일 수 있으므로 LLM으로 JSON 변환 필요할 수 있음
-            result = schedule.generate_timetable(profile.get("dept"), profile.get("grade"), [])
+            result = await schedule.agenerate_timetable(profile.get("dept"), profile.get("grade"), [])
         elif intent == "LIFESTYLE":
             if "메뉴" in str(args):
                 result = lifestyle.get_cafeteria_info()
@@ -73,22 +192,105 @@ def tool_node(state: dict):
         
     return {"tool_output": result}
 
-def generator_node(state: dict):
+# LLM 응답 캐시 (RESPONSE_CACHE_ENABLED=0 이면 None). Redis 연결은 첫 사용 시 열림
+response_cache = ResponseCache.from_env(db.aredis)
+
+async def _query_vector(query: str):
+    """
+    near-duplicate 매칭용 쿼리 임베딩 (semantic 매칭이 꺼져 있거나 엔진 로딩 전이면 None).
+    보통 라우터가 이미 인코딩해 임베딩 캐시에 있고, 과부하로 dense를 생략하면 None입니다.
+    """
+    if response_cache.semantic_threshold is None or not retrieval.is_searcher_loaded():
+        return None
+    dense_vec, _, _, _, _ = await retrieval.get_searcher()._aencode_adaptive(query)
+    return dense_vec
+
+def _format_history(messages: list) -> str:
+    lines = []
+    for m in messages:
+        role = "사용자" if isinstance(m, HumanMessage) else "비서"
+        lines.append(f"{role}: {m.content}")
+    return "\n".join(lines)
+
+async def generator_node(state: dict):
     """최종 응답 생성"""
     intent = state["intent"]
     
     # [온보딩 대화 처리]
     if intent == "ONBOARDING":
-        return {"messages": ["반갑습니다! 더 정확한 도움을 드리기 위해 '학과'와 '학년'을 알려주시겠어요?"], "final_answer": "Onboarding requested"}
+        return {"messages": [AIMessage(content="반갑습니다! 더 정확한 도움을 드리기 위해 '학과'와 '학년'을 알려주시겠어요?")], "final_answer": "Onboarding requested"}
     
-    # 일반 대화 처리
+    # 일반 대화 처리 (이전 대화: 누적 요약 + 윈도우 안의 최근 턴)
     context = state.get("tool_output", "")
     query = state["messages"][-1].content
+
+    summary = state.get("summary") or "없음"
+    history = _format_history(state["messages"][:-1]) or "없음"
+
+    # [응답 캐시] 같은 의도 + 같은 도구 결과 + 같은 대화 맥락 + 같은 질문이면 LLM 호출 생략
+    has_history = len(state["messages"]) > 1 or bool(state.get("summary"))
+    use_cache = response_cache is not None and response_cache.cacheable(intent, query, has_history)
+    query_vec = None
+    if use_cache:
+        # 프롬프트에 들어가는 사용자별 정보는 캐시 키에 포함 → 다른 사용자에게 개인화된 답변이 새지 않음
+        cache_context = f"{summary}\n{history}" if has_history else ""
+        if intent == "CHITCHAT":
+            cache_context += json.dumps(state.get("user_profile") or {}, sort_keys=True, ensure_ascii=False)
+        try:
+            query_vec = await _query_vector(query)
+            cached = await response_cache.aget(intent, context, query, query_vec, context=cache_context)
+        except Exception as e:
+            print(f"[Warning] Response cache lookup failed: {e}")
+            cached = None
+        if cached is not None:
+            return {"messages": [AIMessage(content=cached)], "final_answer": cached}
+    elif response_cache is not None:
+        response_cache.skip()
     
     prompt = f"""
     당신은 경북대학교 AI 비서입니다. 아래 정보를 바탕으로 답변하세요.
+    이전 대화 요약: {summary}
+    최근 대화:
+    {history}
     정보: {context}
     질문: {query}
     """
-    res = llm.invoke(prompt)
-    return {"messages": [res.content], "final_answer": res.content}
\ No newline at end of file
+    res = await _ainvoke_llm(prompt)
+    if use_cache:
+        try:
+            await response_cache.aput(intent, context, query, res.content, query_vec, context=cache_context)
+        except Exception as e:
+            print(f"[Warning] Response cache store failed: {e}")
+    return {"messages": [AIMessage(content=res.content)], "final_answer": res.content}
+
+# [대화 윈도우] 체크포인트에 남기는 최근 메시지 수. 넘치면 오래된 턴을 요약으로 접고 제거합니다.
+HISTORY_WINDOW = int(os.getenv("CHAT_HISTORY_WINDOW", "12"))
+
+def needs_summary(state: dict) -> bool:
+    return len(state.get("messages", [])) > HISTORY_WINDOW
+
+async def summarize_node(state: dict):
+    """
+    윈도우 밖 메시지를 기존 요약에 합치고 RemoveMessage로 제거합니다.
+    최근 HISTORY_WINDOW // 2 개만 남기므로 요약 LLM 호출은 몇 턴에 한 번만 일어납니다.
+    """
+    messages = state["messages"]
+    keep = max(2, HISTORY_WINDOW // 2)
+    overflow = messages[:-keep]
+    if not overflow:
+        return {}
+
+    prompt = f"""
+    아래는 경북대학교 AI 비서와 사용자의 대화입니다. 기존 요약에 새 대화를 반영해
+    이후 답변에 필요한 사실(학과, 관심 주제, 이미 안내한 내용, 남은 요청)만 5문장 이내 한국어로 요약하세요.
+    기존 요약: {state.get("summary") or "없음"}
+    새 대화:
+    {_format_history(overflow)}
+    """
+    try:
+        res = await llm.ainvoke(prompt)
+    except Exception as e:
+        # 요약 실패 시 다음 턴에 다시 시도 (메시지는 그대로 유지)
+        print(f"[Warning] Conversation summary failed: {e}")
+        return {}
+    return {"summary": res.content, "messages": [RemoveMessage(id=m.id) for m in overflow]}
\ No newline at end of file
@@ -1,10 +1,57 @@
+import json
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
-from app.workflows.graph import build_graph
-from app.memory.redis_memory import LongTermMemory
+from langchain_core.messages import HumanMessage
+from app.core.startup import startup
 
-app = FastAPI(title="KNU Agent API")
-agent_graph = build_graph()
+with startup.measure("import:app.workflows.graph"):
+    from app.workflows.graph import build_graph
+    from app.workflows import nodes
+with startup.measure("import:app.memory.redis_memory"):
+    from app.memory.redis_memory import LongTermMemory
+from app.core.databases import db
+from app.core import singleflight
+from app.memory.redis_checkpointer import RedisCheckpointSaver
+from app.tools import retrieval
+
+def _warm_search_engine():
+    # 모델 로딩 + 워밍업 인퍼런스
+    retrieval.get_searcher().warmup()
+
+async def _warm_redis():
+    # /chat 경로는 async 클라이언트를 사용하므로 서버 이벤트 루프에서 커넥션을 미리 엶
+    await db.aredis.ping()
+
+async def _warm_neo4j():
+    await db.aneo4j_driver.verify_connectivity()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    [Lifecycle] 모델과 DB 클라이언트를 병렬로 워밍업합니다.
+    서버는 즉시 요청을 받기 시작하고, 워밍업이 끝나면 /ready 가 200을 반환합니다.
+    """
+    warmup_task = asyncio.create_task(startup.warm_up({
+        "init:search_engine": _warm_search_engine,
+        "init:redis": _warm_redis,
+        "init:qdrant": lambda: db.qdrant.get_collections(),
+        "init:neo4j": _warm_neo4j
+    }))
+    yield
+    warmup_task.cancel()
+    if retrieval.is_searcher_loaded():
+        await retrieval.get_searcher().aclose()
+    await db.aclose()
+    db.close()
+
+app = FastAPI(title="KNU Agent API", lifespan=lifespan)
+with startup.measure("build_graph"):
+    # thread_id = user_id 로 멀티턴 대화 상태를 Redis에 보관 (CHAT_HISTORY=0 이면 비활성화)
+    checkpointer = RedisCheckpointSaver.from_env(db)
+    agent_graph = build_graph(checkpointer)
 
 # 1. 초기 정보 수집용 모델
 class UserProfile(BaseModel):
@@ -17,6 +64,50 @@ class ChatRequest(BaseModel):
     user_id: str
     message: str
 
+@app.get("/ready")
+async def ready():
+    """Readiness probe: 워밍업 완료 전(또는 실패한 컴포넌트를 재시도하는 동안) 503과 함께 기동 리포트를 반환합니다."""
+    report = startup.report()
+    return JSONResponse(status_code=200 if report["ready"] else 503, content=report)
+
+@app.get("/metrics/search")
+async def search_metrics():
+    """검색 엔진 지표: 모드(hybrid/sparse/cached)별 응답 수, 임베딩 캐시, hot/cold 분포"""
+    if not retrieval.is_searcher_loaded():
+        return JSONResponse(status_code=503, content={"loaded": False})
+    searcher = retrieval.get_searcher()
+    return {
+        "loaded": True,
+        "degradation": searcher.degradation_stats(),
+        "embedding_cache": searcher.cache_stats(),
+        "tiering": searcher.tier_stats()
+    }
+
+@app.get("/metrics/router")
+async def router_metrics():
+    """의도 분류 지표: 로컬(rule/centroid) vs LLM 폴백 비율, shadow 비교 정확도"""
+    router = nodes.get_intent_router()
+    if router is None:
+        return JSONResponse(status_code=503, content={"loaded": False})
+    return {"loaded": True, **router.stats()}
+
+@app.get("/metrics/response-cache")
+async def response_cache_metrics():
+    """LLM 응답 캐시 hit/miss (semantic 매칭 포함)와 현재 데이터 버전"""
+    if nodes.response_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **nodes.response_cache.stats()}
+
+@app.get("/metrics/speculation")
+async def speculation_metrics():
+    """라우팅 중 공지 검색 선실행: 적중률과 절약한 지연 시간"""
+    return nodes.speculation_stats()
+
+@app.get("/metrics/singleflight")
+async def singleflight_metrics():
+    """동시 요청 합치기: 그룹(encode/qdrant/neo4j_rule/timetable/llm)별 호출 수와 공유된 호출 수"""
+    return singleflight.stats()
+
 @app.post("/user/onboard")
 async def onboard_user(profile: UserProfile):
     """
@@ -27,7 +118,7 @@ async def onboard_user(profile: UserProfile):
         mem = LongTermMemory(profile.user_id)
         # dict 변환 시 None 값 제외
         data = profile.dict(exclude_none=True)
-        mem.set_profile(data)
+        await mem.aset_profile(data)
         return {"status": "success", "message": f"{profile.dept} {profile.grade}학년 프로필 등록 완료"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -39,20 +130,80 @@ async def chat(req: ChatRequest):
     - 온보딩이 안 된 유저가 들어오면 Agent가 알아서 학과/학년을 물어봅니다.
     """
     try:
-        inputs = {
-            "user_id": req.user_id,
-            "messages": [("user", req.message)],
-            "user_profile": {},
-            "intent": "",
-            "error_count": 0
-        }
-        
-        result = await agent_graph.ainvoke(inputs)
+        result = await agent_graph.ainvoke(_initial_state(req), _graph_config(req), durability="exit")
         return {"response": result["final_answer"]}
     except Exception as e:
         # 로그 기록 필요
         raise HTTPException(status_code=500, detail=str(e))
 
+def _initial_state(req: ChatRequest) -> dict:
+    return {
+        "user_id": req.user_id,
+        # 이번 사용자 턴만 전달 (add_messages가 체크포인트의 이전 대화 뒤에 추가)
+        "messages": [HumanMessage(content=req.message)],
+        "user_profile": {},
+        "intent": "",
+        # 체크포인트에서 이전 턴의 도구 결과가 이어지지 않도록 초기화
+        "tool_output": None,
+        "speculative_output": None,
+        "error_count": 0
+    }
+
+def _graph_config(req: ChatRequest) -> dict:
+    # 체크포인트는 실행 종료 시 한 번만 저장 (durability="exit") → 요청당 Redis 읽기 1회 + 쓰기 1회
+    return {"configurable": {"thread_id": req.user_id}}
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def _chat_events(req: ChatRequest):
+    """
+    LangGraph astream_events(v2)를 SSE로 변환합니다.
+    intent → status(tool start/end) → token* → done 순서로 전송하므로
+    첫 토큰은 전체 생성이 끝나기를 기다리지 않고 router + tool 직후에 도착합니다.
+    """
+    streamed = False
+    try:
+        async for event in agent_graph.astream_events(
+            _initial_state(req), _graph_config(req), version="v2", durability="exit"
+        ):
+            kind, name = event["event"], event.get("name")
+            node = event.get("metadata", {}).get("langgraph_node")
+
+            if kind == "on_chain_end" and name == "router" and node == "router":
+                yield _sse("intent", {"intent": event["data"]["output"].get("intent")})
+            elif kind == "on_chain_start" and name == "tools" and node == "tools":
+                yield _sse("status", {"stage": "tool", "state": "start"})
+            elif kind == "on_chain_end" and name == "tools" and node == "tools":
+                yield _sse("status", {"stage": "tool", "state": "end"})
+            elif kind == "on_chat_model_stream" and node == "generator":
+                text = event["data"]["chunk"].content
+                if text:
+                    streamed = True
+                    yield _sse("token", {"text": text})
+            elif kind == "on_chain_end" and name == "generator" and node == "generator":
+                output = event["data"]["output"] or {}
+                if not streamed and output.get("messages"):
+                    # 토큰 스트림이 없는 응답 (온보딩 안내, 캐시 hit, 동시 요청과 합쳐진 LLM 호출)은 한 번에 전송
+                    message = output["messages"][-1]
+                    yield _sse("token", {"text": getattr(message, "content", message)})
+                yield _sse("done", {"response": output.get("final_answer")})
+    except Exception as e:
+        yield _sse("error", {"detail": str(e)})
+
+@app.post("/chat/stream")
+async def chat_stream(req: ChatRequest):
+    """
+    스트리밍 대화 API (Server-Sent Events)
+    events: intent, status, token, done, error
+    """
+    return StreamingResponse(
+        _chat_events(req),
+        media_type="text/event-stream",
+        # 프록시(nginx 등) 버퍼링 비활성화
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8000)